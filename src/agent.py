@@ -1,48 +1,142 @@
+import re
 import time
+import dataclasses
 import uuid
+import json
 import hashlib
-from cachetools import TTLCache
 from src.selenium_utils import SeleniumUtils
+from src.browser_profile import BrowserProfile
+from src.tracing import Tracer
 from src.dom_analyzer import DomAnalyzer
 from src.model import Model
-from src.config import MARKDOWN_INPUT, DEFAULT_USER_PROMPT, FOLLOW_UP_PROMPT, RESOLVE_DUPLICATED_STEP_PROMPT, RESOLVE_INVALID_STEP_PROMPT
+from src.plan_cache import PlanCache
+from src.response_cache import ResponseCache
+from src.session_store import SessionStore
+from src.history_store import HistoryStore
+from src.step_resolver import LocalStepResolver, NON_TEXT_INPUT_TYPES
+from src.prompt_builder import PromptBuilder
+from src.config import MARKDOWN_INPUT, FULL_PAGE_MARKDOWN_INPUT, DELTA_MARKDOWN_INPUT, DEFAULT_USER_PROMPT, FOLLOW_UP_PROMPT, RESOLVE_DUPLICATED_STEP_PROMPT, RESOLVE_INVALID_STEP_PROMPT, \
+    NEXT_STEP_PROMPT, EXECUTED_WITHOUT_MODEL_PROMPT, PRUNED_SNAPSHOT_NOTE
+
+
+ID_SELECTOR_PATTERN = re.compile(r'#[\w-]+')
 
 
 class AgentProcessor:
-    def __init__(self, url):
-        self.cache_test_case = TTLCache(maxsize=1000, ttl=3600) # {'<module>, <view>, <button>', <steps>, <result>}
-        self.log_cache = TTLCache(maxsize=1000, ttl=3600)
-        self.dom_cache = TTLCache(maxsize=1000, ttl=3600) # {<task_id>, <dom_metadata>, <dom>}
+    MAX_DELTA_STRUCTURAL_CHANGES = 50 # Nhiều hơn số phần tử thêm/xoá này thì lấy lại full snapshot
+    SNAPSHOT_WINDOW = 2 # Multi-turn: số lượt gần nhất giữ nguyên snapshot trang, các lượt cũ hơn được lược bỏ
+    NON_TEXT_INPUT_TYPES = NON_TEXT_INPUT_TYPES
+
+    def __init__(self, url, extraction_mode="html", track_changes=False, plan_cache: PlanCache = None, token_budget=None,
+                 batch_mode=False, browser_profile: BrowserProfile = None, driver_pool=None, tracer: Tracer = None,
+                 model: Model = None, response_cache: ResponseCache = None, full_page=False, multi_turn=False, snapshot_window=None,
+                 session_store: SessionStore = None, history_store: HistoryStore = None, local_resolver: LocalStepResolver = None,
+                 verbose=False):
+        self.cache_test_case = plan_cache # PlanCache: replay các step đã giải được ở lần chạy trước (None = tắt)
+        self.session_store = session_store # SessionStore: khôi phục trạng thái sau setup task (vd: login) thay vì chạy lại (None = tắt)
+        # HistoryStore: DOM/markdown/prompt/TestStep của từng step, nén + dedup theo hash, giới hạn bytes; đồng thời memoize convert_to_md
+        self.history = history_store or HistoryStore()
+        self.last_task_id = None
+        self.last_task_stats = {} # Số liệu của task gần nhất (steps, llm_calls, ...), cập nhật cả khi task lỗi
+        self.dom_cache_stats = {"hits": 0, "misses": 0, "bytes_skipped": 0}
+        self.extraction_mode = extraction_mode # "html" (outerHTML) hoặc "records" (record gọn từ browser)
+        self.track_changes = track_changes # True: chỉ gửi delta (phần tử thay đổi) cho model khi trang không đổi cấu trúc
+        self.multi_turn = multi_turn # True: giữ lịch sử hội thoại cả task (system prompt + task là prefix cố định) để tận dụng prompt cache
+        self.snapshot_window = snapshot_window or self.SNAPSHOT_WINDOW
+        self.full_page = full_page # True: gửi phần tử của toàn trang (kèm data-viewport), executor tự scroll -> không cần step scroll
+        self.batch_mode = batch_mode # True: model có thể trả về nhiều step cho màn hình hiện tại trong 1 lần gọi
+        self.local_resolver = local_resolver # LocalStepResolver: tự tạo step hiển nhiên (nhập field, click nhãn duy nhất) thay vì gọi LLM (None = tắt)
+        self.verbose = verbose # True: in chi tiết từng step (prompt report, snapshot, chờ trang...), mặc định chỉ có trong span của tracer
 
         self.dom_analyzer = DomAnalyzer()
-        self.model = Model()
-        self.selenium_utils = SeleniumUtils()
+        self.model = model or Model(response_cache=response_cache) # model: object cùng interface get_action/get_actions (vd: model giả lập cho benchmark)
+        self.prompt_builder = PromptBuilder(token_budget, self.model.model_name) # token_budget = None: không cắt markdown, chỉ đếm token
+        self.system_prompt_tokens = self.prompt_builder.count_tokens(self.model.system_prompt)
+        self.last_prompt_report = None
+        self.last_prompt_instruction = None
+        self.tracer = tracer or Tracer() # Span cho từng phase của từng step, export JSONL nếu có TRACE_PATH
+        self.selenium_utils = SeleniumUtils(profile=browser_profile, driver_pool=driver_pool, verbose=verbose) # driver_pool: DriverPool giữ sẵn browser đã khởi động
         self.selenium_utils.connect_driver(url)
+        print(f"AgentProcessor.__init__ -> browser startup {self.selenium_utils.timings['startup_ms']:.0f} ms, "
+              f"first page load {self.selenium_utils.timings['last_page_load_ms']:.0f} ms")
 
 
-    def generate_prompt(self, task, markdown, is_valid, executed_steps=[], last_step=None) -> str:
+    def generate_prompt(self, task, markdown, is_valid, executed_steps=[], last_step=None, delta=None, invalid_reason=None,
+                        first_turn=None, unreported_steps=None, message_history=None) -> str:
         '''
-        1. Nếu is_valid_step = False thì generate resolving prompt 
+        1. Nếu is_valid_step = False thì generate resolving prompt (last_step là step không hợp lệ, invalid_reason là lý do)
         2. Nếu is_duplicate_step = True thì generate resolving prompt
         3. Nếu none of the above thì generate follow up prompt
+        4. Nếu có delta thì chỉ gửi các phần tử thay đổi thay vì toàn bộ markdown
+        5. Nếu vượt token budget thì chỉ giữ các phần tử liên quan nhất tới task (budget trừ cả token của message_history
+           gửi kèm lượt này khi multi-turn/track changes)
+        6. Multi-turn: task chỉ gửi ở lượt đầu, các lượt sau chỉ báo kết quả step trước (step do model trả về đã có trong
+           lịch sử, chỉ liệt kê unreported_steps là các step thực hiện mà không qua model: replay, batch, resolver),
+           kể cả ở lượt đầu (vd: replay từ plan cache rồi mới gọi model)
         '''
-        markdown_content = MARKDOWN_INPUT.replace("@@@markdown@@@", markdown)
-        if not last_step:
+        if self.multi_turn:
+            executed_steps_content = EXECUTED_WITHOUT_MODEL_PROMPT.replace("@@@steps@@@", self._describe_steps(unreported_steps)) if unreported_steps else ""
+            invalid_content = RESOLVE_INVALID_STEP_PROMPT.replace("@@@last_step@@@", self._describe_step(last_step)).replace("@@@reason@@@", invalid_reason or "unknown reason").replace("@@@task@@@", task) if is_valid == False else ""
+            if first_turn:
+                user_content = DEFAULT_USER_PROMPT.replace("@@@task@@@", task) + executed_steps_content + ("\n" + invalid_content if invalid_content else "")
+            elif invalid_content:
+                user_content = invalid_content + executed_steps_content
+            else:
+                user_content = NEXT_STEP_PROMPT.replace("@@@executed_steps@@@", executed_steps_content)
+        elif not last_step:
             user_content = DEFAULT_USER_PROMPT.replace("@@@task@@@", task)
         else:
             if is_valid == False:
-                user_content = RESOLVE_INVALID_STEP_PROMPT.replace("@@@last_step@@@", last_step).replace("@@@task@@@", task)
+                user_content = RESOLVE_INVALID_STEP_PROMPT.replace("@@@last_step@@@", self._describe_step(last_step)).replace("@@@reason@@@", invalid_reason or "unknown reason").replace("@@@task@@@", task)
             else:
-                executed_steps_description = str([step.description for step in executed_steps])
-                user_content = FOLLOW_UP_PROMPT.replace("@@@executed_steps@@@", str(executed_steps)).replace("@@@task@@@", task)
+                user_content = FOLLOW_UP_PROMPT.replace("@@@executed_steps@@@", self._describe_steps(executed_steps)).replace("@@@task@@@", task)
+
+        if delta is not None:
+            markdown_template = DELTA_MARKDOWN_INPUT.replace("@@@removed_ids@@@", str(delta.removed_ids))
+        else:
+            markdown_template = FULL_PAGE_MARKDOWN_INPUT if self.full_page else MARKDOWN_INPUT
+
+        # Budget cho markdown = token_budget trừ system prompt, lịch sử hội thoại gửi kèm, chỉ dẫn và phần chữ bao quanh markdown
+        instruction_tokens = self.prompt_builder.count_tokens(user_content)
+        history_tokens = self.prompt_builder.count_history_tokens(message_history)
+        reserved_tokens = self.system_prompt_tokens + history_tokens + instruction_tokens
+        markdown, markdown_report = self.prompt_builder.fit_markdown(
+            task, markdown, reserved_tokens + self.prompt_builder.count_tokens(markdown_template.replace("@@@markdown@@@", "")))
+        markdown_content = markdown_template.replace("@@@markdown@@@", markdown)
+
+        self.last_prompt_instruction = user_content # Multi-turn: phần còn lại của lượt này khi snapshot trang bị lược bỏ
+        self.last_prompt_report = {
+            "system_tokens": self.system_prompt_tokens,
+            "history_tokens": history_tokens,
+            "instruction_tokens": instruction_tokens,
+            **markdown_report,
+            "total_tokens": reserved_tokens + self.prompt_builder.count_tokens(markdown_content),
+            "token_budget": self.prompt_builder.token_budget
+        }
+        if self.verbose:
+            print(f"AgentProcessor.generate_prompt -> {self.last_prompt_report}")
 
         return user_content + "\n" + markdown_content
 
-    def execute_task(self, task: str) -> None:
+    def execute_task(self, task: str) -> str:
+        # Trả về "finished" (model trả về finish) hoặc "stopped" (dừng sau quá nhiều step mà chưa finish)
         if task == "":
             print("Empty prompt.")
-            return
+            return "stopped"
 
+        self.last_task_id = self.tracer.start_task(task)
+        self.history.start_task(self.last_task_id, task)
+        task_stats = self.last_task_stats = {}
+        outcome = "error"
+        try:
+            finished = self._execute_task(task, task_stats)
+            outcome = "finished" if finished else "stopped"
+        finally:
+            self.tracer.end_task(outcome, **task_stats)
+        return outcome
+
+    def _execute_task(self, task: str, task_stats: dict) -> bool:
+        # task_stats được cập nhật trong lúc chạy để vẫn có số liệu cho trace khi task báo lỗi
         # session_id = str(uuid.uuid4())
         current_step = 0
         consecutive_action_count = 1
@@ -51,6 +145,26 @@ class AgentProcessor:
         is_valid_step = True
         last_step = None
         accumulated_steps = []
+        full_snapshot_required = True
+        message_history = [] if self.multi_turn else None
+        snapshot_turns = [] # Multi-turn: [{"prompt", "instruction", "full"}] các lượt còn giữ snapshot trang trong message_history
+        unreported_steps = [] # Multi-turn: step đã thực hiện mà model chưa biết (replay từ cache, step còn lại của batch)
+        start_fingerprint = None
+        replay_steps = [] # Các step lấy từ cache_test_case, thực hiện lần lượt mà không cần gọi LLM
+        recorded_steps = [] # [{"step", "fingerprint"}] để lưu vào cache_test_case khi task thành công
+        replayed_count = 0
+        finished = False
+        pending_steps = [] # Batch mode: các step còn lại của batch model trả về
+        batch_fingerprint = None
+        llm_call_count = 0
+        element_index = {} # {id: {"tag", "attributes"}} các phần tử interactive đã gửi cho model
+        invalid_step = None
+        invalid_reason = None
+        reuse_page = False
+        delta = None
+        resolver_plan = self.local_resolver.plan(task) if self.local_resolver is not None else None
+        local_step_count = 0
+        iteration = 0 # Số lần lặp, dùng làm key của step trong history (kể cả step bị loại)
 
         while True:
             # Nếu lặp lai TestSteps >5  lần hoặc Error > 5 lần hoặc thực hiện hơn 100 TestSteps thì dừng
@@ -60,28 +174,124 @@ class AgentProcessor:
                 raise Exception("Generative AI generated invalid actions consecutively, please try again")
             if current_step > 100:
                 break
+            iteration += 1
 
-            # Gán id tự động cho các phần tử trong DOM
-            self.selenium_utils.assign_auto_generated_ids()
-            
-            # Lấy DOM hiện tại
-            visible_dom = self.selenium_utils.get_visible_dom()
+            # Gán id tự động và lấy DOM hiện tại (1 round trip), hoặc chỉ lấy delta nếu trang không đổi cấu trúc
+            # Step bị loại trước khi gọi WebDriver thì trang không đổi -> dùng lại DOM vừa lấy
+            if reuse_page:
+                reuse_page = False
+            else:
+                delta = None
+                if self.track_changes and not full_snapshot_required:
+                    with self.tracer.span("delta", current_step) as span:
+                        delta = self.selenium_utils.collect_changes(self.extraction_mode, self.MAX_DELTA_STRUCTURAL_CHANGES)
+                        span.attributes.update(self._page_attributes(delta), added=delta.added_count, removed=delta.removed_count,
+                                               changed=delta.changed_count)
+                        if delta.full_snapshot_required:
+                            span.outcome = "full_snapshot_required"
+                            span.attributes["reason"] = delta.reason
+                            delta = None
 
-            ### Hash DOM and save to cache -> Hash DOM ko work vì case: cùng 1 màn hình, sau khi chọn value cho field A thì value của field B sẽ biến đổi theo, nên cần lấy DOM mới liên tục
-            # dom_hash = hashlib.sha256(visible_dom.encode('utf-8')).hexdigest()
-            # if dom_hash not in self.dom_cache:
-            #     # Get DOM metadata
-            #     # dom_metadata = self.dom_analyzer.set_dom_metadata(visible_dom)
-            #     self.dom_cache[dom_hash] = {"dom_metadata": {}, "dom": visible_dom}
+                if delta is not None:
+                    markdown = self._traced_render_markdown(delta, current_step)
+                    self.history.record_step(self.last_task_id, iteration, dom=self._page_content(delta), markdown=markdown, page="delta")
+                    for removed_id in delta.removed_ids:
+                        element_index.pop(removed_id, None)
+                    element_index.update(self.dom_analyzer.build_element_index(markdown))
+                else:
+                    with self.tracer.span("snapshot", current_step) as span:
+                        snapshot = self.selenium_utils.take_snapshot(self.extraction_mode, track_changes=self.track_changes,
+                                                                     full_page=self.full_page)
+                        span.attributes.update(self._page_attributes(snapshot), element_count=snapshot.element_count,
+                                               visible_count=snapshot.visible_count)
+                    markdown = self._traced_render_markdown(snapshot, current_step)
+                    self.history.record_step(self.last_task_id, iteration, dom=self._page_content(snapshot), markdown=markdown, page="snapshot")
+                    element_index = self.dom_analyzer.build_element_index(markdown)
+                    # Full snapshot -> bắt đầu hội thoại mới với model (multi-turn: giữ hội thoại, lượt này gửi full DOM)
+                    if not self.multi_turn:
+                        message_history = [] if self.track_changes else None
+                    full_snapshot_required = False
 
+            ### Hash DOM ko dùng để bỏ qua việc lấy DOM được vì case: cùng 1 màn hình, sau khi chọn value cho field A thì value của field B sẽ biến đổi theo, nên cần lấy DOM mới liên tục
+            ### -> DOM vẫn được lấy mỗi step, hash chỉ dùng để memoize kết quả convert_to_md (xem _render_markdown)
 
-            markdown = self.dom_analyzer.convert_to_md(visible_dom)
+            fingerprint = None
+            if self.cache_test_case is not None:
+                # Track changes: markdown chỉ là delta -> dùng element index (đã ghép các delta) để fingerprint giống full snapshot
+                fingerprint = self.dom_analyzer.get_index_fingerprint(element_index)
+                if start_fingerprint is None:
+                    start_fingerprint = fingerprint
+                    replay_steps = self.cache_test_case.get(task, start_fingerprint) or []
 
-            try:
-                user_prompt = self.generate_prompt(task, markdown, is_valid_step, accumulated_steps, last_step) # Tạo prompt và gọi LLM
-                step = self.model.get_action(user_prompt)
-            except Exception as e:
-                raise Exception("AgentProcessor.execute_task -> Failed to get model response")
+            # Replay step đã cache nếu trang giống lúc ghi lại, ngược lại quay về dùng LLM
+            step = None
+            is_replayed_step = False
+            if replay_steps:
+                cached_step = replay_steps.pop(0)
+                if cached_step["fingerprint"] == fingerprint:
+                    step = cached_step["step"]
+                    is_replayed_step = True
+                else:
+                    print("AgentProcessor.execute_task -> Page diverged from cached plan, falling back to LLM")
+                    replay_steps = []
+                    if delta is not None: # model chưa thấy full DOM của trang này
+                        full_snapshot_required = True
+                        continue
+
+            # Batch mode: thực hiện tiếp step trong batch nếu trang chưa thay đổi cấu trúc
+            if step is None and pending_steps:
+                if self._is_batch_still_valid(batch_fingerprint, markdown, delta, pending_steps[0]):
+                    step = pending_steps.pop(0)
+                else:
+                    print(f"AgentProcessor.execute_task -> Page changed, dropping {len(pending_steps)} remaining batch steps")
+                    pending_steps = []
+
+            # Resolver chạy trước khi gọi LLM, chỉ trên full snapshot (delta không cho biết phần tử có duy nhất trên trang không)
+            local_step = None
+            if step is None and resolver_plan is not None and resolver_plan.active and delta is None:
+                with self.tracer.span("resolve", current_step, intent=resolver_plan.intents[0].action, shadow=self.local_resolver.shadow) as span:
+                    local_step = self.local_resolver.resolve(resolver_plan, markdown)
+                    span.outcome = "fallback" if local_step is None else "resolved"
+                if local_step is not None and not self.local_resolver.shadow:
+                    step = local_step
+            is_local_step = step is not None and step is local_step
+
+            is_model_step = step is None
+            if step is None:
+                try:
+                    user_prompt = self.generate_prompt(task, markdown, is_valid_step, accumulated_steps,
+                                                       last_step if is_valid_step else invalid_step, delta, invalid_reason,
+                                                       first_turn=not message_history, unreported_steps=unreported_steps,
+                                                       message_history=message_history) # Tạo prompt và gọi LLM
+                    with self.tracer.span("llm", current_step, prompt_tokens=self.last_prompt_report["total_tokens"],
+                                          **{name: value for name, value in self.last_prompt_report.items() if name != "total_tokens"}) as span:
+                        try:
+                            if self.batch_mode:
+                                steps = self.model.get_actions(user_prompt, message_history)
+                                step, pending_steps = steps[0], steps[1:]
+                                batch_fingerprint = self.dom_analyzer.get_page_fingerprint(markdown)
+                                span.attributes["batch_size"] = len(steps)
+                            else:
+                                step = self.model.get_action(user_prompt, message_history)
+                        finally:
+                            span.attributes.update(self.model.last_call_stats)
+                    llm_call_count += 1
+                    if local_step is not None: # shadow mode
+                        agreed = self.local_resolver.compare(local_step, step)
+                        span.attributes["local_resolver_agreed"] = agreed
+                        if self.verbose:
+                            print(f"AgentProcessor.execute_task -> local resolver {'agreed with' if agreed else 'differed from'} model: "
+                                  f"{self._describe_step(local_step)} / {self._describe_step(step)}")
+                    self.history.record_step(self.last_task_id, iteration, prompt=user_prompt)
+                    task_stats["llm_calls"] = llm_call_count
+                    task_stats["prompt_tokens"] = task_stats.get("prompt_tokens", 0) + (self.model.last_call_stats.get("request_tokens") or 0)
+                    task_stats["cached_tokens"] = task_stats.get("cached_tokens", 0) + (self.model.last_call_stats.get("cached_tokens") or 0)
+                    if self.multi_turn:
+                        unreported_steps = []
+                        snapshot_turns.append({"prompt": user_prompt, "instruction": self.last_prompt_instruction, "full": delta is None})
+                        self._prune_snapshots(message_history, snapshot_turns)
+                except Exception as e:
+                    raise Exception("AgentProcessor.execute_task -> Failed to get model response")
             
             current_step += 1
 
@@ -98,23 +308,248 @@ class AgentProcessor:
             
 
             ######### START Update consecutive_failure_count và is_valid_step #########
-            # Execute action, nếu báo lỗi thì retry
-            try:
-                continue_execute = self.selenium_utils.execute_action_for_prompt(step) # Thực hiện action
-            except Exception:
+            # Kiểm tra step với element index trước (không tốn round trip tới browser), sau đó execute action, nếu báo lỗi thì retry
+            with self.tracer.span("action", current_step, action=step.action, css_selector=step.css_selector, replayed=is_replayed_step) as span:
+                invalid_reason = self._validate_step(step, element_index)
+                if invalid_reason is not None:
+                    print(f"AgentProcessor.execute_task -> Rejected step before execution: {invalid_reason}")
+                    reuse_page = not self.track_changes
+                    span.outcome = "rejected"
+                else:
+                    try:
+                        continue_execute = self.selenium_utils.execute_action_for_prompt(step) # Thực hiện action
+                    except Exception as e:
+                        invalid_reason = "the element could not be found or is not interactable in the browser"
+                        span.outcome = "failed"
+                        span.error = str(e)
+                if invalid_reason is not None:
+                    span.attributes["reason"] = invalid_reason
+
+            self.history.record_step(self.last_task_id, iteration, test_step=step, outcome=span.outcome, reason=invalid_reason,
+                                     source="replay" if is_replayed_step else "local" if is_local_step else "model" if is_model_step else "batch")
+            if resolver_plan is not None:
+                if is_local_step or is_model_step:
+                    self.local_resolver.observe(resolver_plan, step, is_local_step, invalid_reason is None)
+                else: # step replay/batch: không theo dõi được intent nào đã xong
+                    resolver_plan.active = False
+
+            if invalid_reason is not None:
+                if is_replayed_step: # Step cache không còn dùng được -> bỏ plan, lấy lại full DOM và hỏi LLM
+                    print("AgentProcessor.execute_task -> Cached step failed, falling back to LLM")
+                    replay_steps = []
+                    full_snapshot_required = True
+                    reuse_page = False
+                    continue
                 is_valid_step = False
+                invalid_step = step
                 consecutive_failure_count += 1
+                pending_steps = []
                 continue
 
+            recorded_steps.append({"step": step, "fingerprint": fingerprint})
+            if self.multi_turn and not is_model_step:
+                unreported_steps.append(step)
+            replayed_count += is_replayed_step
+            local_step_count += is_local_step
+            task_stats.update(steps=len(recorded_steps), replayed_steps=replayed_count, local_steps=local_step_count)
+
             # Kiểm tra execute_result?
             if not continue_execute: ## Nếu là finish thì thoát while loop
+                finished = True
                 break 
 
+            # Scroll làm thay đổi vùng nhìn thấy mà không tạo mutation -> cần full snapshot
+            if step.action == "scroll":
+                full_snapshot_required = True
+
             consecutive_failure_count = 0
             is_valid_step = True
             accumulated_steps.append(step)
             last_step = step
             ######### END Update consecutive_failure_count và is_valid_step #########
                 
+        # 1 dòng tổng kết cho mỗi task, chi tiết từng step nằm trong span của tracer
+        summary = f"{len(recorded_steps)} steps executed with {llm_call_count} LLM calls"
+        if self.cache_test_case is not None:
+            summary += f", {replayed_count} replayed from cache"
+        if self.local_resolver is not None:
+            summary += f", {local_step_count} resolved locally"
+        if task_stats.get("prompt_tokens"):
+            summary += (f", prompt tokens {task_stats['prompt_tokens']} "
+                        f"(cached {task_stats['cached_tokens']}, {task_stats['cached_tokens'] / task_stats['prompt_tokens']:.0%})")
+        print(f"AgentProcessor.execute_task -> {summary}")
+        if self.verbose:
+            print(f"AgentProcessor.execute_task -> dom cache: {self.get_dom_cache_stats()}")
+            print(f"AgentProcessor.execute_task -> history store: {self.history.get_stats()}")
+            if self.local_resolver is not None:
+                print(f"AgentProcessor.execute_task -> local resolver: {self.local_resolver.get_stats()}")
+            if getattr(self.model, "response_cache", None) is not None:
+                print(f"AgentProcessor.execute_task -> llm response cache: {self.model.response_cache.get_stats()}")
+
+        if self.cache_test_case is not None:
+            if finished and replayed_count < len(recorded_steps):
+                self.cache_test_case.put(task, start_fingerprint, recorded_steps)
+
         if not len(accumulated_steps):
             raise Exception("No actions were executed")
+        return finished
+
+    def _traced_render_markdown(self, page, step):
+        with self.tracer.span("convert_to_md", step, mode=page.mode) as span:
+            cache_misses = self.dom_cache_stats["misses"]
+            markdown = self._render_markdown(page)
+            span.attributes.update(markdown_chars=len(markdown), cache_hit=page.mode == "html" and self.dom_cache_stats["misses"] == cache_misses)
+        return markdown
+
+    @staticmethod
+    def _page_attributes(page):
+        return {"mode": page.mode, "dom_bytes": page.payload_bytes, "script_ms": page.script_ms, "round_trip_ms": page.round_trip_ms}
+
+    @staticmethod
+    def _describe_step(step) -> str:
+        # Dạng gọn thay cho repr của pydantic: action selector "text" (description)
+        text = f' "{step.text}"' if step.text else ""
+        selector = f" {step.css_selector}" if step.css_selector else ""
+        return f"{step.action}{selector}{text} ({step.description})"
+
+    @classmethod
+    def _describe_steps(cls, steps) -> str:
+        return "; ".join(f"{index}. {cls._describe_step(step)}" for index, step in enumerate(steps, 1))
+
+    def _prune_snapshots(self, message_history, snapshot_turns):
+        # Thay snapshot trang của các lượt cũ bằng ghi chú ngắn. Chỉ lược bỏ khi số lượt còn snapshot vượt 2 * snapshot_window
+        # để prefix của hội thoại giữ nguyên trong nhiều lượt liên tiếp (prompt cache của provider vẫn dùng được).
+        # Lượt full snapshot gần nhất luôn được giữ vì các delta sau đó dựa vào nó.
+        if len(snapshot_turns) <= 2 * self.snapshot_window:
+            return
+        latest_full = max((index for index, turn in enumerate(snapshot_turns) if turn["full"]), default=None)
+        keep_from = len(snapshot_turns) - self.snapshot_window
+        prune = {turn["prompt"]: turn["instruction"] for index, turn in enumerate(snapshot_turns[:keep_from]) if index != latest_full}
+        snapshot_turns[:] = [turn for index, turn in enumerate(snapshot_turns) if index >= keep_from or index == latest_full]
+
+        for message_index, message in enumerate(message_history):
+            if not any(getattr(part, "part_kind", None) == "user-prompt" and part.content in prune for part in message.parts):
+                continue
+            parts = [
+                dataclasses.replace(part, content=prune[part.content] + PRUNED_SNAPSHOT_NOTE)
+                if getattr(part, "part_kind", None) == "user-prompt" and part.content in prune else part
+                for part in message.parts
+            ]
+            message_history[message_index] = dataclasses.replace(message, parts=parts)
+
+    def _validate_step(self, step, element_index):
+        # Trả về lý do nếu step chắc chắn không hợp lệ, None nếu hợp lệ hoặc không kiểm tra được (selector không phải #id)
+        if step.action not in ("click", "enter_text"):
+            return None
+        selector = step.css_selector.strip()
+        if not selector:
+            return f"a css_selector is required for the {step.action} action"
+        if not ID_SELECTOR_PATTERN.fullmatch(selector):
+            return None
+
+        element = element_index.get(selector[1:])
+        if element is None:
+            return f"there is no element with id '{selector[1:]}' on the current page"
+        if step.action == "enter_text":
+            input_type = element["attributes"].get("type", "text").lower()
+            if element["tag"] == "textarea" or (element["tag"] == "input" and input_type not in self.NON_TEXT_INPUT_TYPES):
+                return None
+            return f"cannot enter text into the <{element['tag']}> element '{selector}', only text inputs and textareas accept text"
+        return None
+
+    def _is_batch_still_valid(self, batch_fingerprint, markdown, delta, next_step):
+        # Batch còn dùng được nếu không có phần tử nào được thêm/xoá và phần tử của step tiếp theo vẫn còn trên trang
+        target_id = next_step.css_selector[1:] if next_step.css_selector.startswith('#') else None
+        if delta is not None:
+            return delta.added_count == 0 and delta.removed_count == 0 and target_id not in delta.removed_ids
+        if self.dom_analyzer.get_page_fingerprint(markdown) != batch_fingerprint:
+            return False
+        return target_id is None or f'id="{target_id}"' in markdown
+
+    def close(self, refill=True):
+        self.selenium_utils.close_local_driver(refill)
+
+    def ensure_setup(self, setup_task, base_url) -> str:
+        '''
+        Đưa session về trạng thái sau setup_task (vd: "login with username ... and password ..."), bắt đầu từ base_url:
+        1. Có trạng thái đã lưu cho (base_url, setup_task) thì khôi phục cookies/storage và mở lại trang sau setup
+        2. Nếu trang khôi phục giống trang trước setup (vd: vẫn là trang login) thì session đã hết hạn -> bỏ trạng thái đã lưu
+        3. Không có hoặc không dùng được thì chạy setup_task bằng execute_task, chỉ lưu trạng thái nếu setup hoàn thành
+        Trả về "restored" hoặc "executed".
+        '''
+        if self.session_store is not None:
+            session = self.session_store.get(base_url, setup_task)
+            if session is not None:
+                started_at = time.perf_counter()
+                try:
+                    self.selenium_utils.restore_session_state(session["state"], base_url)
+                    if self._get_current_fingerprint() != session["start_fingerprint"]:
+                        print(f"AgentProcessor.ensure_setup -> restored session for '{setup_task}' in {time.perf_counter() - started_at:.2f}s")
+                        return "restored"
+                    print(f"AgentProcessor.ensure_setup -> restored session for '{setup_task}' is no longer valid, re-running setup")
+                except Exception as e:
+                    print(f"AgentProcessor.ensure_setup -> Failed to restore session for '{setup_task}': {e}")
+                self.session_store.invalidate(base_url, setup_task)
+
+        self.selenium_utils.reset_session(base_url)
+        start_fingerprint = self._get_current_fingerprint() if self.session_store is not None else None
+        # Chỉ lưu trạng thái khi setup hoàn thành (model trả về finish), tránh khôi phục 1 lần login dở dang cho các job sau
+        if self.execute_task(setup_task) != "finished":
+            raise Exception(f"AgentProcessor.ensure_setup -> Setup task '{setup_task}' stopped before finishing")
+        if self.session_store is not None:
+            self.session_store.put(base_url, setup_task, self.selenium_utils.capture_session_state(), start_fingerprint)
+        return "executed"
+
+    def capture_checkpoint(self) -> dict:
+        # Trạng thái browser sau 1 task (url + cookies/storage) kèm fingerprint trang để kiểm tra lại khi khôi phục
+        return {"state": self.selenium_utils.capture_session_state(), "fingerprint": self._get_current_fingerprint()}
+
+    def restore_checkpoint(self, checkpoint, base_url) -> bool:
+        # False nếu trang sau khi khôi phục khác trang lúc lưu (vd: trạng thái nằm trong JS của SPA, không có trong url/storage)
+        try:
+            self.selenium_utils.restore_session_state(checkpoint["state"], base_url)
+            return self._get_current_fingerprint() == checkpoint["fingerprint"]
+        except Exception as e:
+            print(f"AgentProcessor.restore_checkpoint -> Failed to restore checkpoint: {e}")
+            return False
+
+    def _get_current_fingerprint(self):
+        snapshot = self.selenium_utils.take_snapshot(self.extraction_mode, full_page=self.full_page)
+        return self.dom_analyzer.get_page_fingerprint(self._render_markdown(snapshot))
+
+    def _render_markdown(self, page):
+        # page: PageSnapshot hoặc PageDelta
+        if page.mode == "records":
+            return self.dom_analyzer.convert_records_to_md(page.records)
+        return self._convert_to_md_cached(page.html)
+
+    def _convert_to_md_cached(self, html_doc):
+        # Memoize convert_to_md theo hash nội dung DOM: các lần lặp lại y hệt (action lỗi, scroll không tác dụng,
+        # retry sau step invalid) không phải chạy lại BeautifulSoup/markdownify
+        dom_bytes = html_doc.encode('utf-8')
+        dom_hash = hashlib.sha256(dom_bytes).hexdigest()
+
+        markdown = self.history.memo_get(dom_hash)
+        if markdown is not None:
+            self.dom_cache_stats["hits"] += 1
+            self.dom_cache_stats["bytes_skipped"] += len(dom_bytes)
+            return markdown
+
+        self.dom_cache_stats["misses"] += 1
+        markdown = self.dom_analyzer.convert_to_md(html_doc)
+        self.history.memo_put(dom_hash, markdown)
+        return markdown
+
+    def get_dom_cache_stats(self):
+        lookups = self.dom_cache_stats["hits"] + self.dom_cache_stats["misses"]
+        return {
+            **self.dom_cache_stats,
+            "hit_rate": self.dom_cache_stats["hits"] / lookups if lookups else 0.0
+        }
+
+    @staticmethod
+    def _page_content(page):
+        # Nội dung thô của PageSnapshot/PageDelta để lưu vào history
+        if page.mode == "records":
+            return json.dumps(page.records, ensure_ascii=False)
+        return page.html
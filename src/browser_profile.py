@@ -0,0 +1,71 @@
+from typing import List, Tuple
+from pydantic import BaseModel
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+
+# Chặn theo đuôi file qua Network.setBlockedURLs (CDP không cho chặn theo resource type nếu không bật Fetch interception)
+RESOURCE_URL_PATTERNS = {
+    "image": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.bmp", "*.avif"],
+    "font": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    "media": ["*.mp4", "*.webm", "*.ogg", "*.mp3", "*.wav", "*.m4a", "*.mov"],
+}
+
+
+class BrowserProfile(BaseModel):
+    '''
+    Cấu hình khởi tạo Chrome. Mặc định giữ nguyên hành vi cũ (có giao diện, tải toàn bộ tài nguyên);
+    BrowserProfile.fast() bật headless, chặn ảnh/font/media và tắt extension/background throttling.
+
+        profile = BrowserProfile.fast(blocked_urls=["*google-analytics.com*", "*hotjar.com*"])
+    '''
+    headless: bool = False
+    blocked_resource_types: List[str] = [] # "image", "font", "media"
+    blocked_urls: List[str] = [] # Pattern URL bên thứ 3 cần chặn, hỗ trợ wildcard '*'
+    disable_extensions: bool = False
+    disable_background_throttling: bool = False
+    window_size: Tuple[int, int] = (1920, 1080)
+
+    @classmethod
+    def fast(cls, **overrides):
+        settings = {
+            "headless": True,
+            "blocked_resource_types": list(RESOURCE_URL_PATTERNS),
+            "disable_extensions": True,
+            "disable_background_throttling": True,
+        }
+        settings.update(overrides)
+        return cls(**settings)
+
+    def build_options(self) -> Options:
+        options = Options()
+        if self.headless:
+            options.add_argument("--headless=new")
+            options.add_argument(f"--window-size={self.window_size[0]},{self.window_size[1]}")
+        if self.disable_extensions:
+            options.add_argument("--disable-extensions")
+        if self.disable_background_throttling:
+            options.add_argument("--disable-background-timer-throttling")
+            options.add_argument("--disable-backgrounding-occluded-windows")
+            options.add_argument("--disable-renderer-backgrounding")
+        if "image" in self.blocked_resource_types:
+            # Chrome không tải ảnh ngay từ đầu, pattern CDP bên dưới chỉ bổ sung cho ảnh trong CSS
+            options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+        return options
+
+    def get_blocked_url_patterns(self) -> List[str]:
+        patterns = []
+        for resource_type in self.blocked_resource_types:
+            if resource_type not in RESOURCE_URL_PATTERNS:
+                raise ValueError(f"Unsupported resource type '{resource_type}', expected one of {list(RESOURCE_URL_PATTERNS)}")
+            patterns.extend(RESOURCE_URL_PATTERNS[resource_type])
+        return patterns + list(self.blocked_urls)
+
+    def create_driver(self):
+        driver = webdriver.Chrome(options=self.build_options())
+        driver.set_window_size(*self.window_size)
+        patterns = self.get_blocked_url_patterns()
+        if patterns:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        return driver
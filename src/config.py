@@ -42,6 +42,22 @@ DEFAUL_SYSTEM_PROMPT = '''
     }
 '''
 
+BATCH_SYSTEM_PROMPT = '''
+    
+    Batch mode:
+    Instead of a single TestStep, return a TestPlan with an ordered list of `steps` that can be performed one after another on the currently visible page, for example filling every field of a form and then submitting it.
+    
+    ```python
+    class TestPlan(BaseModel):
+        steps: List[TestStep]
+    ```
+    
+    Rules:
+        1. Only include steps whose target elements are present in the current Markdown.
+        2. End the list after any step that navigates, opens a dialog or dropdown, or otherwise changes which elements are on the page; you will be asked again with the new page.
+        3. Return a single finish step when the task is already completed.
+'''
+
 DEFAULT_USER_PROMPT = '''
     Perform the task delimited by triple quotes: \"\"\"@@@task@@@\"\"\"
 '''
@@ -51,11 +67,31 @@ MARKDOWN_INPUT = '''
     Please note that you can scroll if you unable to proceed with the task using the available elements: \n @@@markdown@@@
 '''
 
+FULL_PAGE_MARKDOWN_INPUT = '''
+    Here is the Markdown representation of the whole page on which you will execute the actions.
+    Elements outside the visible area are included, their data-viewport attribute tells where they are (in_view, above, below, left, right).
+    They are scrolled into view automatically before they are clicked or typed into, so you do not need the scroll action: \n @@@markdown@@@
+'''
+
+DELTA_MARKDOWN_INPUT = '''
+    The page is the same as in the previous messages, only the elements below were added or changed since the last action (empty if nothing changed): \n @@@markdown@@@
+    These element ids were removed from the page: @@@removed_ids@@@
+'''
+
 FOLLOW_UP_PROMPT = '''
     Actions Executed so far are: \n @@@executed_steps@@@. 
     Please provide the next action to achieve the task delimited by triple quotes: \"\"\"@@@task@@@\"\"\" or return finish action if the task is completed.
 '''
 
+# Multi-turn: các step trước đã nằm trong lịch sử hội thoại nên không cần gửi lại task và danh sách step
+NEXT_STEP_PROMPT = '''
+    The last action succeeded.@@@executed_steps@@@ Please provide the next action for the task, or return finish action if the task is completed.
+'''
+
+EXECUTED_WITHOUT_MODEL_PROMPT = " These actions were already executed without asking you: @@@steps@@@."
+
+PRUNED_SNAPSHOT_NOTE = "\n    (page snapshot omitted, see the latest messages for the current page)"
+
 RESOLVE_DUPLICATED_STEP_PROMPT = "Please note that the last step @@@last_step@@@ you provided is already performed. I need the next action to perform the task: \"\"\"@@@task@@@\"\"\""
 
-RESOLVE_INVALID_STEP_PROMPT = "Please note that the last step @@@last_step@@@ you provided is invalid or not interactable in selenium, so i need another way to perform the task: \"\"\"@@@task@@@\"\"\""
+RESOLVE_INVALID_STEP_PROMPT = "Please note that the last step @@@last_step@@@ you provided is invalid or not interactable in selenium (@@@reason@@@), so i need another way to perform the task: \"\"\"@@@task@@@\"\"\""
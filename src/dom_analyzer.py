@@ -1,11 +1,45 @@
 import time
 import re
-from bs4 import BeautifulSoup, Comment
-from markdownify import markdownify as md
+import hashlib
+from bs4 import BeautifulSoup, CData, Comment, Doctype, NavigableString, Tag
+from markdownify import markdownify as md, MarkdownConverter
+
+# Mặc định html.parser: cho markdown giống hệt convert_to_md_legacy.
+# 'lxml' (nếu đã cài) nhanh hơn nhưng phải chủ động chọn qua DomAnalyzer(parser='lxml'),
+# vì lxml tự sửa HTML và bỏ bớt khoảng trắng nên markdown có thể khác bản cũ
+DEFAULT_HTML_PARSER = 'html.parser'
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+BASE64_IMAGE_PATTERN = re.compile(r'!\[[^\]]*\]\(data:image\/[a-zA-Z]+;base64,[^\)]+\)')
+STYLE_TAG_PATTERN = re.compile(r'<style>[\s\S]*?<\/style>')
+POSTFIX_PATTERN = re.compile(r'(\w+)\.postfix')
+INTERACTIVE_MD_PATTERN = re.compile(r'<(li|button|input|textarea|a) (id="[^"]*"[^>]*)>')
+ATTRIBUTE_PATTERN = re.compile(r'([\w:-]+)="([^"]*)"')
+
 
 class DomAnalyzer:
-    def __init__(self, cache_ttl=3600, cache_maxsize=1000):
-        pass
+    HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+    SKIPPED_TAGS = {'script', 'style', 'iframe', 'noscript'}
+    INTERACTIVE_TAGS = {'li', 'button', 'input', 'textarea', 'a'}
+    BASE64_ATTRS = ('href', 'src', 'xlink:href')
+    INCLUDE_ATTRS = {'aria-label',
+                     'type',
+                     'aria-current',
+                     'aria-hidden',
+                     'value',
+                     'name',
+                     'data-value',
+                     'placeholder',
+                     'role',
+                     'title',
+                     'data-viewport'
+                     }
+    # Giống Tag.get_text(): chỉ lấy đúng NavigableString/CData (bỏ Comment, Script, Stylesheet, TemplateString...)
+    TEXT_STRING_TYPES = (NavigableString, CData)
+
+    def __init__(self, cache_ttl=3600, cache_maxsize=1000, parser=None):
+        self.parser = parser or DEFAULT_HTML_PARSER
+        self.markdown_converter = MarkdownConverter(strip=['span'])
         # self.cache = TTLCache(maxsize=1000, ttl=3600)
         # self.log_cache = TTLCache(maxsize=1000, ttl=3600)
         # self.md_cache = TTLCache(maxsize=1000, ttl=3600)
@@ -178,6 +212,119 @@ class DomAnalyzer:
         return cleaned_markdown
 
     def convert_to_md(self, html_doc):
+        # Làm sạch soup trong 1 lần duyệt cây, rồi convert thẳng soup sang markdown (không parse lại HTML)
+        soup = BeautifulSoup(html_doc, self.parser)
+        self._clean_tree(soup)
+
+        markdown = self.markdown_converter.convert_soup(soup)
+        markdown = POSTFIX_PATTERN.sub(r'\1', markdown)
+        markdown = WHITESPACE_PATTERN.sub(' ', markdown).replace('\\_', '_')
+        markdown = BASE64_IMAGE_PATTERN.sub('', markdown)
+        return STYLE_TAG_PATTERN.sub('', markdown)
+
+    def _clean_tree(self, root):
+        # Parent có text node liền nhau (do xoá/thay node hoặc do parser): cần gộp lại như khi bản cũ serialize rồi parse lại
+        changed_parents = {}
+        stack = list(reversed(root.contents))
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Comment):
+                changed_parents[id(node.parent)] = node.parent
+                node.extract()
+                continue
+            if isinstance(node, Doctype):
+                # Bản cũ serialize doctype kèm '\n' phía sau rồi mới parse lại trong markdownify
+                changed_parents[id(node.parent)] = node.parent
+                node.insert_after(NavigableString('\n'))
+                continue
+            if not isinstance(node, Tag):
+                # html.parser có thể để lại 2 text node liền nhau (vd. quanh end tag thừa)
+                if type(node) is NavigableString and type(node.next_sibling) is NavigableString:
+                    changed_parents[id(node.parent)] = node.parent
+                continue
+            if node.name in self.SKIPPED_TAGS:
+                changed_parents[id(node.parent)] = node.parent
+                node.decompose()
+                continue
+
+            # li chứa a thì thay li bằng a
+            if node.name == 'li':
+                link = self._find_link(node)
+                if link is not None:
+                    node.replace_with(link)
+                    node = link
+
+            self._strip_attributes(node)
+
+            if node.name in self.INTERACTIVE_TAGS and 'id' in node.attrs and node.get('hidden') != 'true':
+                changed_parents[id(node.parent)] = node.parent
+                node.replace_with(self._render_interactive(node))
+                continue
+
+            stack.extend(reversed(node.contents))
+
+        for parent in changed_parents.values():
+            self._merge_strings(parent)
+
+    def _merge_strings(self, tag):
+        # Gộp các NavigableString liền nhau (giống Tag.smooth() nhưng chỉ ở một tầng):
+        # markdownify xử lý khoảng trắng theo từng text node nên phải có cùng cách chia text node với bản cũ
+        contents = tag.contents
+        index = len(contents) - 1
+        while index > 0:
+            current, previous = contents[index], contents[index - 1]
+            if type(current) is NavigableString and type(previous) is NavigableString:
+                current.extract()
+                previous.replace_with(NavigableString(previous + current))
+            index -= 1
+
+    def _strip_attributes(self, tag):
+        for attr in self.BASE64_ATTRS:
+            if attr in tag.attrs and 'base64,' in tag[attr].lower():
+                del tag[attr]
+
+        if 'style' in tag.attrs:
+            del tag['style']
+
+    def _find_link(self, tag):
+        stack = list(reversed(tag.contents))
+        while stack:
+            node = stack.pop()
+            if not isinstance(node, Tag) or node.name in self.SKIPPED_TAGS:
+                continue
+            if node.name == 'a':
+                return node
+            stack.extend(reversed(node.contents))
+        return None
+
+    def _collect_text(self, tag):
+        # Text của phần tử sau khi đã bỏ script/style/iframe/noscript và thay li bằng a
+        parts = []
+        stack = list(reversed(tag.contents))
+        while stack:
+            node = stack.pop()
+            if type(node) in self.TEXT_STRING_TYPES:
+                parts.append(node)
+                continue
+            if not isinstance(node, Tag) or node.name in self.SKIPPED_TAGS:
+                continue
+            if node.name == 'li':
+                node = self._find_link(node) or node
+            stack.extend(reversed(node.contents))
+        return ''.join(parts)
+
+    def _render_interactive(self, tag):
+        desired_attributes = [f'id="{tag["id"]}"']
+        for attr, value in tag.attrs.items():
+            if attr in self.INCLUDE_ATTRS:
+                desired_attributes.append(f'{attr}="{value}"')
+
+        attributes_str = ' '.join(desired_attributes)
+        # Giữ hậu tố .postfix như bản cũ (bỏ sau khi convert): markdownify tính độ dài gạch chân heading trên cả hậu tố này
+        return f'<{tag.name}.postfix {attributes_str}>{self._collect_text(tag)}</{tag.name}>'
+
+    def convert_to_md_legacy(self, html_doc):
+        # Bản cũ (nhiều lần duyệt soup + parse lại HTML trong markdownify), giữ lại để so sánh output và benchmark
 
         soup = BeautifulSoup(html_doc, 'html.parser')
 
@@ -220,7 +367,8 @@ class DomAnalyzer:
                              'data-value',
                              'placeholder',
                              'role',
-                             'title'
+                             'title',
+                             'data-viewport'
                              }
 
             for attr, value in tag.attrs.items():
@@ -241,3 +389,44 @@ class DomAnalyzer:
 
         return self.clean_markdown(markdown)
 
+    def convert_records_to_md(self, records):
+        # Render record (từ SeleniumUtils.take_snapshot(mode="records")) thành cùng format với convert_to_md
+        parts = []
+        for record in records:
+            tag = record['tag']
+            text = record.get('text', '')
+
+            if record.get('id'):
+                desired_attributes = [f'id="{record["id"]}"']
+                for attr, value in record.get('attrs', {}).items():
+                    desired_attributes.append(f'{attr}="{value}"')
+                attributes_str = ' '.join(desired_attributes)
+                parts.append(f'<{tag} {attributes_str}>{text}</{tag}>')
+            elif tag in self.HEADING_TAGS:
+                parts.append('#' * int(tag[1]) + ' ' + text)
+            else:
+                parts.append(text)
+
+        return ' '.join(parts)
+
+    def get_page_fingerprint(self, markdown):
+        # Fingerprint theo cấu trúc: chỉ dùng tag + attribute của các phần tử interactive (bỏ text)
+        # để nội dung động (ngày giờ, số đếm...) không làm thay đổi fingerprint
+        return self.get_index_fingerprint(self.build_element_index(markdown))
+
+    def get_index_fingerprint(self, element_index):
+        # Sắp theo id (id ổn định theo nội dung) để element index ghép từ các delta cho cùng fingerprint với full snapshot.
+        # Vị trí so với viewport (full page) bỏ qua vì đổi theo scroll
+        signature = '\n'.join(
+            element["tag"] + ''.join(f' {name}="{value}"' for name, value in element["attributes"].items() if name != 'data-viewport')
+            for _, element in sorted(element_index.items(), key=lambda item: str(item[0]))
+        )
+        return hashlib.sha256(signature.encode('utf-8')).hexdigest()
+
+    def build_element_index(self, markdown):
+        # {id: {"tag", "attributes"}} của các phần tử interactive có trong markdown gửi cho model
+        element_index = {}
+        for tag, attributes in INTERACTIVE_MD_PATTERN.findall(markdown):
+            attributes = dict(ATTRIBUTE_PATTERN.findall(attributes))
+            element_index[attributes.get('id')] = {"tag": tag, "attributes": attributes}
+        return element_index
@@ -0,0 +1,109 @@
+import queue
+import threading
+import time
+from src.browser_profile import BrowserProfile
+
+
+class DriverPool:
+    '''
+    Giữ sẵn `size` Chrome driver đã khởi động để AgentProcessor không phải chờ browser khởi động (cold start).
+    Mỗi driver chỉ được dùng 1 lần: acquire() lấy driver ra khỏi pool, release() đóng driver đã dùng xong và khởi động
+    driver thay thế ở background (worker tạo lại driver sau K task hoặc khi crash sẽ lấy được driver warm). Pool không tự
+    bù driver khi acquire nên số browser không vượt quá số driver đang dùng + `size`. Worker dừng hẳn thì trả driver với
+    release(driver, refill=False) để pool không khởi động driver thay thế không ai dùng; close() chờ các driver đang khởi
+    động rồi đóng chúng.
+
+        pool = DriverPool(BrowserProfile.fast(), size=4)
+        processor = AgentProcessor(url, driver_pool=pool)
+        ...
+        pool.close()
+    '''
+
+    def __init__(self, profile: BrowserProfile = None, size=2):
+        self.profile = profile or BrowserProfile()
+        self.size = size
+        self._drivers = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._launching = 0 # Số driver đang khởi động ở background
+        self._launch_threads = []
+        self.stats = {"warm": 0, "cold": 0, "launch_ms_total": 0.0}
+        for _ in range(size):
+            self._launch_in_background()
+
+    def _launch(self):
+        started_at = time.perf_counter()
+        driver = self.profile.create_driver()
+        launch_ms = (time.perf_counter() - started_at) * 1000
+        with self._lock:
+            self.stats["launch_ms_total"] += launch_ms
+        return driver
+
+    def _launch_in_background(self):
+        def launch():
+            try:
+                driver = self._launch()
+            except Exception as e:
+                print(f"DriverPool._launch_in_background -> Failed to launch driver: {e}")
+                with self._lock:
+                    self._launching -= 1
+                return
+            with self._lock:
+                self._launching -= 1
+                if not self._closed:
+                    self._drivers.put(driver)
+                    return
+            driver.quit()
+
+        thread = threading.Thread(target=launch, daemon=True)
+        with self._lock:
+            self._launching += 1
+            self._launch_threads = [launch_thread for launch_thread in self._launch_threads if launch_thread.is_alive()]
+            self._launch_threads.append(thread)
+            thread.start() # start trong lock để close() không join thread chưa start
+
+    def acquire(self):
+        '''
+        Trả về (driver, warm). Nếu pool đang trống thì khởi động driver mới ngay (cold) thay vì chờ background.
+        '''
+        if self._closed:
+            raise RuntimeError("DriverPool is closed")
+        try:
+            driver = self._drivers.get_nowait()
+            warm = True
+        except queue.Empty:
+            driver = self._launch()
+            warm = False
+        with self._lock:
+            self.stats["warm" if warm else "cold"] += 1
+        return driver, warm
+
+    def release(self, driver, refill=True):
+        # Đóng driver đã dùng xong và khởi động driver thay thế nếu pool đang thiếu
+        # refill = False: worker trả driver đã dừng hẳn (hết task, service dừng) nên không cần driver thay thế
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"DriverPool.release -> Failed to quit driver: {e}")
+        with self._lock:
+            refill = refill and not self._closed and self._drivers.qsize() + self._launching < self.size
+        if refill:
+            self._launch_in_background()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            launch_threads = list(self._launch_threads)
+        # Chờ các driver đang khởi động (thread daemon): launch() thấy pool đã đóng sẽ tự quit driver,
+        # tránh process thoát khi Chrome/chromedriver đang khởi động dở
+        for thread in launch_threads:
+            thread.join()
+        while True:
+            try:
+                driver = self._drivers.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                driver.quit()
+            except Exception as e:
+                print(f"DriverPool.close -> Failed to quit driver: {e}")
@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+
+class HistoryStore:
+    '''
+    Lưu lịch sử từng step của các task (DOM snapshot, markdown, prompt, TestStep) với bộ nhớ có giới hạn:
+    - Nội dung được lưu 1 lần theo sha256 (dedup: DOM/markdown lặp lại giữa các step chỉ tốn 1 bản) và nén zlib
+    - Tổng dung lượng blob nén trong RAM <= max_bytes, vượt thì đẩy blob ít dùng nhất ra spill_dir (nếu có) hoặc bỏ đi
+    - Chỉ giữ metadata của `max_tasks` task gần nhất
+    Ngoài ra dùng để memoize convert_to_md: memo(<hash DOM>) -> hash markdown.
+
+        history = HistoryStore(max_bytes=16 * 1024 * 1024, spill_dir=".cache/history")
+        processor = AgentProcessor(url, history_store=history)
+        history.get_task(history.find_tasks("login ...")[-1])
+    '''
+    DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+    DEFAULT_MAX_TASKS = 1000
+    DEFAULT_MAX_SPILL_BYTES = 1024 * 1024 * 1024
+    MAX_MEMO_ENTRIES = 10000
+    BLOB_FIELDS = ("dom", "markdown", "prompt")
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, spill_dir=None, max_tasks=DEFAULT_MAX_TASKS,
+                 max_spill_bytes=DEFAULT_MAX_SPILL_BYTES, compress_level=6):
+        self.max_bytes = max_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.max_tasks = max_tasks
+        self.max_spill_bytes = max_spill_bytes
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        self._blobs = OrderedDict() # {hash: zlib bytes} trong RAM, thứ tự LRU
+        self._spilled = OrderedDict() # {hash: size} đã ghi ra spill_dir
+        self._memo = OrderedDict() # {hash nguồn: hash kết quả}
+        self._tasks = OrderedDict() # {task_id: {"task", "started_at", "steps": {step: record}}}
+        self.memory_bytes = 0
+        self.spill_bytes = 0
+        self.stats = {"stored": 0, "deduplicated": 0, "raw_bytes": 0, "spilled": 0, "evicted": 0, "spill_reads": 0}
+        if self.spill_dir is not None:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def content_hash(content: str) -> str:
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def put_blob(self, content: str) -> str:
+        key = self.content_hash(content)
+        with self._lock:
+            if key in self._blobs:
+                self._blobs.move_to_end(key)
+                self.stats["deduplicated"] += 1
+                return key
+            if key in self._spilled:
+                self.stats["deduplicated"] += 1
+                return key
+            data = zlib.compress(content.encode('utf-8'), self.compress_level)
+            self._blobs[key] = data
+            self.memory_bytes += len(data)
+            self.stats["stored"] += 1
+            self.stats["raw_bytes"] += len(content)
+            self._enforce_budget()
+        return key
+
+    def get_blob(self, key) -> Optional[str]:
+        with self._lock:
+            data = self._blobs.get(key)
+            if data is not None:
+                self._blobs.move_to_end(key)
+            elif key in self._spilled:
+                data = self._read_spilled(key)
+        return zlib.decompress(data).decode('utf-8') if data is not None else None
+
+    def _enforce_budget(self):
+        # Đẩy blob ít dùng nhất ra đĩa (hoặc bỏ) tới khi RAM <= max_bytes; luôn giữ blob vừa thêm
+        while self.memory_bytes > self.max_bytes and len(self._blobs) > 1:
+            key, data = self._blobs.popitem(last=False)
+            self.memory_bytes -= len(data)
+            if self.spill_dir is not None:
+                (self.spill_dir / f"{key}.z").write_bytes(data)
+                self._spilled[key] = len(data)
+                self.spill_bytes += len(data)
+                self.stats["spilled"] += 1
+            else:
+                self.stats["evicted"] += 1
+
+        while self.spill_bytes > self.max_spill_bytes and self._spilled:
+            key, size = self._spilled.popitem(last=False)
+            self.spill_bytes -= size
+            self.stats["evicted"] += 1
+            try:
+                os.remove(self.spill_dir / f"{key}.z")
+            except OSError:
+                pass
+
+    def _read_spilled(self, key):
+        try:
+            data = (self.spill_dir / f"{key}.z").read_bytes()
+        except OSError:
+            self.spill_bytes -= self._spilled.pop(key, 0)
+            return None
+        self.stats["spill_reads"] += 1
+        return data
+
+    def memo_get(self, source_key) -> Optional[str]:
+        with self._lock:
+            target_key = self._memo.get(source_key)
+            if target_key is not None:
+                self._memo.move_to_end(source_key)
+        return self.get_blob(target_key) if target_key is not None else None
+
+    def memo_put(self, source_key, content: str) -> str:
+        target_key = self.put_blob(content)
+        with self._lock:
+            self._memo[source_key] = target_key
+            self._memo.move_to_end(source_key)
+            while len(self._memo) > self.MAX_MEMO_ENTRIES:
+                self._memo.popitem(last=False)
+        return target_key
+
+    def start_task(self, task_id, task):
+        with self._lock:
+            self._tasks[task_id] = {"task": task, "started_at": time.time(), "steps": {}}
+            while len(self._tasks) > self.max_tasks:
+                self._tasks.popitem(last=False)
+
+    def record_step(self, task_id, step, dom=None, markdown=None, prompt=None, test_step=None, **fields):
+        # Gộp thông tin vào record (task_id, step): DOM/markdown lúc snapshot, prompt lúc gọi LLM, TestStep lúc thực hiện
+        keys = {}
+        for name, content in (("dom", dom), ("markdown", markdown), ("prompt", prompt)):
+            if content is not None:
+                keys[name] = self.put_blob(content)
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return
+            record = task["steps"].setdefault(step, {"step": step, "time": time.time()})
+            record.update(keys)
+            if test_step is not None:
+                record["test_step"] = test_step.model_dump()
+            record.update(fields)
+
+    def find_tasks(self, task) -> List[str]:
+        with self._lock:
+            return [task_id for task_id, entry in self._tasks.items() if entry["task"] == task]
+
+    def get_step(self, task_id, step, include_content=True) -> Optional[dict]:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            record = dict(task["steps"][step]) if task is not None and step in task["steps"] else None
+        if record is not None and include_content:
+            for name in self.BLOB_FIELDS:
+                if name in record:
+                    record[name] = self.get_blob(record[name]) # None nếu đã bị bỏ khỏi store
+        return record
+
+    def get_task(self, task_id, include_content=False) -> Optional[dict]:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            steps = sorted(task["steps"])
+            result = {"task_id": task_id, "task": task["task"], "started_at": task["started_at"]}
+        result["steps"] = [self.get_step(task_id, step, include_content) for step in steps]
+        return result
+
+    def export_task(self, task_id, path):
+        # Ghi toàn bộ lịch sử 1 task (kèm nội dung) ra file JSON để debug
+        Path(path).write_text(json.dumps(self.get_task(task_id, include_content=True), ensure_ascii=False), encoding='utf-8')
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "tasks": len(self._tasks),
+                "blobs_in_memory": len(self._blobs),
+                "blobs_spilled": len(self._spilled),
+                "memory_bytes": self.memory_bytes,
+                "max_bytes": self.max_bytes,
+                "spill_bytes": self.spill_bytes,
+                "compression_ratio": self.stats["raw_bytes"] / max(1, self.memory_bytes + self.spill_bytes),
+            }
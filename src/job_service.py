@@ -0,0 +1,263 @@
+import json
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import List, Optional
+from src.agent import AgentProcessor
+from src.browser_profile import BrowserProfile
+from src.driver_pool import DriverPool
+from src.session_store import SessionStore
+from src.task_runner import ProcessorWorkerMixin
+from src.tracing import Span, Tracer
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    def __init__(self, retry_after_seconds):
+        super().__init__(f"Job queue is full, retry after {retry_after_seconds}s")
+        self.retry_after_seconds = retry_after_seconds
+
+
+class Job:
+    '''
+    1 job = 1 suite gồm các task chạy tuần tự trong cùng browser session (session được reset trước job).
+    Các event (trạng thái job, từng step) được giữ lại để client SSE kết nối muộn vẫn nhận đủ từ đầu.
+    '''
+
+    def __init__(self, url, tasks: List[str], setup_task=None):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.tasks = tasks
+        self.setup_task = setup_task # vd: login, khôi phục từ SessionStore nếu đã chạy trước đó
+        self.status = QUEUED
+        self.error = None
+        self.current_task = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events = []
+        self._condition = threading.Condition(threading.RLock())
+
+    @property
+    def done(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def publish(self, event_type, **data):
+        with self._condition:
+            self.events.append({"id": len(self.events), "type": event_type, "time": time.time(), "data": data})
+            self._condition.notify_all()
+
+    def finish(self, status, error=None):
+        # Đổi trạng thái và phát event cuối cùng trong cùng 1 lock để client SSE không kết thúc trước khi nhận event này
+        with self._condition:
+            self.status = status
+            self.error = error
+            self.finished_at = time.time()
+            self.publish(status, error=error)
+
+    def wait_for_events(self, after_id, timeout_seconds):
+        # Trả về các event có id > after_id, chờ tối đa timeout_seconds nếu chưa có event mới
+        with self._condition:
+            if len(self.events) <= after_id + 1 and not self.done:
+                self._condition.wait(timeout_seconds)
+            return self.events[after_id + 1:]
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "url": self.url,
+            "tasks": self.tasks,
+            "setup_task": self.setup_task,
+            "status": self.status,
+            "error": self.error,
+            "current_task": self.current_task,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_seconds": (self.started_at or time.time()) - self.created_at,
+            "run_seconds": (self.finished_at or time.time()) - self.started_at if self.started_at else None,
+            "event_count": len(self.events),
+        }
+
+
+class JobService(ProcessorWorkerMixin):
+    '''
+    Hàng đợi job có giới hạn + `workers` browser session chạy song song, mỗi session có AgentProcessor riêng.
+    submit() báo QueueFullError khi hàng đợi đầy (backpressure) thay vì để job chờ vô hạn.
+
+        service = JobService("https://swm.danghung.xyz/login/", workers=2, queue_size=20)
+        service.start()
+        job = service.submit(["login with username 'ttc-thao' and password '123'"])
+    '''
+    MAX_FINISHED_JOBS = 1000 # Số job đã xong giữ lại để tra trạng thái
+    METRICS_WINDOW = 1000 # Số job gần nhất dùng để tính latency
+
+    def __init__(self, url, workers=2, queue_size=20, max_tasks_per_driver=50, processor_kwargs=None,
+                 browser_profile: BrowserProfile = None, prewarm=True, session_store: SessionStore = None):
+        self.url = url
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_tasks_per_driver = max_tasks_per_driver
+        self.processor_kwargs = processor_kwargs or {}
+        self.browser_profile = browser_profile
+        self.session_store = session_store or SessionStore()
+        self.driver_pool = DriverPool(browser_profile, size=workers) if prewarm else None
+        self._pending = queue.Queue(maxsize=queue_size)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stopping = threading.Event()
+        self.started_at = time.time()
+        self._running = 0
+        self._counters = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0}
+        self._queue_seconds = deque(maxlen=self.METRICS_WINDOW)
+        self._run_seconds = deque(maxlen=self.METRICS_WINDOW)
+        self._finished_at = deque(maxlen=self.METRICS_WINDOW)
+
+    def start(self):
+        for worker_id in range(self.workers):
+            thread = threading.Thread(target=self._worker, args=(worker_id,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout_seconds=None):
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout_seconds)
+        if self.driver_pool is not None:
+            self.driver_pool.close()
+
+    def submit(self, tasks: List[str], url=None, setup_task=None) -> Job:
+        if not isinstance(tasks, list) or not tasks or not all(isinstance(task, str) and task.strip() for task in tasks):
+            raise ValueError("tasks must be a non-empty list of non-empty strings")
+        if setup_task is not None and not (isinstance(setup_task, str) and setup_task.strip()):
+            raise ValueError("setup_task must be a non-empty string")
+        job = Job(url or self.url, tasks, setup_task)
+        # Đăng ký job và publish "queued" trước khi đưa vào hàng đợi để worker không publish "running" trước "queued"
+        with self._lock:
+            self._jobs[job.id] = job
+        job.publish(QUEUED, position=self._pending.qsize() + 1)
+        try:
+            self._pending.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+                self._counters["rejected"] += 1
+            raise QueueFullError(self._estimate_retry_after())
+        with self._lock:
+            self._counters["submitted"] += 1
+            self._trim_jobs()
+        return job
+
+    def get_job(self, job_id) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _trim_jobs(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _estimate_retry_after(self):
+        # Thời gian ước tính để giải phóng 1 chỗ trong hàng đợi
+        with self._lock:
+            average = sum(self._run_seconds) / len(self._run_seconds) if self._run_seconds else 5.0
+        return max(1, int(average * max(1, self._pending.qsize()) / self.workers))
+
+    def _create_processor(self, job_ref) -> AgentProcessor:
+        # Tracer hook chuyển span thành event của job đang chạy trên worker này
+        def publish_span(span: Span):
+            job = job_ref.get("job")
+            if job is None or span.phase not in ("llm", "action", "task"):
+                return
+            job.publish(span.phase, step=span.step, outcome=span.outcome, duration_ms=span.duration_ms,
+                        error=span.error, **{key: value for key, value in span.attributes.items() if self._is_json(value)})
+
+        tracer = Tracer(hooks=[publish_span], print_summary=False)
+        return self._new_processor(tracer=tracer, session_store=self.session_store)
+
+    @staticmethod
+    def _is_json(value):
+        try:
+            json.dumps(value)
+            return True
+        except (TypeError, ValueError):
+            return False
+
+    def _worker(self, worker_id):
+        processor = None
+        tasks_on_driver = 0
+        job_ref = {"job": None}
+
+        while not self._stopping.is_set():
+            try:
+                job = self._pending.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            job.started_at = time.time()
+            job.status = RUNNING
+            job_ref["job"] = job
+            with self._lock:
+                self._running += 1
+                self._queue_seconds.append(job.started_at - job.created_at)
+            job.publish(RUNNING, worker_id=worker_id)
+
+            try:
+                # Tạo lại driver sau K job hoặc khi driver bị crash
+                if processor is not None and (tasks_on_driver >= self.max_tasks_per_driver or not processor.selenium_utils.is_driver_alive()):
+                    self._close_processor(processor)
+                    processor = None
+                if processor is None:
+                    processor = self._create_processor(job_ref)
+                    tasks_on_driver = 0
+                tasks_on_driver += 1
+
+                if job.setup_task:
+                    job.publish("setup", task=job.setup_task, result=processor.ensure_setup(job.setup_task, job.url))
+                else:
+                    processor.selenium_utils.reset_session(job.url)
+                for task in job.tasks:
+                    job.current_task = task
+                    job.publish("task_started", task=task)
+                    if processor.execute_task(task) != "finished":
+                        raise Exception(f"Task '{task}' stopped before the model returned finish")
+                status, error = SUCCEEDED, None
+            except Exception as e:
+                status, error = FAILED, str(e)
+                print(f"JobService._worker -> worker {worker_id} failed job {job.id}: {e}")
+
+            job_ref["job"] = None
+            job.finish(status, error)
+            with self._lock:
+                self._running -= 1
+                self._counters[status] += 1
+                self._run_seconds.append(job.finished_at - job.started_at)
+                self._finished_at.append(job.finished_at)
+
+        self._close_processor(processor, refill=False)
+
+    def get_metrics(self) -> dict:
+        now = time.time()
+        with self._lock:
+            queue_seconds = sorted(self._queue_seconds)
+            run_seconds = list(self._run_seconds)
+            finished_last_minute = sum(1 for finished_at in self._finished_at if now - finished_at <= 60)
+            return {
+                **self._counters,
+                "queued": self._pending.qsize(),
+                "queue_capacity": self.queue_size,
+                "running": self._running,
+                "workers": self.workers,
+                "uptime_seconds": now - self.started_at,
+                "jobs_per_minute": finished_last_minute,
+                "queue_seconds_avg": sum(queue_seconds) / len(queue_seconds) if queue_seconds else 0.0,
+                "queue_seconds_p95": queue_seconds[min(len(queue_seconds) - 1, int(len(queue_seconds) * 0.95))] if queue_seconds else 0.0,
+                "run_seconds_avg": sum(run_seconds) / len(run_seconds) if run_seconds else 0.0,
+            }
@@ -1,12 +1,18 @@
 import os
+import asyncio
+import threading
+import weakref
 from pathlib import Path
 from typing import List, Literal, Optional
-import time
-from pydantic import BaseModel, ValidationError, validator
+import httpx
+from pydantic import BaseModel, Field, ValidationError, validator
 from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessagesTypeAdapter
 from pydantic_ai.models.openai import OpenAIModel
 from pydantic_ai.providers.openai import OpenAIProvider
-from src.config import DEFAUL_SYSTEM_PROMPT
+from src.config import DEFAUL_SYSTEM_PROMPT, BATCH_SYSTEM_PROMPT
+from src.response_cache import ResponseCache
+from src.retry_policy import RetryPolicy, RateLimiter, CircuitBreaker, CircuitOpenError, classify_error, get_retry_after, RATE_LIMITED, TRANSIENT
 from dotenv import load_dotenv
 
 
@@ -22,6 +28,11 @@ class TestStep(BaseModel):
         return self.action == other.action and self.text == other.text
 
 
+class TestPlan(BaseModel):
+    # Batch mode: các step liên tiếp thực hiện được trên màn hình hiện tại
+    steps: List[TestStep] = Field(min_length=1)
+
+
 class Model:
     # Load environment variables from .env file
     path_to_env_file = Path(__file__).parent.parent / '.env'
@@ -29,39 +40,191 @@ class Model:
 
     gpt_api_key = os.getenv("OPENAI_API_KEY")
     gpt_model = os.getenv("GPT_MODEL", "o4-mini")
+    gpt_base_url = os.getenv("OPENAI_BASE_URL")
+    gpt_requests_per_minute = os.getenv("OPENAI_REQUESTS_PER_MINUTE")
+    gpt_tokens_per_minute = os.getenv("OPENAI_TOKENS_PER_MINUTE")
+
+    # Retry policy, rate limiter và circuit breaker dùng chung cho mọi session trong process
+    retry_policy = RetryPolicy()
+    rate_limiter = RateLimiter(
+        int(gpt_requests_per_minute) if gpt_requests_per_minute else None,
+        int(gpt_tokens_per_minute) if gpt_tokens_per_minute else None
+    )
+    circuit_breaker = CircuitBreaker()
+
+    MAX_CONNECTIONS = 20
+    REQUEST_TIMEOUT_SECONDS = 120
 
-    def __init__(self):
+    # HTTP connection pool + Agent dùng chung cho mọi Model trong cùng 1 event loop
+    # {<event loop>: {"http_client": httpx.AsyncClient, "agents": {<model, base_url, api_key, system_prompt, output_type>: Agent}}}
+    _shared_clients = weakref.WeakKeyDictionary()
+    # Event loop riêng của từng thread cho get_action/get_actions (bản sync)
+    _thread_loops = threading.local()
+
+    def __init__(self, model_name=None, base_url=None, api_key=None, response_cache: ResponseCache = None):
         self.system_prompt = DEFAUL_SYSTEM_PROMPT
+        self.model_name = model_name or self.gpt_model
+        self.base_url = base_url or self.gpt_base_url
+        self.api_key = api_key or self.gpt_api_key
+        self.response_cache = response_cache # ResponseCache: trả lại TestStep đã có cho cùng prompt (None = tắt)
+        self.last_call_stats = {}
+
+    def _get_agent(self, output_type=TestStep, system_prompt=None) -> Agent:
+        system_prompt = system_prompt or self.system_prompt
+        loop = asyncio.get_running_loop()
+        shared = self._shared_clients.get(loop)
+        if shared is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.MAX_CONNECTIONS, max_keepalive_connections=self.MAX_CONNECTIONS),
+                timeout=httpx.Timeout(self.REQUEST_TIMEOUT_SECONDS, connect=10)
+            )
+            shared = {"http_client": http_client, "agents": {}}
+            self._shared_clients[loop] = shared
+
+        key = (self.model_name, self.base_url, self.api_key, system_prompt, output_type)
+        agent = shared["agents"].get(key)
+        if agent is None:
+            llm_model = OpenAIModel(
+                model_name=self.model_name,
+                provider=OpenAIProvider(base_url=self.base_url, api_key=self.api_key, http_client=shared["http_client"])
+            )
+            agent = Agent(
+                llm_model,
+                output_type=output_type,
+                system_prompt=system_prompt
+            )
+            shared["agents"][key] = agent
+        return agent
+
+    @classmethod
+    async def close_shared_clients(cls):
+        # Đóng connection pool của event loop hiện tại
+        shared = cls._shared_clients.pop(asyncio.get_running_loop(), None)
+        if shared is not None:
+            await shared["http_client"].aclose()
+
+    @classmethod
+    def _get_event_loop(cls):
+        # Mỗi thread (worker, request Flask/SSE...) có 1 event loop riêng tạo bằng new_event_loop và dùng lại giữa các lần gọi,
+        # nên agent/connection pool cache theo loop (_shared_clients) được giữ giữa các lần gọi sync trong cùng thread
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("Model.get_action -> Called from a running event loop, use get_action_async/get_actions_async instead")
+
+        loop = getattr(cls._thread_loops, "loop", None)
+        if loop is None or loop.is_closed():
+            loop = asyncio.new_event_loop()
+            cls._thread_loops.loop = loop
+        return loop
+
+    def get_action(self, user_prompt: str, message_history: Optional[list] = None) -> Optional[TestStep]:
+        # message_history: hội thoại trước đó của task (dùng cho delta prompt), được nối thêm message mới khi thành công
+        return self._get_event_loop().run_until_complete(self.get_action_async(user_prompt, message_history))
+
+    async def get_action_async(self, user_prompt: str, message_history: Optional[list] = None) -> Optional[TestStep]:
+        return await self._run_cached(TestStep, self.system_prompt, user_prompt, message_history)
+
+    def get_actions(self, user_prompt: str, message_history: Optional[list] = None) -> List[TestStep]:
+        return self._get_event_loop().run_until_complete(self.get_actions_async(user_prompt, message_history))
 
-    def get_action(self, user_prompt: str) -> Optional[TestStep]:
-        # Instantiate OpenAI client
-        llm_model = OpenAIModel(
-            model_name='o4-mini',
-            provider=OpenAIProvider(api_key=self.gpt_api_key)
-        )
-
-        # Create a new agent
-        agent = Agent(
-            llm_model,
-            output_type=TestStep,
-            system_prompt=self.system_prompt
-        )
-
-        max_retries = 5
-        attempts = 0
-        # formatted = True
-        # css_id_used = True
+    async def get_actions_async(self, user_prompt: str, message_history: Optional[list] = None) -> List[TestStep]:
+        # Batch mode: model trả về danh sách step có thể thực hiện liên tiếp trên màn hình hiện tại
+        plan = await self._run_cached(TestPlan, self.system_prompt + BATCH_SYSTEM_PROMPT, user_prompt, message_history)
+        return plan.steps
 
+    async def _run_cached(self, output_type, system_prompt, user_prompt: str, message_history: Optional[list] = None):
+        cache = self.response_cache
+        if cache is None:
+            return await self._run_agent(self._get_agent(output_type, system_prompt), system_prompt, user_prompt, message_history)
+
+        key = cache.make_key(self.model_name, system_prompt, output_type.__name__, self._describe_history(message_history), user_prompt)
+        cached = cache.get(key)
+        if cached is not None:
+            output_json, messages_json = cached
+            if message_history is not None:
+                message_history.extend(ModelMessagesTypeAdapter.validate_json(messages_json))
+            self.last_call_stats = {"attempts": 0, "retries": 0, "last_error_class": None, "cache_hit": True}
+            return output_type.model_validate_json(output_json)
+
+        new_messages = []
+        output = await self._run_agent(self._get_agent(output_type, system_prompt), system_prompt, user_prompt, message_history, new_messages)
+        cache.put(key, self.model_name, output.model_dump_json(), ModelMessagesTypeAdapter.dump_json(new_messages))
+        self.last_call_stats["cache_hit"] = False
+        return output
+
+    @staticmethod
+    def _get_cached_tokens(usage) -> Optional[int]:
+        # Số prompt token provider lấy từ prompt cache (OpenAI: prompt_tokens_details.cached_tokens)
+        cached_tokens = getattr(usage, "cache_read_tokens", None)
+        if cached_tokens is None:
+            cached_tokens = (getattr(usage, "details", None) or {}).get("cached_tokens")
+        return cached_tokens
+
+    @staticmethod
+    def _describe_history(message_history: Optional[list]) -> str:
+        # Chỉ lấy prompt của user và tool call của model (bỏ timestamp, id...) để key ổn định giữa các lần chạy
+        if not message_history:
+            return ""
+        parts = []
+        for message in message_history:
+            for part in message.parts:
+                if part.part_kind == "user-prompt":
+                    parts.append(str(part.content))
+                elif part.part_kind == "tool-call":
+                    parts.append(f"{part.tool_name}:{part.args_as_json_str()}")
+        return "\n".join(parts)
+
+    async def _run_agent(self, agent: Agent, system_prompt: str, user_prompt: str, message_history: Optional[list] = None,
+                         new_messages: Optional[list] = None):
+        # system_prompt: system prompt của chính agent được gọi (batch mode dài hơn self.system_prompt)
+        estimated_tokens = (len(system_prompt) + len(user_prompt)) // 4
+
+        attempt = 0
+        error_class = None
         while True:
-            if attempts > max_retries:
-                raise Exception("Model.get_action -> Max retries reached")
+            attempt += 1
+            # Số liệu của lần gọi gần nhất cho tracing (AgentProcessor gắn vào span "llm")
+            self.last_call_stats = {"attempts": attempt, "retries": attempt - 1, "last_error_class": error_class}
             try:
-                result = agent.run_sync(user_prompt)
-                return result.output
-            except ValidationError as e: # llm response có follow TestStep structure không?
-                print("Model.get_action -> Validation error:", e)
+                self.circuit_breaker.before_call()
+            except CircuitOpenError as e:
+                raise Exception(f"Model.get_action -> {e}")
+
+            wait_seconds = self.rate_limiter.reserve(estimated_tokens)
+            if wait_seconds:
+                await asyncio.sleep(wait_seconds)
+
+            try:
+                result = await agent.run(user_prompt, message_history=message_history or None)
             except Exception as e:
-                print("Model.get_action -> An error occurred:", e)
-    
-            attempts += 1
-            time.sleep(1)
+                error_class = classify_error(e)
+                if error_class == TRANSIENT:
+                    self.circuit_breaker.record_failure()
+                else:
+                    self.circuit_breaker.record_success() # provider vẫn trả lời được
+
+                retry_after = get_retry_after(e)
+                if error_class == RATE_LIMITED and retry_after is not None:
+                    self.rate_limiter.block_for(retry_after)
+
+                print(f"Model.get_action -> {error_class} error on attempt {attempt}:", e)
+                if not self.retry_policy.should_retry(error_class, attempt):
+                    raise Exception(f"Model.get_action -> Giving up after {attempt} attempts ({error_class})")
+                await asyncio.sleep(self.retry_policy.get_delay(error_class, attempt, retry_after))
+                continue
+
+            self.circuit_breaker.record_success()
+            usage = result.usage()
+            self.last_call_stats.update(
+                request_tokens=getattr(usage, "request_tokens", None),
+                response_tokens=getattr(usage, "response_tokens", None),
+                cached_tokens=self._get_cached_tokens(usage)
+            )
+            if message_history is not None:
+                message_history.extend(result.new_messages())
+            if new_messages is not None:
+                new_messages.extend(result.new_messages())
+            return result.output
@@ -0,0 +1,70 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import List, Optional
+from src.model import TestStep
+
+
+class PlanCache:
+    '''
+    Cache persistent (file JSON) lưu chuỗi TestStep của các lần execute_task thành công,
+    key = hash(task + fingerprint của trang lúc bắt đầu). Mỗi step lưu kèm fingerprint của trang ngay trước khi thực hiện
+    để khi replay có thể phát hiện trang đã khác và quay lại dùng LLM.
+    '''
+    DEFAULT_PATH = Path(__file__).parent.parent / '.cache' / 'plan_cache.json'
+    DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+
+    def __init__(self, path=None, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.path = Path(path or os.getenv("PLAN_CACHE_PATH") or self.DEFAULT_PATH)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._plans = self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            print(f"PlanCache._load -> Ignoring unreadable cache file {self.path}: {e}")
+            return {}
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix('.tmp')
+        temp_path.write_text(json.dumps(self._plans), encoding='utf-8')
+        os.replace(temp_path, self.path)
+
+    @staticmethod
+    def _key(task, start_fingerprint):
+        return hashlib.sha256(f"{task}\n{start_fingerprint}".encode('utf-8')).hexdigest()
+
+    def get(self, task, start_fingerprint) -> Optional[List[dict]]:
+        # Trả về [{"step": TestStep, "fingerprint": <fingerprint trang trước step>}] hoặc None
+        with self._lock:
+            plan = self._plans.get(self._key(task, start_fingerprint))
+            if plan is None:
+                return None
+            if time.time() - plan["created_at"] > self.ttl_seconds:
+                del self._plans[self._key(task, start_fingerprint)]
+                self._save()
+                return None
+            return [{"step": TestStep(**entry["step"]), "fingerprint": entry["fingerprint"]} for entry in plan["steps"]]
+
+    def put(self, task, start_fingerprint, steps):
+        # steps: [{"step": TestStep, "fingerprint": <fingerprint trang trước step>}]
+        with self._lock:
+            self._plans[self._key(task, start_fingerprint)] = {
+                "task": task,
+                "created_at": time.time(),
+                "steps": [{"step": entry["step"].model_dump(), "fingerprint": entry["fingerprint"]} for entry in steps]
+            }
+            self._save()
+
+    def invalidate(self, task, start_fingerprint):
+        with self._lock:
+            if self._plans.pop(self._key(task, start_fingerprint), None) is not None:
+                self._save()
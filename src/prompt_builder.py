@@ -0,0 +1,125 @@
+import re
+from typing import Optional
+import tiktoken
+from src.dom_analyzer import ATTRIBUTE_PATTERN
+
+INTERACTIVE_ELEMENT_PATTERN = re.compile(r'<(li|button|input|textarea|a) (id="[^"]*"[^>]*)>(.*?)</\1>', re.S)
+WORD_PATTERN = re.compile(r'\w+')
+
+OMITTED_ELEMENTS_NOTE = "(@@@count@@@ less relevant elements were omitted to fit the prompt budget, scroll or ask again if the target is missing)"
+
+
+class PromptBuilder:
+    '''
+    Đếm token cho từng phần của prompt và cắt bớt markdown của trang khi vượt token_budget:
+    các phần tử interactive được xếp hạng theo mức liên quan tới task (label, placeholder, name, text và text xung quanh),
+    giữ lại các phần tử liên quan nhất theo đúng thứ tự trên trang, phần còn lại được tóm tắt thành 1 dòng.
+    '''
+    LABEL_ATTRS = ('aria-label', 'placeholder', 'name', 'title', 'value', 'data-value')
+    FORM_CONTROL_TAGS = {'input', 'textarea', 'button'}
+    CONTEXT_WORDS = 12
+    STOPWORDS = {'the', 'and', 'on', 'in', 'to', 'of', 'with', 'for', 'a', 'an', 'go', 'click', 'enter', 'type',
+                 'into', 'at', 'is', 'then', 'field', 'button', 'page'}
+
+    def __init__(self, token_budget: Optional[int] = None, model_name: str = "o4-mini"):
+        self.token_budget = token_budget
+        self.encoding = self._load_encoding(model_name)
+
+    @staticmethod
+    def _load_encoding(model_name):
+        # Model tiktoken không biết (vd: model giả lập) -> o200k_base; không tải được file BPE (offline) -> ước lượng 4 ký tự/token
+        try:
+            try:
+                return tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                return tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            print(f"PromptBuilder._load_encoding -> Falling back to approximate token counts: {e}")
+            return None
+
+    def count_tokens(self, text):
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def count_history_tokens(self, message_history) -> int:
+        # Token của message_history (pydantic_ai ModelMessage) gửi kèm lượt này. Bỏ system prompt vì đã tính riêng
+        if not message_history:
+            return 0
+        tokens = 0
+        for message in message_history:
+            for part in message.parts:
+                if part.part_kind == "system-prompt":
+                    continue
+                if part.part_kind == "tool-call":
+                    text = part.tool_name + part.args_as_json_str()
+                elif part.part_kind == "tool-return":
+                    text = part.model_response_str()
+                elif part.part_kind == "retry-prompt":
+                    text = part.model_response()
+                else:
+                    text = part.content if isinstance(part.content, str) else str(part.content)
+                tokens += self.count_tokens(text)
+        return tokens
+
+    def _terms(self, text):
+        return {word for word in WORD_PATTERN.findall(text.lower()) if len(word) > 1 and word not in self.STOPWORDS}
+
+    def _split_elements(self, markdown):
+        # Tách markdown thành các phần tử interactive kèm text đứng ngay trước nó (ngữ cảnh, vd: label)
+        elements = []
+        position = 0
+        for match in INTERACTIVE_ELEMENT_PATTERN.finditer(markdown):
+            preceding_words = markdown[position:match.start()].split()
+            elements.append({
+                "tag": match.group(1),
+                "markup": match.group(0),
+                "attributes": dict(ATTRIBUTE_PATTERN.findall(match.group(2))),
+                "text": match.group(3),
+                "context": ' '.join(preceding_words[-self.CONTEXT_WORDS:])
+            })
+            position = match.end()
+        return elements
+
+    def _score(self, element, task_terms):
+        labels = ' '.join(element["attributes"].get(attr, '') for attr in self.LABEL_ATTRS)
+        score = 3 * len(task_terms & self._terms(labels))
+        score += 2 * len(task_terms & self._terms(element["text"]))
+        score += len(task_terms & self._terms(element["context"]))
+        if element["tag"] in self.FORM_CONTROL_TAGS:
+            score += 0.1
+        return score
+
+    def fit_markdown(self, task, markdown, reserved_tokens=0):
+        # Trả về (markdown, report). markdown giữ nguyên nếu vừa budget
+        markdown_tokens = self.count_tokens(markdown)
+        report = {"markdown_tokens": markdown_tokens, "elements_kept": None, "elements_dropped": 0}
+        if self.token_budget is None or reserved_tokens + markdown_tokens <= self.token_budget:
+            return markdown, report
+
+        elements = self._split_elements(markdown)
+        task_terms = self._terms(task)
+        ranked = sorted(range(len(elements)), key=lambda index: self._score(elements[index], task_terms), reverse=True)
+
+        available = self.token_budget - reserved_tokens - self.count_tokens(OMITTED_ELEMENTS_NOTE)
+        kept = set()
+        used = 0
+        for index in ranked:
+            element = elements[index]
+            cost = self.count_tokens(element["context"] + ' ' + element["markup"])
+            if used + cost > available:
+                continue
+            kept.add(index)
+            used += cost
+
+        parts = []
+        for index in sorted(kept):
+            element = elements[index]
+            parts.append(f'{element["context"]} {element["markup"]}'.strip())
+        dropped = len(elements) - len(kept)
+        if dropped:
+            parts.append(OMITTED_ELEMENTS_NOTE.replace("@@@count@@@", str(dropped)))
+
+        trimmed = ' '.join(parts)
+        report.update({"markdown_tokens": self.count_tokens(trimmed), "elements_kept": len(kept), "elements_dropped": dropped})
+        return trimmed, report
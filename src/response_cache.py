@@ -0,0 +1,111 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+RECORD = "record" # Luôn gọi LLM và ghi đè kết quả vào cache
+REPLAY = "replay" # Dùng kết quả trong cache nếu có, nếu không thì gọi LLM và lưu lại
+BYPASS = "bypass" # Không đọc/ghi cache
+CACHE_MODES = (RECORD, REPLAY, BYPASS)
+
+
+class ResponseCache:
+    '''
+    Cache persistent (SQLite) cho response của LLM, key = hash(model, system prompt, output type, lịch sử hội thoại, user prompt).
+    Lưu TestStep/TestPlan đã validate cùng các message mới của lần gọi đó để message_history vẫn đúng khi replay.
+    Entry quá `ttl_seconds` bị bỏ qua, tổng dung lượng vượt `max_bytes` thì xoá các entry lâu không dùng nhất.
+
+        cache = ResponseCache(mode="replay")
+        processor = AgentProcessor(url, response_cache=cache)
+    '''
+    DEFAULT_PATH = Path(__file__).parent.parent / '.cache' / 'llm_responses.sqlite3'
+    DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+    DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, path=None, mode=None, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = Path(path or os.getenv("LLM_CACHE_PATH") or self.DEFAULT_PATH)
+        self.mode = mode or os.getenv("LLM_CACHE_MODE", REPLAY)
+        if self.mode not in CACHE_MODES:
+            raise ValueError(f"Unsupported cache mode '{self.mode}', expected one of {CACHE_MODES}")
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "expired": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, output TEXT, messages BLOB, size INTEGER, created_at REAL, last_used_at REAL)"
+            )
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        text = "\n\x1f".join(str(part) for part in parts)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    @property
+    def reads_enabled(self):
+        return self.mode == REPLAY
+
+    @property
+    def writes_enabled(self):
+        return self.mode != BYPASS
+
+    def get(self, key) -> Optional[Tuple[str, bytes]]:
+        # Trả về (output json, messages json) hoặc None
+        if not self.reads_enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute("SELECT output, messages, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[2] > self.ttl_seconds:
+                with self._connection:
+                    self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.stats["expired"] += 1
+                row = None
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            with self._connection:
+                self._connection.execute("UPDATE responses SET last_used_at = ? WHERE key = ?", (now, key))
+            self.stats["hits"] += 1
+        return row[0], row[1]
+
+    def put(self, key, model, output: str, messages: bytes):
+        if not self.writes_enabled:
+            return
+        now = time.time()
+        size = len(output) + len(messages)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, model, output, messages, size, created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, output, messages, size, now, now)
+            )
+            self.stats["writes"] += 1
+            self.stats["expired"] += self._connection.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)).rowcount
+            self._evict()
+
+    def _evict(self):
+        # Xoá entry lâu không dùng nhất tới khi tổng dung lượng <= max_bytes
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._connection.execute("SELECT key, size FROM responses ORDER BY last_used_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.stats["evictions"] += 1
+
+    def get_stats(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {**self.stats, "hit_rate": self.stats["hits"] / lookups if lookups else 0.0}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,160 @@
+import time
+import random
+import threading
+from typing import Optional
+import httpx
+import openai
+from pydantic import ValidationError
+from pydantic_ai.exceptions import ModelHTTPError, UnexpectedModelBehavior
+
+# Phân loại lỗi khi gọi LLM
+INVALID_OUTPUT = "invalid_output" # response không đúng cấu trúc TestStep -> retry ngay
+RATE_LIMITED = "rate_limited" # 429 -> backoff, tôn trọng Retry-After, tạm dừng mọi session
+TRANSIENT = "transient" # lỗi mạng / 5xx -> backoff, tính vào circuit breaker
+FATAL = "fatal" # 4xx khác (sai key, request sai...) hoặc lỗi không xác định (bug: TypeError, AttributeError...) -> không retry
+
+# Lỗi mạng/timeout (APITimeoutError là subclass của APIConnectionError, httpx.TimeoutException của TransportError)
+TRANSIENT_ERROR_TYPES = (openai.APIConnectionError, httpx.TransportError, ConnectionError, TimeoutError)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def classify_error(error: Exception) -> str:
+    if isinstance(error, (ValidationError, UnexpectedModelBehavior)):
+        return INVALID_OUTPUT
+    if isinstance(error, openai.RateLimitError):
+        return RATE_LIMITED
+    if isinstance(error, TRANSIENT_ERROR_TYPES):
+        return TRANSIENT
+
+    status_code = getattr(error, 'status_code', None)
+    if isinstance(error, (ModelHTTPError, openai.APIStatusError)) and status_code is not None:
+        if status_code == 429:
+            return RATE_LIMITED
+        if status_code >= 500 or status_code in (408, 409):
+            return TRANSIENT
+        return FATAL
+    return FATAL
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    # pydantic_ai bọc openai.APIStatusError trong ModelHTTPError -> lấy header từ lỗi gốc
+    for candidate in (error, error.__cause__):
+        response = getattr(candidate, 'response', None)
+        headers = getattr(response, 'headers', None)
+        if not headers:
+            continue
+        value = headers.get('retry-after-ms')
+        if value is not None:
+            try:
+                return float(value) / 1000
+            except ValueError:
+                pass
+        value = headers.get('retry-after')
+        if value is not None:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    return None
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=6, base_delay=0.5, max_delay=30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, error_class, attempt):
+        # attempt: số lần đã gọi (bắt đầu từ 1)
+        return error_class != FATAL and attempt < self.max_attempts
+
+    def get_delay(self, error_class, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        if error_class == INVALID_OUTPUT:
+            return 0.0
+        # Exponential backoff với full jitter để các session không retry cùng lúc
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.available = float(self.capacity)
+        self.updated_at = time.monotonic()
+
+    def reserve(self, amount, now):
+        # Giữ chỗ `amount` (có thể làm available âm), trả về số giây cần chờ trước khi dùng
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+        self.available -= min(amount, self.capacity)
+        return 0.0 if self.available >= 0 else -self.available / self.rate_per_second
+
+
+class RateLimiter:
+    '''
+    Giới hạn requests/phút và tokens/phút dùng chung cho mọi session trong process.
+    reserve() trả về thời gian cần chờ, caller tự sleep (time.sleep hoặc asyncio.sleep).
+    '''
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=0):
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self.blocked_until - now)
+            if self.request_bucket is not None:
+                wait = max(wait, self.request_bucket.reserve(1, now))
+            if self.token_bucket is not None and tokens:
+                wait = max(wait, self.token_bucket.reserve(tokens, now))
+            return wait
+
+    def block_for(self, seconds):
+        # Provider trả về Retry-After -> mọi session cùng chờ
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    '''
+    Mở mạch sau `failure_threshold` lỗi TRANSIENT liên tiếp: mọi lời gọi fail ngay trong `reset_timeout` giây,
+    sau đó cho 1 lời gọi thử (half-open), thành công thì đóng mạch lại.
+    '''
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_progress = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_in_progress:
+                raise CircuitOpenError("LLM provider circuit is open, skipping call")
+            self.trial_in_progress = True
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.trial_in_progress = False
+            if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
@@ -1,74 +1,318 @@
+import json
+import time
 import textwrap
-from selenium import webdriver
+from typing import List
+from pydantic import BaseModel
 from selenium.webdriver import Keys
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import WebDriverException, NoSuchElementException
+from selenium.common.exceptions import WebDriverException, NoSuchElementException, TimeoutException
 from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from src.browser_profile import BrowserProfile
+
+
+class PageSnapshot(BaseModel):
+    mode: str = "html"
+    html: str = ""
+    records: List[dict] = []
+    element_count: int
+    visible_count: int
+    payload_bytes: int = 0
+    script_ms: float
+    round_trip_ms: float
+
+
+class PageDelta(BaseModel):
+    mode: str = "html"
+    full_snapshot_required: bool
+    reason: str = ""
+    html: str = ""
+    records: List[dict] = []
+    removed_ids: List[str] = []
+    added_count: int = 0
+    removed_count: int = 0
+    changed_count: int = 0
+    payload_bytes: int = 0
+    script_ms: float
+    round_trip_ms: float
+
 
 class SeleniumUtils:
-    DRIVER_TIMEOUT_SECONDS = 120
+    DRIVER_TIMEOUT_SECONDS = 120 # Timeout load trang
+    ELEMENT_TIMEOUT_SECONDS = 5 # Timeout tìm phần tử (thay cho implicit wait 120s)
+    SETTLE_QUIET_MS = 300 # Trang được coi là ổn định khi không có mutation/request nào trong khoảng này
+    SETTLE_TIMEOUT_SECONDS = 10
     EMPTY_HTML_DOCUMENT = "<html><head></head><body></body></html>"
+    SNAPSHOT_MODES = ("html", "records")
 
-    def __init__(self):
-        self.driver = self._initialize_driver()
+    def __init__(self, element_timeout=None, settle_quiet_ms=None, settle_timeout=None, profile: BrowserProfile = None,
+                 driver_pool=None, verbose=False):
+        self.element_timeout = element_timeout if element_timeout is not None else self.ELEMENT_TIMEOUT_SECONDS
+        self.settle_quiet_ms = settle_quiet_ms if settle_quiet_ms is not None else self.SETTLE_QUIET_MS
+        self.settle_timeout = settle_timeout if settle_timeout is not None else self.SETTLE_TIMEOUT_SECONDS
+        self.profile = profile or (driver_pool.profile if driver_pool is not None else BrowserProfile())
+        self.timings = {"startup_ms": 0.0, "warm_start": False, "page_load_count": 0, "page_load_ms_total": 0.0, "last_page_load_ms": 0.0}
+        self.driver_pool = driver_pool
+        self.verbose = verbose # True: in thời gian chờ phần tử/trang và kích thước snapshot ở mỗi step
+        self.driver = self._initialize_driver(driver_pool)
         self.url = None
+        self.fresh_page_url = None # url vừa được connect_driver mở và chưa bị thao tác gì -> reset_session không cần load lại
 
-    def _initialize_driver(self):
-        driver = webdriver.Chrome(options=Options())
-        driver.set_window_size(1920, 1080)
-        driver.implicitly_wait(self.DRIVER_TIMEOUT_SECONDS)
+    def _initialize_driver(self, driver_pool=None):
+        # Lấy driver đã khởi động sẵn từ pool nếu có, nếu không thì khởi động Chrome theo profile
+        started_at = time.perf_counter()
+        if driver_pool is not None:
+            driver, self.timings["warm_start"] = driver_pool.acquire()
+        else:
+            driver = self.profile.create_driver()
+        # Không dùng implicit wait: selector sai phải fail ngay thay vì chặn find_element 120s
+        driver.implicitly_wait(0)
+        driver.set_page_load_timeout(self.DRIVER_TIMEOUT_SECONDS)
+        driver.set_script_timeout(self.settle_timeout + 5)
+        self.timings["startup_ms"] = (time.perf_counter() - started_at) * 1000
+        print(f"SeleniumUtils._initialize_driver -> {'warm' if self.timings['warm_start'] else 'cold'} driver ready in {self.timings['startup_ms']:.0f} ms")
         return driver
 
     def _load_initial_page(self):
+        started_at = time.perf_counter()
         try:
             self.driver.get(self.url)
         except WebDriverException:
             raise Exception(f"URL '{self.url}' is not reachable.")
         if self.driver.page_source == self.EMPTY_HTML_DOCUMENT:
             raise Exception(f"URL '{self.url}' is not reachable.")
+        self.wait_for_page_settled()
+        page_load_ms = (time.perf_counter() - started_at) * 1000
+        self.timings["page_load_count"] += 1
+        self.timings["page_load_ms_total"] += page_load_ms
+        self.timings["last_page_load_ms"] = page_load_ms
+        print(f"SeleniumUtils._load_initial_page -> '{self.url}' loaded and settled in {page_load_ms:.0f} ms")
+
+    def _find_element(self, css_selector, clickable=False):
+        # Chờ phần tử xuất hiện tối đa element_timeout giây, không thấy thì báo lỗi ngay
+        started_at = time.perf_counter()
+        condition = EC.element_to_be_clickable if clickable else EC.presence_of_element_located
+        try:
+            element = WebDriverWait(self.driver, self.element_timeout, poll_frequency=0.1).until(condition((By.CSS_SELECTOR, css_selector)))
+        except TimeoutException:
+            raise NoSuchElementException(f"Element '{css_selector}' not found after {self.element_timeout}s")
+        if self.verbose:
+            print(f"SeleniumUtils._find_element -> '{css_selector}' ready in {(time.perf_counter() - started_at) * 1000:.0f} ms")
+        return element
+
+    def wait_for_page_settled(self, quiet_ms=None, timeout_seconds=None):
+        # Chờ tới khi: document ready, không còn fetch/XHR đang chạy và không có DOM mutation trong quiet_ms
+        quiet_ms = quiet_ms if quiet_ms is not None else self.settle_quiet_ms
+        timeout_seconds = timeout_seconds if timeout_seconds is not None else self.settle_timeout
+        js_script = textwrap.dedent("""
+                var quietMs = arguments[0];
+                var timeoutMs = arguments[1];
+                var done = arguments[arguments.length - 1];
+                var startedAt = performance.now();
+
+                var tracker = window.__aiSettleTracker;
+                if (!tracker) {
+                    tracker = {pending: 0, lastActivity: performance.now()};
+                    var markActivity = function () {
+                        tracker.lastActivity = performance.now();
+                    };
+                    new MutationObserver(markActivity).observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+
+                    if (window.fetch) {
+                        var originalFetch = window.fetch;
+                        window.fetch = function () {
+                            tracker.pending++;
+                            markActivity();
+                            return originalFetch.apply(this, arguments).finally(function () {
+                                tracker.pending--;
+                                markActivity();
+                            });
+                        };
+                    }
+
+                    var originalSend = XMLHttpRequest.prototype.send;
+                    XMLHttpRequest.prototype.send = function () {
+                        tracker.pending++;
+                        markActivity();
+                        this.addEventListener('loadend', function () {
+                            tracker.pending--;
+                            markActivity();
+                        }, {once: true});
+                        return originalSend.apply(this, arguments);
+                    };
+                    window.__aiSettleTracker = tracker;
+                }
+
+                (function check() {
+                    var now = performance.now();
+                    var settled = document.readyState === 'complete' && tracker.pending <= 0 && now - tracker.lastActivity >= quietMs;
+                    if (settled || now - startedAt >= timeoutMs) {
+                        done({settled: settled, pending_requests: tracker.pending});
+                    } else {
+                        setTimeout(check, 50);
+                    }
+                })();
+                """).strip()
+
+        started_at = time.perf_counter()
+        deadline = started_at + timeout_seconds
+        result = {"settled": False, "pending_requests": None}
+        while True:
+            remaining_ms = (deadline - time.perf_counter()) * 1000
+            if remaining_ms <= 0:
+                break
+            try:
+                result = self.driver.execute_async_script(js_script, quiet_ms, remaining_ms)
+                break
+            except WebDriverException:
+                time.sleep(0.1) # Trang đang chuyển (document unloaded) -> thử lại trên document mới
+
+        result["waited_ms"] = (time.perf_counter() - started_at) * 1000
+        if result["settled"]:
+            if self.verbose:
+                print(f"SeleniumUtils.wait_for_page_settled -> settled in {result['waited_ms']:.0f} ms")
+        else:
+            print(f"SeleniumUtils.wait_for_page_settled -> not settled after {result['waited_ms']:.0f} ms "
+                  f"(pending requests: {result['pending_requests']})")
+        return result
 
     def connect_driver(self, url):
         self.url = url
         try:
             self._load_initial_page()
+            self.fresh_page_url = url
         except Exception as e:
             if self.driver:
                 print("SeleniumUtils.connect_driver -> Disconnecting driver")
-                self.driver.quit()
+                self.close_local_driver() # trả driver về pool (nếu có) như khi đóng bình thường
             raise e
 
-    def close_local_driver(self):
+    def close_local_driver(self, refill=True):
         if self.driver is None:
             print("SeleniumUtils.close_local_driver -> The driver is already closed.")
         else:
-            self.driver.quit()
+            if self.driver_pool is not None:
+                self.driver_pool.release(self.driver, refill) # pool khởi động driver thay thế cho lần tạo lại driver sau
+            else:
+                self.driver.quit()
             self.driver = None
 
     def go_to_url(self, url):
+        self.fresh_page_url = None
         self.url = url
         self._load_initial_page()
 
+    def is_driver_alive(self):
+        if self.driver is None:
+            return False
+        try:
+            self.driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def reset_session(self, url):
+        # Xoá cookies/storage để task sau không dùng lại trạng thái (vd: login) của task trước
+        if self.fresh_page_url == url:
+            # Driver vừa connect_driver(url) xong: trang đã ở trạng thái sạch, không load lại lần 2
+            self.fresh_page_url = None
+            return
+        self.driver.delete_all_cookies()
+        try:
+            self.driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        except WebDriverException:
+            pass # trang hiện tại không cho truy cập storage (vd: about:blank)
+        self.go_to_url(url)
+
+    def capture_session_state(self) -> dict:
+        # Trạng thái đăng nhập của trang hiện tại: cookies + localStorage/sessionStorage của origin hiện tại
+        storage = self.driver.execute_script(textwrap.dedent("""
+                function dump(storage) {
+                    var data = {};
+                    for (var i = 0; i < storage.length; i++) {
+                        var key = storage.key(i);
+                        data[key] = storage.getItem(key);
+                    }
+                    return data;
+                }
+                return {local: dump(window.localStorage), session: dump(window.sessionStorage)};
+                """).strip())
+        return {
+            "url": self.driver.current_url,
+            "cookies": self.driver.get_cookies(),
+            "local_storage": storage["local"],
+            "session_storage": storage["session"]
+        }
+
+    def restore_session_state(self, state, start_url):
+        # Cookie/storage chỉ ghi được khi đang ở đúng origin -> mở start_url trước, ghi trạng thái rồi mở url đã lưu
+        self.driver.delete_all_cookies()
+        self.go_to_url(start_url)
+        self.driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+
+        now = time.time()
+        restored = 0
+        for cookie in state["cookies"]:
+            if cookie.get("expiry") and cookie["expiry"] <= now:
+                continue
+            try:
+                self.driver.add_cookie(cookie)
+                restored += 1
+            except WebDriverException as e:
+                print(f"SeleniumUtils.restore_session_state -> Skipping cookie '{cookie.get('name')}': {e}")
+
+        self.driver.execute_script(textwrap.dedent("""
+                var local = arguments[0];
+                var session = arguments[1];
+                Object.keys(local).forEach(key => window.localStorage.setItem(key, local[key]));
+                Object.keys(session).forEach(key => window.sessionStorage.setItem(key, session[key]));
+                """).strip(), state["local_storage"], state["session_storage"])
+        print(f"SeleniumUtils.restore_session_state -> restored {restored}/{len(state['cookies'])} cookies, "
+              f"{len(state['local_storage'])} localStorage and {len(state['session_storage'])} sessionStorage items")
+        self.go_to_url(state["url"])
+
     def _assert_css_selector_exists(self, action):
         if action.css_selector is None:
             raise Exception("Action cannot be executed without a CSS selector")
 
+    SCROLL_INTO_VIEW_SCRIPT = textwrap.dedent("""
+            var el = arguments[0];
+            var rect = el.getBoundingClientRect();
+            var height = window.innerHeight || document.documentElement.clientHeight;
+            var width = window.innerWidth || document.documentElement.clientWidth;
+            if (rect.top >= 0 && rect.left >= 0 && rect.bottom <= height && rect.right <= width) {
+                return false;
+            }
+            el.scrollIntoView({block: 'center', inline: 'nearest'});
+            return true;
+            """).strip()
+
+    def _scroll_into_view(self, element):
+        # Chỉ scroll khi phần tử nằm ngoài viewport (full page): scroll không cần thiết làm đổi vùng model vừa thấy
+        # và khiến collect_changes luôn yêu cầu full snapshot ("page scrolled")
+        return self.driver.execute_script(self.SCROLL_INTO_VIEW_SCRIPT, element)
+
     def _click_element(self, css_selector):
         try:
-            self.driver.find_element(By.CSS_SELECTOR, css_selector).click()
+            element = self._find_element(css_selector, clickable=True)
+            self._scroll_into_view(element)
+            element.click()
             print("SeleniumUtils._click_element -> css id: " + css_selector)
         except:
             raise NoSuchElementException("SELENIUM: Could not click on the element with the CSS id: " + css_selector)
 
     def _enter_text_in_element(self, css_selector, text):
         try:
-            element = self.driver.find_element(By.CSS_SELECTOR, css_selector)
+            element = self._find_element(css_selector)
+            self._scroll_into_view(element)
             element.send_keys(text)
             print("SeleniumUtils._enter_text_in_element -> css id: " + css_selector)
         except:
             raise NoSuchElementException("SELENIUM: Could not enter text in the element with the CSS id: " + css_selector)
 
     def execute_action_for_prompt(self, content) -> bool:
+        self.fresh_page_url = None
         try:
             if content.action == "click":
                 self._assert_css_selector_exists(content)
@@ -88,6 +332,8 @@ class SeleniumUtils:
             elif content.action == "finish":
                 return False
 
+            # Chờ trang ổn định rồi mới lấy snapshot tiếp theo
+            self.wait_for_page_settled()
             return True
 
         except NoSuchElementException as ex:
@@ -97,54 +343,468 @@ class SeleniumUtils:
             print(f"SeleniumUtils.execute_action_for_prompt -> Failed to execute prompt action: {ex}")
             raise Exception("Failed to execute action generative AI action")
 
-    def assign_auto_generated_ids(self):
-        js_script = textwrap.dedent("""
-                function generateUniqueId(index) {
-                    var now = new Date();
-                    var timestamp = now.getMinutes().toString() + now.getSeconds().toString();
-                    return "idTUp" + index + "T" + timestamp;
+    # Các hàm JS dùng chung cho take_snapshot và collect_changes
+    DOM_HELPERS_SCRIPT = textwrap.dedent("""
+            var interactiveSelector = 'li, button, input, textarea, [type=text], a';
+            var changeRootSelector = 'li, button, input, textarea, [type=text], a, select';
+
+            // Giống DomAnalyzer.convert_to_md: bỏ script/style/iframe/noscript, chỉ giữ các attribute whitelist
+            var skippedTags = {script: true, style: true, iframe: true, noscript: true};
+            var recordTags = {li: true, button: true, input: true, textarea: true, a: true};
+            var includeAttrs = {
+                'aria-label': true, 'type': true, 'aria-current': true, 'aria-hidden': true, 'value': true,
+                'name': true, 'data-value': true, 'placeholder': true, 'role': true, 'title': true, 'data-viewport': true
+            };
+            // Attribute do chính script gán, không tính là thay đổi của trang
+            var ownAttrs = {'id': true, 'data-viewport': true};
+
+            // id tự sinh ổn định giữa các snapshot và các lần chạy: hash của đường dẫn cấu trúc (tag của các tổ tiên tới tổ tiên
+            // gần nhất có id của trang), tag, các attribute định danh và text ngắn. Trùng thì thêm -2, -3... theo thứ tự DOM
+            var autoIdPrefix = 'ai-';
+            var idAttrs = ['name', 'type', 'role', 'aria-label', 'placeholder', 'title', 'data-value', 'href'];
+
+            function hashString(text) {
+                // FNV-1a 32 bit
+                var hash = 0x811c9dc5;
+                for (var i = 0; i < text.length; i++) {
+                    hash ^= text.charCodeAt(i);
+                    hash = Math.imul(hash, 0x01000193);
+                }
+                return (hash >>> 0).toString(36);
+            }
+
+            function structuralPath(el) {
+                var parts = [];
+                for (var node = el.parentElement; node && node !== document.documentElement; node = node.parentElement) {
+                    if (node.id && node.id.indexOf(autoIdPrefix) !== 0) {
+                        parts.push('#' + node.id);
+                        break;
+                    }
+                    parts.push(node.localName);
+                }
+                return parts.reverse().join('/');
+            }
+
+            function assignStableId(el) {
+                var parts = [structuralPath(el), el.localName];
+                idAttrs.forEach(name => parts.push(el.getAttribute(name) || ''));
+                parts.push(normalizeText(el.textContent || '').slice(0, 40));
+                var baseId = autoIdPrefix + hashString(parts.join('|'));
+                var id = baseId;
+                for (var suffix = 2; document.getElementById(id); suffix++) {
+                    id = baseId + '-' + suffix;
+                }
+                el.id = id;
+            }
+
+            function isElementInViewport(el) {
+                var rect = el.getBoundingClientRect();
+                return (
+                    rect.top >= 0 &&
+                    rect.left >= 0 &&
+                    rect.bottom <= (window.innerHeight || document.documentElement.clientHeight) &&
+                    rect.right <= (window.innerWidth || document.documentElement.clientWidth)
+                );
+            }
+
+            // Full page: ghi vị trí so với viewport vào data-viewport (in_view, above, below, left, right) để model biết
+            // phần tử nằm ngoài màn hình; executor tự scroll tới phần tử trước khi thao tác nên không cần step scroll
+            function viewportPosition(el) {
+                var rect = el.getBoundingClientRect();
+                var height = window.innerHeight || document.documentElement.clientHeight;
+                var width = window.innerWidth || document.documentElement.clientWidth;
+                if (rect.bottom <= 0) return 'above';
+                if (rect.top >= height) return 'below';
+                if (rect.right <= 0) return 'left';
+                if (rect.left >= width) return 'right';
+                return 'in_view';
+            }
+
+            function tagViewportPositions(roots) {
+                roots.forEach(root => {
+                    var candidates = [root].concat(Array.from(root.querySelectorAll(interactiveSelector)));
+                    candidates.forEach(el => {
+                        if (el.matches(interactiveSelector)) {
+                            var position = viewportPosition(el);
+                            if (el.getAttribute('data-viewport') !== position) {
+                                el.setAttribute('data-viewport', position);
+                            }
+                        }
+                    });
+                });
+            }
+
+            function isElementVisible(el) {
+                return el.offsetWidth > 0 && el.offsetHeight > 0 && window.getComputedStyle(el).visibility !== 'hidden';
+            }
+
+            function normalizeText(text) {
+                return text.replace(/\\s+/g, ' ').trim();
+            }
+
+            function collectText(el) {
+                var parts = [];
+                var stack = [el];
+                while (stack.length) {
+                    var node = stack.pop();
+                    if (node.nodeType === Node.TEXT_NODE) {
+                        parts.push(node.nodeValue);
+                    } else if (node.nodeType === Node.ELEMENT_NODE && !skippedTags[node.localName]) {
+                        for (var child = node.lastChild; child; child = child.previousSibling) {
+                            stack.push(child);
+                        }
+                    }
                 }
+                return normalizeText(parts.join(''));
+            }
 
-                const elements = document.querySelectorAll('li, button, input, textarea, [type=text], a');
-                elements.forEach((el, index) => {
-                    if (!el.id) {
-                        el.id = generateUniqueId(index);
+            function elementRecord(el, depth) {
+                var attrs = {};
+                for (var i = 0; i < el.attributes.length; i++) {
+                    var attr = el.attributes[i];
+                    if (includeAttrs[attr.name]) {
+                        attrs[attr.name] = attr.value;
                     }
-                });    
+                }
+                return {tag: el.localName, id: el.id, attrs: attrs, text: collectText(el), depth: depth};
+            }
+
+            function pushRecords(root, depth, records) {
+                var stack = [[root, depth]];
+                while (stack.length) {
+                    var entry = stack.pop();
+                    var node = entry[0];
+                    var nodeDepth = entry[1];
+
+                    if (node.nodeType === Node.TEXT_NODE) {
+                        var text = normalizeText(node.nodeValue);
+                        if (text) {
+                            records.push({tag: node.parentNode.localName, text: text, depth: nodeDepth});
+                        }
+                        continue;
+                    }
+                    if (node.nodeType !== Node.ELEMENT_NODE || skippedTags[node.localName]) {
+                        continue;
+                    }
+
+                    // li chứa a thì thay li bằng a
+                    if (node.localName === 'li') {
+                        node = node.querySelector('a') || node;
+                    }
+
+                    if (recordTags[node.localName] && node.id && node.getAttribute('hidden') !== 'true') {
+                        records.push(elementRecord(node, nodeDepth));
+                        continue;
+                    }
+
+                    for (var child = node.lastChild; child; child = child.previousSibling) {
+                        stack.push([child, nodeDepth + 1]);
+                    }
+                }
+            }
+
+            function serializeElements(elements, depths, mode) {
+                var result = {html: '', records: []};
+                if (mode === 'records') {
+                    elements.forEach((el, index) => pushRecords(el, depths[index], result.records));
+                } else {
+                    result.html = elements.map(el => el.outerHTML).join('\\n');
+                }
+                return result;
+            }
+            """).strip()
+
+    def take_snapshot(self, mode="html", track_changes=False, full_page=False) -> PageSnapshot:
+        # Gán id, kiểm tra visibility và lọc phần tử top-level trong 1 lần duyệt cây DOM (1 round trip)
+        # mode = "html": trả về outerHTML của các phần tử top-level
+        # mode = "records": trả về danh sách record gọn (tag, id, attrs, text, depth) thay vì outerHTML
+        # track_changes = True: cài (lại) MutationObserver để collect_changes trả về delta ở các step sau
+        # full_page = True: lấy phần tử hiển thị trên toàn trang (không chỉ trong viewport), kèm data-viewport
+        self.fresh_page_url = None # script gán id/cài observer lên trang
+        if mode not in self.SNAPSHOT_MODES:
+            raise Exception(f"Unsupported snapshot mode '{mode}'")
+
+        js_script = self.DOM_HELPERS_SCRIPT + "\n" + textwrap.dedent("""
+                var mode = arguments[0];
+                var trackChanges = arguments[1];
+                var fullPage = arguments[2];
+                var startedAt = performance.now();
+
+                function collectInteractiveIds(el, ids) {
+                    if (el.id && el.matches(interactiveSelector)) {
+                        ids.push(el.id);
+                    }
+                    el.querySelectorAll(interactiveSelector).forEach(child => {
+                        if (child.id) {
+                            ids.push(child.id);
+                        }
+                    });
+                }
+
+                function installChangeTracker() {
+                    var previous = window.__aiChangeTracker;
+                    if (previous) {
+                        previous.observer.disconnect();
+                        document.removeEventListener('input', previous.onInput, true);
+                        document.removeEventListener('change', previous.onInput, true);
+                    }
+
+                    var tracker = {
+                        url: location.href,
+                        fullPage: fullPage,
+                        scrollX: window.scrollX,
+                        scrollY: window.scrollY,
+                        changed: new Set(),
+                        removedIds: [],
+                        addedCount: 0,
+                        removedCount: 0
+                    };
+                    tracker.record = function (mutations) {
+                        mutations.forEach(mutation => {
+                            if (mutation.type === 'attributes') {
+                                // Bỏ qua thay đổi id/data-viewport do chính script gán
+                                if (!ownAttrs[mutation.attributeName]) {
+                                    tracker.changed.add(mutation.target);
+                                }
+                            } else if (mutation.type === 'characterData') {
+                                if (mutation.target.parentElement) {
+                                    tracker.changed.add(mutation.target.parentElement);
+                                }
+                            } else {
+                                mutation.addedNodes.forEach(node => {
+                                    if (node.nodeType === Node.ELEMENT_NODE) {
+                                        tracker.addedCount++;
+                                        tracker.changed.add(node);
+                                    } else if (node.parentElement) {
+                                        tracker.changed.add(node.parentElement);
+                                    }
+                                });
+                                mutation.removedNodes.forEach(node => {
+                                    if (node.nodeType === Node.ELEMENT_NODE) {
+                                        tracker.removedCount++;
+                                        collectInteractiveIds(node, tracker.removedIds);
+                                    }
+                                });
+                                if (mutation.removedNodes.length) {
+                                    tracker.changed.add(mutation.target);
+                                }
+                            }
+                        });
+                    };
+                    // Giá trị input thay đổi không tạo mutation (property, không phải attribute)
+                    tracker.onInput = function (event) {
+                        if (event.target && event.target.nodeType === Node.ELEMENT_NODE) {
+                            tracker.changed.add(event.target);
+                        }
+                    };
+                    tracker.observer = new MutationObserver(tracker.record);
+                    tracker.observer.observe(document.body, {childList: true, subtree: true, attributes: true, characterData: true});
+                    document.addEventListener('input', tracker.onInput, true);
+                    document.addEventListener('change', tracker.onInput, true);
+                    window.__aiChangeTracker = tracker;
+                }
+
+                var elementCount = 0;
+                var topLevelElements = [];
+                var topLevelDepths = [];
+
+                // Stack: [element, can_collect, depth]. can_collect = false khi đã nằm trong 1 phần tử top-level
+                // hoặc nằm ngoài body, nên không cần kiểm tra visibility nữa.
+                var stack = [[document.documentElement, false, 0]];
+                while (stack.length) {
+                    var entry = stack.pop();
+                    var el = entry[0];
+                    var canCollect = entry[1];
+                    var depth = entry[2];
+                    elementCount++;
+
+                    if (!el.id && el.matches(interactiveSelector)) {
+                        assignStableId(el);
+                    }
+
+                    if (canCollect && (fullPage || isElementInViewport(el)) && isElementVisible(el)) {
+                        topLevelElements.push(el);
+                        topLevelDepths.push(depth);
+                        canCollect = false;
+                    }
+
+                    var childCanCollect = canCollect || el === document.body;
+                    var childDepth = el === document.documentElement ? 0 : depth + 1;
+                    for (var child = el.lastElementChild; child; child = child.previousElementSibling) {
+                        stack.push([child, childCanCollect, childDepth]);
+                    }
+                }
+
+                if (fullPage) {
+                    tagViewportPositions(topLevelElements);
+                }
+                var result = serializeElements(topLevelElements, topLevelDepths, mode);
+                result.element_count = elementCount;
+                result.visible_count = topLevelElements.length;
+                if (trackChanges) {
+                    installChangeTracker();
+                }
+                result.script_ms = performance.now() - startedAt;
+                return result;
                 """).strip()
 
-        self.driver.execute_script(js_script)
+        started_at = time.perf_counter()
+        result = self.driver.execute_script(js_script, mode, track_changes, full_page)
+        round_trip_ms = (time.perf_counter() - started_at) * 1000
 
-    def get_visible_dom(self):
-        js_script = textwrap.dedent("""
+        records = result["records"] or []
+        html = str(result["html"] or "")
+        snapshot = PageSnapshot(
+            mode=mode,
+            html=html,
+            records=records,
+            element_count=result["element_count"],
+            visible_count=result["visible_count"],
+            payload_bytes=self._payload_bytes(mode, html, records),
+            script_ms=result["script_ms"],
+            round_trip_ms=round_trip_ms
+        )
+        if self.verbose:
+            print(f"SeleniumUtils.take_snapshot -> {snapshot.visible_count}/{snapshot.element_count} elements, "
+                  f"{snapshot.payload_bytes} bytes ({mode}), "
+                  f"script {snapshot.script_ms:.1f} ms, round trip {snapshot.round_trip_ms:.1f} ms")
+        return snapshot
 
-                function isElementInViewport(el) {
-                    var rect = el.getBoundingClientRect();
-                    return (
-                        rect.top >= 0 &&
-                        rect.left >= 0 &&
-                        rect.bottom <= (window.innerHeight || document.documentElement.clientHeight) &&
-                        rect.right <= (window.innerWidth || document.documentElement.clientWidth)
-                    );
+    def collect_changes(self, mode="html", max_structural_changes=50) -> PageDelta:
+        # Lấy các phần tử bị thêm/xoá/thay đổi kể từ lần take_snapshot(track_changes=True) hoặc collect_changes trước
+        # Trả về full_snapshot_required = True nếu đã chuyển trang, scroll, hoặc DOM thay đổi quá nhiều
+        if mode not in self.SNAPSHOT_MODES:
+            raise Exception(f"Unsupported snapshot mode '{mode}'")
+
+        js_script = self.DOM_HELPERS_SCRIPT + "\n" + textwrap.dedent("""
+                var mode = arguments[0];
+                var maxStructuralChanges = arguments[1];
+                var startedAt = performance.now();
+                var tracker = window.__aiChangeTracker;
+
+                function requireFullSnapshot(reason) {
+                    return {full_snapshot_required: true, reason: reason, script_ms: performance.now() - startedAt};
                 }
 
-                function isElementVisible(el) {
-                    return el.offsetWidth > 0 && el.offsetHeight > 0 && window.getComputedStyle(el).visibility !== 'hidden';
+                if (!tracker) {
+                    return requireFullSnapshot('change tracker is not installed (page navigated)');
+                }
+                if (tracker.url !== location.href) {
+                    return requireFullSnapshot('url changed');
+                }
+                // Full page: scroll không làm thay đổi tập phần tử, data-viewport của phần tử thay đổi được cập nhật lại bên dưới
+                if (!tracker.fullPage && (tracker.scrollX !== window.scrollX || tracker.scrollY !== window.scrollY)) {
+                    return requireFullSnapshot('page scrolled');
                 }
 
+                tracker.record(tracker.observer.takeRecords());
+                if (tracker.addedCount + tracker.removedCount > maxStructuralChanges) {
+                    return requireFullSnapshot('too many structural changes');
+                }
+
+                var roots = new Set();
+                var structural = false;
+                tracker.changed.forEach(el => {
+                    if (!el.isConnected) {
+                        return;
+                    }
+                    var root = el.closest(changeRootSelector) || el;
+                    if (root === document.body || root === document.documentElement) {
+                        structural = true;
+                    }
+                    roots.add(root);
+                });
+                if (structural) {
+                    return requireFullSnapshot('body changed');
+                }
 
-                var allElements = document.querySelectorAll('body *');
-                var visibleElements = Array.from(allElements)
-                    .filter(el => isElementInViewport(el) && isElementVisible(el));
+                // Chỉ giữ phần tử ngoài cùng: đi ngược lên cha và tra Set (không so từng cặp phần tử)
+                var outermostRoots = Array.from(roots).filter(el => {
+                    for (var parent = el.parentElement; parent; parent = parent.parentElement) {
+                        if (roots.has(parent)) {
+                            return false;
+                        }
+                    }
+                    return true;
+                });
 
-                // Filter out child elements
-                var filteredElements = visibleElements.filter(el => {
-                    return !visibleElements.some(parentEl => parentEl !== el && parentEl.contains(el));
+                // Gán id cho các phần tử interactive mới xuất hiện (kể cả ngoài viewport, giống take_snapshot)
+                outermostRoots.forEach(el => {
+                    var candidates = [el].concat(Array.from(el.querySelectorAll(interactiveSelector)));
+                    candidates.forEach(candidate => {
+                        if (!candidate.id && candidate.matches(interactiveSelector)) {
+                            assignStableId(candidate);
+                        }
+                    });
                 });
 
-                var visibleElementsHtml = filteredElements.map(el => el.outerHTML).join('\\n');
-                return visibleElementsHtml;
+                // Giống take_snapshot: root không nằm trọn trong viewport (hoặc không hiển thị) thì đi xuống các phần tử con
+                // thay vì bỏ cả root, để phần tử con mới nằm trong viewport vẫn có trong delta
+                var changedElements = [];
+                var stack = outermostRoots.slice().reverse();
+                while (stack.length) {
+                    var el = stack.pop();
+                    if ((tracker.fullPage || isElementInViewport(el)) && isElementVisible(el)) {
+                        changedElements.push(el);
+                        continue;
+                    }
+                    for (var child = el.lastElementChild; child; child = child.previousElementSibling) {
+                        stack.push(child);
+                    }
+                }
+
+                if (tracker.fullPage) {
+                    tagViewportPositions(changedElements);
+                }
+                var result = serializeElements(changedElements, changedElements.map(() => 0), mode);
+                result.full_snapshot_required = false;
+                result.removed_ids = tracker.removedIds;
+                result.added_count = tracker.addedCount;
+                result.removed_count = tracker.removedCount;
+                result.changed_count = changedElements.length;
+
+                // Reset cho step sau, bỏ qua mutation do chính việc gán id
+                tracker.observer.takeRecords();
+                tracker.changed = new Set();
+                tracker.removedIds = [];
+                tracker.addedCount = 0;
+                tracker.removedCount = 0;
 
+                result.script_ms = performance.now() - startedAt;
+                return result;
                 """).strip()
 
-        return str(self.driver.execute_script(js_script))
+        started_at = time.perf_counter()
+        result = self.driver.execute_script(js_script, mode, max_structural_changes)
+        round_trip_ms = (time.perf_counter() - started_at) * 1000
+
+        records = result.get("records") or []
+        html = str(result.get("html") or "")
+        delta = PageDelta(
+            mode=mode,
+            full_snapshot_required=result["full_snapshot_required"],
+            reason=result.get("reason") or "",
+            html=html,
+            records=records,
+            removed_ids=result.get("removed_ids") or [],
+            added_count=result.get("added_count") or 0,
+            removed_count=result.get("removed_count") or 0,
+            changed_count=result.get("changed_count") or 0,
+            payload_bytes=self._payload_bytes(mode, html, records),
+            script_ms=result["script_ms"],
+            round_trip_ms=round_trip_ms
+        )
+        if self.verbose:
+            if delta.full_snapshot_required:
+                print(f"SeleniumUtils.collect_changes -> full snapshot required: {delta.reason}")
+            else:
+                print(f"SeleniumUtils.collect_changes -> {delta.changed_count} changed, {len(delta.removed_ids)} removed ids, "
+                      f"{delta.payload_bytes} bytes ({mode}), "
+                      f"script {delta.script_ms:.1f} ms, round trip {delta.round_trip_ms:.1f} ms")
+        return delta
+
+    def _payload_bytes(self, mode, html, records):
+        return len(json.dumps(records)) if mode == "records" else len(html.encode("utf-8"))
+
+    def get_visible_dom(self, full_page=False):
+        return self.take_snapshot(full_page=full_page).html
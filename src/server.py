@@ -0,0 +1,92 @@
+import argparse
+import json
+from flask import Flask, Response, jsonify, request
+from src.browser_profile import BrowserProfile
+from src.job_service import JobService, QueueFullError
+
+
+def create_app(service: JobService) -> Flask:
+    '''
+    HTTP API trước JobService:
+    - POST /jobs {"task": "..."} hoặc {"tasks": ["...", ...], "url": "...", "setup_task": "..."} -> 202 + id job, 429 khi hàng đợi đầy
+    - GET /jobs/<id> -> trạng thái job
+    - GET /jobs/<id>/events -> server-sent events của job (trạng thái, llm, action, task), hỗ trợ Last-Event-ID
+    - GET /metrics -> số job, độ dài hàng đợi, throughput và queue latency
+    '''
+    app = Flask(__name__)
+    app.config["job_service"] = service
+
+    @app.post("/jobs")
+    def submit_job():
+        body = request.get_json(silent=True) or {}
+        tasks = body.get("tasks") or ([body["task"]] if body.get("task") else None)
+        try:
+            job = service.submit(tasks, body.get("url"), body.get("setup_task"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except QueueFullError as e:
+            response = jsonify({"error": str(e)})
+            response.headers["Retry-After"] = str(e.retry_after_seconds)
+            return response, 429
+        return jsonify({**job.to_dict(), "status_url": f"/jobs/{job.id}", "events_url": f"/jobs/{job.id}/events"}), 202
+
+    @app.get("/jobs/<job_id>")
+    def get_job(job_id):
+        job = service.get_job(job_id)
+        if job is None:
+            return jsonify({"error": "job not found"}), 404
+        return jsonify(job.to_dict())
+
+    @app.get("/jobs/<job_id>/events")
+    def stream_events(job_id):
+        job = service.get_job(job_id)
+        if job is None:
+            return jsonify({"error": "job not found"}), 404
+        try:
+            last_event_id = int(request.headers.get("Last-Event-ID", -1))
+        except ValueError:
+            return jsonify({"error": "Last-Event-ID must be an integer"}), 400
+
+        def generate():
+            after_id = last_event_id
+            while True:
+                events = job.wait_for_events(after_id, timeout_seconds=15)
+                if not events:
+                    if job.done:
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                for event in events:
+                    after_id = event["id"]
+                    yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps({'time': event['time'], **event['data']})}\n\n"
+
+        return Response(generate(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @app.get("/metrics")
+    def get_metrics():
+        return jsonify(service.get_metrics())
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP job service for AgentProcessor")
+    parser.add_argument("--url", required=True, help="URL mặc định mở trước mỗi job")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=20)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--headed", action="store_true", help="Chạy Chrome có giao diện thay vì headless")
+    args = parser.parse_args()
+
+    service = JobService(args.url, workers=args.workers, queue_size=args.queue_size,
+                         browser_profile=BrowserProfile() if args.headed else BrowserProfile.fast())
+    service.start()
+    try:
+        create_app(service).run(host=args.host, port=args.port, threaded=True)
+    finally:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional
+
+
+class SessionStore:
+    '''
+    Lưu trạng thái browser (cookies, localStorage, sessionStorage, url) sau khi 1 setup task (vd: login) thành công,
+    key = hash(base url + setup task). Driver mới được khôi phục từ trạng thái này thay vì chạy lại setup task bằng LLM.
+    File chứa cookie đăng nhập nên được ghi với quyền 0600 trong .cache (không commit).
+    '''
+    DEFAULT_PATH = Path(__file__).parent.parent / '.cache' / 'sessions.json'
+    DEFAULT_TTL_SECONDS = 12 * 3600
+
+    def __init__(self, path=None, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.path = Path(path or os.getenv("SESSION_STORE_PATH") or self.DEFAULT_PATH)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._sessions = self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            print(f"SessionStore._load -> Ignoring unreadable session file {self.path}: {e}")
+            return {}
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix('.tmp')
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self._sessions, f)
+        os.replace(temp_path, self.path)
+
+    @staticmethod
+    def _key(base_url, setup_task):
+        return hashlib.sha256(f"{base_url}\n{setup_task}".encode('utf-8')).hexdigest()
+
+    def get(self, base_url, setup_task) -> Optional[dict]:
+        # Trả về {"state": <SeleniumUtils.capture_session_state()>, "start_fingerprint": ...} hoặc None
+        with self._lock:
+            key = self._key(base_url, setup_task)
+            session = self._sessions.get(key)
+            if session is None:
+                return None
+            if time.time() - session["created_at"] > self.ttl_seconds:
+                del self._sessions[key]
+                self._save()
+                return None
+            return session
+
+    def put(self, base_url, setup_task, state, start_fingerprint):
+        # start_fingerprint: fingerprint trang trước khi chạy setup task (vd: trang login) để nhận ra session đã hết hạn
+        with self._lock:
+            self._sessions[self._key(base_url, setup_task)] = {
+                "base_url": base_url,
+                "setup_task": setup_task,
+                "created_at": time.time(),
+                "start_fingerprint": start_fingerprint,
+                "state": state
+            }
+            self._save()
+
+    def invalidate(self, base_url, setup_task):
+        with self._lock:
+            if self._sessions.pop(self._key(base_url, setup_task), None) is not None:
+                self._save()
@@ -0,0 +1,234 @@
+import re
+import threading
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+from src.dom_analyzer import INTERACTIVE_MD_PATTERN, ATTRIBUTE_PATTERN
+from src.model import TestStep
+
+NON_TEXT_INPUT_TYPES = {'button', 'submit', 'reset', 'checkbox', 'radio', 'image', 'hidden', 'file', 'range', 'color'}
+CLICKABLE_INPUT_TYPES = {'button', 'submit', 'reset', 'checkbox', 'radio', 'image'}
+QUOTED_PATTERN = re.compile(r"'([^']*)'|\"([^\"]*)\"")
+PLACEHOLDER_PATTERN = re.compile(r'\x00(\d+)\x00')
+CLAUSE_SEPARATOR_PATTERN = re.compile(r'\s*(?:,|;|\band then\b|\bthen\b|\band\b)\s*', re.IGNORECASE)
+CLICK_PATTERN = re.compile(r'^(?:click|press|tap|select|choose|open|check|go to|navigate to)(?:\s+on)?\s+(.+)$', re.IGNORECASE)
+ENTER_INTO_PATTERN = re.compile(r'^(?:enter|type|input|fill in|fill|put)\s+\x00(\d+)\x00\s+(?:in|into|to)\s+(.+)$', re.IGNORECASE)
+TAG_BOUNDARY_PATTERN = re.compile(r'<(/?)(li|button|input|textarea|a)\b')
+TAG_PATTERN = re.compile(r'<[^>]+>')
+WORD_PATTERN = re.compile(r'[^\W_]+')
+
+
+def normalize(text) -> str:
+    # So khớp không phân biệt hoa thường/dấu câu: "View ASN/Receipt" == "view asn receipt"
+    return ' '.join(WORD_PATTERN.findall(text.lower()))
+
+
+class Intent(BaseModel):
+    action: Literal["click", "enter_text"]
+    target: str # Đã normalize: tên field (enter_text) hoặc nhãn phần tử (click)
+    text: str = ""
+
+
+class ResolverPlan(BaseModel):
+    # Trạng thái của resolver trong 1 lần execute_task: các intent chưa thực hiện, theo đúng thứ tự trong task
+    intents: List[Intent]
+    active: bool = True
+    elements: dict = {} # {id: element} của full snapshot gần nhất
+
+
+class LocalStepResolver:
+    '''
+    Tạo TestStep trực tiếp (không gọi LLM) cho các step hiển nhiên trong task, vd:
+    - "enter username 'ttc-thao'" khi trang có đúng 1 ô nhập có name/placeholder/aria-label/nhãn là "username"
+    - "click Login" khi trang có đúng 1 button/link có text/aria-label/title là "Login"
+    Task được tách thành các intent theo thứ tự (dừng ở mệnh đề đầu tiên không hiểu được). Chỉ resolve intent đầu tiên
+    trên full snapshot và chỉ khi khớp duy nhất, còn lại để LLM xử lý. Step của LLM không thực hiện đúng intent đang chờ
+    thì resolver tắt cho tới hết task (không còn biết intent nào đã xong).
+    Với shadow=True resolver chỉ đề xuất, LLM vẫn được gọi và step của 2 bên được so sánh để đo độ chính xác.
+
+        processor = AgentProcessor(url, local_resolver=LocalStepResolver())
+    '''
+    FIELD_CONNECTORS = {'as', 'to', 'is', 'of', 'for', 'with', 'field', 'box', 'input'}
+    FIELD_BOUNDARIES = {'with', 'enter', 'type', 'input', 'fill', 'in', 'into', 'set', 'the', 'put', 'on', 'login', 'log', 'sign'}
+    TARGET_NOISE_WORDS = {'the', 'button', 'link', 'menu', 'tab', 'option', 'item', 'module', 'page', 'icon', 'checkbox', 'field', 'box'}
+    MAX_FIELD_WORDS = 3
+
+    def __init__(self, shadow=False):
+        self.shadow = shadow
+        self._lock = threading.Lock()
+        # decisions: số lần được hỏi trước khi gọi LLM, resolved: số lần tìm được step (shadow: chỉ đề xuất),
+        # bypassed: step local đã thực hiện thay LLM, bypass_failed: step local bị loại/lỗi khi thực hiện
+        self.stats = {"decisions": 0, "resolved": 0, "bypassed": 0, "bypass_failed": 0, "shadow_compared": 0, "shadow_agreed": 0}
+
+    def plan(self, task) -> ResolverPlan:
+        # Thay giá trị trong nháy bằng placeholder trước khi tách mệnh đề để "and"/"," trong giá trị không bị tách
+        values = []
+        def protect(match):
+            values.append(match.group(1) if match.group(1) is not None else match.group(2))
+            return f"\x00{len(values) - 1}\x00"
+        protected = QUOTED_PATTERN.sub(protect, task.strip().rstrip('.'))
+
+        intents = []
+        for clause in CLAUSE_SEPARATOR_PATTERN.split(protected):
+            intent = self._parse_clause(clause, values)
+            if intent is None:
+                break
+            intents.append(intent)
+        return ResolverPlan(intents=intents, active=bool(intents))
+
+    def _parse_clause(self, clause, values) -> Optional[Intent]:
+        match = ENTER_INTO_PATTERN.match(clause)
+        if match:
+            field = self._strip_noise_words(match.group(2))
+            return Intent(action="enter_text", target=field, text=values[int(match.group(1))]) if field else None
+
+        match = CLICK_PATTERN.match(clause)
+        if match:
+            target = match.group(1)
+            quoted = PLACEHOLDER_PATTERN.fullmatch(target.strip())
+            if quoted:
+                target = normalize(values[int(quoted.group(1))])
+            elif PLACEHOLDER_PATTERN.search(target):
+                return None
+            else:
+                target = self._strip_noise_words(target)
+            return Intent(action="click", target=target) if target else None
+
+        # "<...> username 'ttc-thao'": tên field là các từ ngay trước giá trị, cắt tới từ nối gần nhất
+        match = re.fullmatch(r'(.*?)\s*[=:]?\s*\x00(\d+)\x00', clause)
+        if match:
+            words = normalize(match.group(1)).split()
+            while words and words[-1] in self.FIELD_CONNECTORS:
+                words.pop()
+            field = []
+            while words and words[-1] not in self.FIELD_BOUNDARIES and len(field) < self.MAX_FIELD_WORDS:
+                field.insert(0, words.pop())
+            if field:
+                return Intent(action="enter_text", target=' '.join(field), text=values[int(match.group(2))])
+        return None
+
+    def _strip_noise_words(self, target):
+        # "the Login button" -> "login", "module inbound" -> "inbound"
+        words = normalize(target).split()
+        while len(words) > 1 and words[0] in self.TARGET_NOISE_WORDS:
+            words.pop(0)
+        while len(words) > 1 and words[-1] in self.TARGET_NOISE_WORDS:
+            words.pop()
+        return ' '.join(words)
+
+    @staticmethod
+    def extract_elements(markdown) -> dict:
+        # {id: element} các phần tử interactive kèm text bên trong và nhãn (text ngay trước phần tử, vd: "Username")
+        elements = {}
+        for match in INTERACTIVE_MD_PATTERN.finditer(markdown):
+            tag = match.group(1)
+            attributes = dict(ATTRIBUTE_PATTERN.findall(match.group(2)))
+            end = LocalStepResolver._find_closing_tag(markdown, tag, match.end())
+            elements[attributes.get('id')] = {
+                "tag": tag,
+                "attributes": attributes,
+                "text": normalize(TAG_PATTERN.sub(' ', markdown[match.end():end])),
+                "label": normalize(markdown[:match.start()].rsplit('>', 1)[-1]),
+                "start": match.start(),
+                "end": end
+            }
+        return elements
+
+    @staticmethod
+    def _find_closing_tag(markdown, tag, position):
+        depth = 1
+        for match in TAG_BOUNDARY_PATTERN.finditer(markdown, position):
+            if match.group(2) != tag:
+                continue
+            depth += -1 if match.group(1) else 1
+            if depth == 0:
+                return match.start()
+        return len(markdown)
+
+    @staticmethod
+    def _matches_field(element, field):
+        attributes = element["attributes"]
+        if element["tag"] == "input" and attributes.get('type', 'text').lower() in NON_TEXT_INPUT_TYPES:
+            return False
+        if element["tag"] not in ("input", "textarea"):
+            return False
+        names = [attributes.get(name, '') for name in ('name', 'placeholder', 'aria-label', 'title')]
+        if not attributes.get('id', '').startswith('ai-'):
+            names.append(attributes.get('id', ''))
+        label = element["label"]
+        return any(normalize(name) == field for name in names) or label == field or label.endswith(' ' + field)
+
+    @staticmethod
+    def _matches_click(element, target):
+        attributes = element["attributes"]
+        if element["tag"] == "input" and attributes.get('type', 'text').lower() not in CLICKABLE_INPUT_TYPES:
+            return False
+        if element["tag"] == "textarea":
+            return False
+        names = [element["text"]] + [normalize(attributes.get(name, '')) for name in ('aria-label', 'title', 'value')]
+        if element["tag"] == "input": # checkbox/radio: nhãn thường nằm sau phần tử -> dùng name
+            names += [element["label"], normalize(attributes.get('name', ''))]
+        return target in names
+
+    def _find_unique(self, intent, elements):
+        matches = [element for element in elements.values() if element["attributes"].get('aria-hidden') != 'true'
+                   and (self._matches_field(element, intent.target) if intent.action == "enter_text" else self._matches_click(element, intent.target))]
+        # <li><a>Dashboard</a></li>: cả li và a đều khớp -> chọn phần tử trong cùng
+        matches = [element for element in matches
+                   if not any(other is not element and element["start"] < other["start"] and other["end"] <= element["end"] for other in matches)]
+        return matches[0] if len(matches) == 1 else None
+
+    def resolve(self, plan: ResolverPlan, markdown) -> Optional[TestStep]:
+        # markdown phải là full snapshot (delta không đủ để biết phần tử có duy nhất trên trang hay không)
+        plan.elements = self.extract_elements(markdown)
+        intent = plan.intents[0]
+        element = self._find_unique(intent, plan.elements)
+        with self._lock:
+            self.stats["decisions"] += 1
+            self.stats["resolved"] += element is not None
+            self.stats["bypassed"] += element is not None and not self.shadow
+        if element is None:
+            return None
+        return TestStep(action=intent.action, css_selector=f"#{element['attributes']['id']}", text=intent.text,
+                        description=f"{'Enter text into' if intent.action == 'enter_text' else 'Click'} '{intent.target}' (resolved locally)")
+
+    def compare(self, local_step: TestStep, model_step: TestStep) -> bool:
+        # Shadow mode: step đề xuất có giống step LLM chọn không
+        agreed = (local_step.action, local_step.css_selector.strip(), local_step.text) == \
+                 (model_step.action, model_step.css_selector.strip(), model_step.text)
+        with self._lock:
+            self.stats["shadow_compared"] += 1
+            self.stats["shadow_agreed"] += agreed
+        return agreed
+
+    def observe(self, plan: ResolverPlan, step: TestStep, local: bool, succeeded: bool):
+        # Cập nhật plan sau khi 1 step được thực hiện: step local thất bại hoặc step khác không khớp intent đang chờ -> tắt resolver
+        if not plan.active:
+            return
+        if local and not succeeded:
+            with self._lock:
+                self.stats["bypass_failed"] += 1
+            plan.active = False
+            return
+        if not succeeded:
+            return
+        if local or self._is_intent_done(plan.intents[0], step, plan.elements):
+            plan.intents.pop(0)
+            plan.active = bool(plan.intents)
+        else:
+            plan.active = False
+
+    def _is_intent_done(self, intent, step, elements):
+        if step.action != intent.action:
+            return False
+        if intent.action == "enter_text":
+            return step.text == intent.text
+        element = elements.get(step.css_selector.strip().lstrip('#'))
+        return element is not None and self._matches_click(element, intent.target)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["bypass_rate"] = stats["resolved"] / stats["decisions"] if stats["decisions"] else 0.0
+        stats["accuracy"] = 1 - stats["bypass_failed"] / stats["bypassed"] if stats["bypassed"] else None
+        stats["shadow_agreement"] = stats["shadow_agreed"] / stats["shadow_compared"] if stats["shadow_compared"] else None
+        return stats
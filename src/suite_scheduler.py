@@ -0,0 +1,236 @@
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+from pydantic import BaseModel
+from src.agent import AgentProcessor
+from src.browser_profile import BrowserProfile
+from src.driver_pool import DriverPool
+from src.task_runner import ProcessorWorkerMixin
+
+
+class SuiteTask(BaseModel):
+    id: str
+    task: str
+    depends_on: Union[str, List[str], None] = None # Task phải chạy trước (prefix); nhiều task thì phải cùng nằm trên 1 chuỗi
+
+
+class Suite(BaseModel):
+    url: str
+    tasks: List[SuiteTask]
+
+
+class SuiteTaskResult(BaseModel):
+    id: str
+    task: str
+    success: bool
+    error: Optional[str] = None
+    skipped: bool = False # True: không chạy vì task prefix bị lỗi
+    start: str = "" # "fresh", "continued" (chạy tiếp trên browser của task cha), "checkpoint" hoặc "replayed" (checkpoint không dùng được)
+    steps: int = 0 # Số step đã thực hiện cho task này (kể cả step chạy lại prefix khi checkpoint không dùng được)
+    duration_seconds: float = 0.0
+    worker_id: Optional[int] = None
+
+
+def load_suite(path) -> Suite:
+    '''
+    Đọc suite từ file JSON:
+
+        {"url": "https://swm.danghung.xyz/login/", "tasks": [
+            {"id": "login", "task": "login with username 'ttc-thao' and password '123'"},
+            {"id": "inbound", "task": "go to module inbound", "depends_on": "login"},
+            {"id": "view_asn", "task": "click on view asn/receipt", "depends_on": "inbound"}
+        ]}
+    '''
+    return Suite.model_validate_json(Path(path).read_text(encoding='utf-8'))
+
+
+def build_task_tree(suite: Suite) -> Dict[str, List[str]]:
+    # Trả về {id: [id các task prefix từ gốc tới task cha]}; lỗi nếu id trùng, phụ thuộc không tồn tại, vòng lặp
+    # hoặc nhiều prerequisite không cùng 1 chuỗi (1 task chỉ bắt đầu được từ 1 trạng thái browser)
+    tasks = {}
+    for task in suite.tasks:
+        if task.id in tasks:
+            raise ValueError(f"Duplicated task id '{task.id}'")
+        tasks[task.id] = task
+
+    chains = {}
+    def resolve(task_id, visiting):
+        if task_id in chains:
+            return chains[task_id]
+        if task_id in visiting:
+            raise ValueError(f"Circular dependency at task '{task_id}'")
+        depends_on = tasks[task_id].depends_on or []
+        depends_on = [depends_on] if isinstance(depends_on, str) else depends_on
+        for dependency in depends_on:
+            if dependency not in tasks:
+                raise ValueError(f"Task '{task_id}' depends on unknown task '{dependency}'")
+
+        prefixes = [resolve(dependency, visiting | {task_id}) + [dependency] for dependency in depends_on]
+        chain = max(prefixes, key=len, default=[])
+        for dependency in depends_on:
+            if dependency not in chain:
+                raise ValueError(f"Prerequisites of task '{task_id}' are not on a single chain")
+        chains[task_id] = chain
+        return chain
+
+    for task_id in tasks:
+        resolve(task_id, set())
+    return chains
+
+
+class SuiteScheduler(ProcessorWorkerMixin):
+    '''
+    Chạy 1 suite gồm các task có quan hệ prefix (vd: login -> vào module inbound -> các action khác nhau), mỗi prefix
+    chỉ chạy 1 lần:
+    - Task gốc bắt đầu từ session mới (reset cookies/storage, mở url)
+    - Sau 1 task có nhiều task con, lưu checkpoint (url + cookies/storage + fingerprint trang); worker chạy tiếp task con
+      đầu tiên ngay trên browser hiện tại, các task con còn lại vào hàng đợi và được worker khác khôi phục từ checkpoint
+    - Checkpoint khôi phục ra trang khác lúc lưu (trạng thái chỉ có trong JS) thì chạy lại chuỗi prefix từ đầu
+    - Task lỗi thì các task phụ thuộc bị bỏ qua (skipped)
+
+        scheduler = SuiteScheduler(load_suite("suite.json"), pool_size=4)
+        results = scheduler.run()
+    '''
+    QUEUE_POLL_SECONDS = 0.1
+
+    def __init__(self, suite: Suite, pool_size=None, processor_kwargs=None, browser_profile: BrowserProfile = None, prewarm=True):
+        self.suite = suite
+        self.url = suite.url
+        self.tasks = {task.id: task for task in suite.tasks}
+        self.chains = build_task_tree(suite)
+        self.children = {task_id: [] for task_id in self.tasks}
+        for task in suite.tasks:
+            if self.chains[task.id]:
+                self.children[self.chains[task.id][-1]].append(task.id)
+        self.pool_size = pool_size or min(4, os.cpu_count() or 1)
+        self.processor_kwargs = processor_kwargs or {}
+        self.browser_profile = browser_profile
+        self.prewarm = prewarm
+        self.driver_pool = None
+        self._lock = threading.Lock()
+        self._results: Dict[str, SuiteTaskResult] = {}
+
+    def _create_processor(self) -> AgentProcessor:
+        return self._new_processor()
+
+    def _descendants(self, task_id) -> List[str]:
+        result = []
+        for child_id in self.children[task_id]:
+            result += [child_id] + self._descendants(child_id)
+        return result
+
+    def _execute(self, processor: AgentProcessor, task_id, result: SuiteTaskResult):
+        # Task dừng mà chưa finish thì không dùng trạng thái browser của nó làm prefix cho các task con
+        try:
+            outcome = processor.execute_task(self.tasks[task_id].task)
+        finally:
+            result.steps += processor.last_task_stats.get("steps", 0)
+        if outcome != "finished":
+            raise Exception(f"Task '{task_id}' stopped before the model returned finish")
+
+    def _run_task(self, processor: AgentProcessor, task_id, checkpoint, continued, result: SuiteTaskResult):
+        if continued:
+            result.start = "continued"
+        elif not self.chains[task_id]:
+            processor.selenium_utils.reset_session(self.suite.url)
+            result.start = "fresh"
+        elif checkpoint is not None and processor.restore_checkpoint(checkpoint, self.suite.url):
+            result.start = "checkpoint"
+        else:
+            # Không có checkpoint (driver crash giữa chuỗi "continued") hoặc checkpoint không khôi phục được
+            print(f"SuiteScheduler._run_task -> no usable checkpoint before '{task_id}', replaying {self.chains[task_id]}")
+            result.start = "replayed"
+            processor.selenium_utils.reset_session(self.suite.url)
+            for prefix_id in self.chains[task_id]:
+                self._execute(processor, prefix_id, result)
+        self._execute(processor, task_id, result)
+
+    def _worker(self, worker_id, pending: queue.Queue):
+        processor = None
+        item = None # Task con chạy tiếp ngay trên browser hiện tại
+
+        while True:
+            if item is None:
+                try:
+                    item = pending.get(timeout=self.QUEUE_POLL_SECONDS)
+                except queue.Empty:
+                    with self._lock:
+                        if len(self._results) == len(self.tasks):
+                            break
+                    continue
+            task_id, checkpoint, continued = item
+            item = None
+
+            started_at = time.perf_counter()
+            result = SuiteTaskResult(id=task_id, task=self.tasks[task_id].task, success=False, worker_id=worker_id)
+            next_items = []
+            try:
+                if processor is not None and not processor.selenium_utils.is_driver_alive():
+                    self._close_processor(processor)
+                    processor = None
+                    continued = False
+                if processor is None:
+                    processor = self._create_processor()
+
+                self._run_task(processor, task_id, checkpoint, continued, result)
+
+                # Chỉ coi là thành công khi đã lưu checkpoint cho các task con, nếu không task con sẽ không bao giờ được chạy
+                children = self.children[task_id]
+                if len(children) > 1:
+                    child_checkpoint = processor.capture_checkpoint()
+                    next_items = [(child_id, child_checkpoint, False) for child_id in children[1:]]
+                result.success = True
+                if children:
+                    item = (children[0], None, True)
+            except Exception as e:
+                result.error = str(e)
+                print(f"SuiteScheduler._worker -> worker {worker_id} failed task '{task_id}': {e}")
+            result.duration_seconds = time.perf_counter() - started_at
+
+            for next_item in next_items:
+                pending.put(next_item)
+            with self._lock:
+                self._results[task_id] = result
+                if not result.success:
+                    for descendant_id in self._descendants(task_id):
+                        self._results[descendant_id] = SuiteTaskResult(id=descendant_id, task=self.tasks[descendant_id].task, success=False,
+                                                                       skipped=True, error=f"prerequisite task '{task_id}' failed")
+
+        self._close_processor(processor, refill=False)
+
+    def run(self) -> List[SuiteTaskResult]:
+        self._results = {}
+        pending = queue.Queue()
+        roots = [task.id for task in self.suite.tasks if not self.chains[task.id]]
+        for task_id in roots:
+            pending.put((task_id, None, False))
+        leaf_count = sum(1 for task_id in self.tasks if not self.children[task_id])
+        worker_count = max(1, min(self.pool_size, leaf_count))
+
+        started_at = time.perf_counter()
+        if self.prewarm:
+            self.driver_pool = DriverPool(self.browser_profile, size=worker_count)
+        workers = [threading.Thread(target=self._worker, args=(worker_id, pending), daemon=True) for worker_id in range(worker_count)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if self.driver_pool is not None:
+            self.driver_pool.close()
+            self.driver_pool = None
+
+        results = [self._results[task.id] for task in self.suite.tasks]
+        steps = {result.id: result.steps for result in results}
+        total_steps = sum(steps.values())
+        # Số step nếu mỗi task chạy độc lập từ đầu (chạy lại toàn bộ prefix)
+        independent_steps = sum(steps[task_id] + sum(steps[prefix_id] for prefix_id in self.chains[task_id]) for task_id in steps)
+        passed = sum(1 for result in results if result.success)
+        skipped = sum(1 for result in results if result.skipped)
+        print(f"SuiteScheduler.run -> {passed}/{len(results)} passed, {skipped} skipped with {worker_count} sessions "
+              f"in {time.perf_counter() - started_at:.1f}s")
+        print(f"SuiteScheduler.run -> {total_steps} steps executed, {independent_steps} if every task ran from scratch "
+              f"({1 - total_steps / independent_steps if independent_steps else 0:.0%} saved)")
+        return results
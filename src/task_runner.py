@@ -0,0 +1,156 @@
+import os
+import queue
+import threading
+import time
+from typing import List, Optional, Union
+from pydantic import BaseModel
+from src.agent import AgentProcessor
+from src.browser_profile import BrowserProfile
+from src.driver_pool import DriverPool
+from src.session_store import SessionStore
+
+
+class TaskResult(BaseModel):
+    index: int
+    task: Union[str, List[str]]
+    success: bool
+    error: Optional[str] = None
+    duration_seconds: float
+    worker_id: int
+    startup_ms: float = 0.0 # Thời gian lấy/khởi động browser nếu task này phải tạo driver mới
+    page_load_ms: float = 0.0 # Thời gian mở lại url (load + settle) trước task
+
+
+class ProcessorWorkerMixin:
+    '''
+    Tạo/đóng AgentProcessor cho các worker (ParallelTaskRunner, JobService, SuiteScheduler).
+    Lớp dùng mixin cần có các thuộc tính url, browser_profile, driver_pool và processor_kwargs.
+    '''
+
+    def _new_processor(self, **kwargs) -> AgentProcessor:
+        return AgentProcessor(self.url, browser_profile=self.browser_profile, driver_pool=self.driver_pool, **kwargs, **self.processor_kwargs)
+
+    def _close_processor(self, processor: Optional[AgentProcessor], refill=True):
+        # refill = False: worker dừng hẳn, pool không cần khởi động driver thay thế
+        if processor is None:
+            return
+        try:
+            processor.close(refill=refill)
+        except Exception as e:
+            print(f"{type(self).__name__}._close_processor -> Failed to close driver: {e}")
+
+
+class ParallelTaskRunner(ProcessorWorkerMixin):
+    '''
+    Chạy nhiều task song song trên 1 pool gồm `pool_size` browser session, mỗi session có AgentProcessor riêng.
+    Mỗi phần tử của `tasks` là 1 task (str) hoặc 1 flow (list các task chạy tuần tự trong cùng session, vd: login rồi
+    vào module). Trước mỗi phần tử session được reset (xoá cookies/storage, mở lại url) để các task độc lập với nhau.
+    Driver được tạo lại sau `max_tasks_per_driver` task hoặc khi bị crash. Với `prewarm=True` các browser được khởi động
+    sẵn trong 1 DriverPool nên việc tạo lại driver không phải chờ Chrome khởi động.
+    Với `setup_task` (vd: login), session được đưa về trạng thái sau setup trước mỗi phần tử: lần đầu chạy setup bằng LLM,
+    các lần sau khôi phục cookies/storage đã lưu trong `session_store`.
+
+        runner = ParallelTaskRunner("https://swm.danghung.xyz/login/", pool_size=4)
+        results = runner.run([
+            "login with username 'ttc-thao' and password '123'",
+            ["login with username 'ttc-thao' and password '123'", "go to module inbound and click on view asn/receipt"],
+        ])
+    '''
+
+    def __init__(self, url, pool_size=None, max_tasks_per_driver=50, processor_kwargs=None, browser_profile: BrowserProfile = None,
+                 prewarm=True, setup_task=None, session_store: SessionStore = None):
+        self.url = url
+        self.pool_size = pool_size or min(4, os.cpu_count() or 1)
+        self.max_tasks_per_driver = max_tasks_per_driver
+        self.processor_kwargs = processor_kwargs or {}
+        self.browser_profile = browser_profile
+        self.prewarm = prewarm
+        self.setup_task = setup_task
+        self.session_store = session_store or (SessionStore() if setup_task else None)
+        self.driver_pool = None
+
+    def _create_processor(self) -> AgentProcessor:
+        return self._new_processor(session_store=self.session_store)
+
+    def _run_item(self, processor: AgentProcessor, task, timings):
+        if self.setup_task:
+            processor.ensure_setup(self.setup_task, self.url)
+        else:
+            processor.selenium_utils.reset_session(self.url)
+        timings["page_load_ms"] = processor.selenium_utils.timings["last_page_load_ms"]
+        for sub_task in ([task] if isinstance(task, str) else task):
+            if processor.execute_task(sub_task) != "finished":
+                raise Exception(f"Task '{sub_task}' stopped before the model returned finish")
+
+    def _worker(self, worker_id, pending: queue.Queue, results: List[Optional[TaskResult]]):
+        processor = None
+        tasks_on_driver = 0
+
+        while True:
+            try:
+                index, task = pending.get_nowait()
+            except queue.Empty:
+                break
+
+            started_at = time.perf_counter()
+            error = None
+            timings = {"startup_ms": 0.0, "page_load_ms": 0.0}
+            try:
+                # Tạo lại driver sau K task hoặc khi driver bị crash
+                if processor is not None and (tasks_on_driver >= self.max_tasks_per_driver or not processor.selenium_utils.is_driver_alive()):
+                    self._close_processor(processor)
+                    processor = None
+                if processor is None:
+                    processor = self._create_processor()
+                    timings["startup_ms"] = processor.selenium_utils.timings["startup_ms"]
+                    tasks_on_driver = 0
+
+                tasks_on_driver += 1
+                self._run_item(processor, task, timings)
+            except Exception as e:
+                error = str(e)
+                print(f"ParallelTaskRunner._worker -> worker {worker_id} failed task #{index}: {e}")
+
+            results[index] = TaskResult(
+                index=index,
+                task=task,
+                success=error is None,
+                error=error,
+                duration_seconds=time.perf_counter() - started_at,
+                worker_id=worker_id,
+                **timings
+            )
+
+        self._close_processor(processor, refill=False)
+
+    def run(self, tasks: List[Union[str, List[str]]]) -> List[TaskResult]:
+        pending = queue.Queue()
+        for index, task in enumerate(tasks):
+            pending.put((index, task))
+        results: List[Optional[TaskResult]] = [None] * len(tasks)
+
+        started_at = time.perf_counter()
+        if self.prewarm:
+            self.driver_pool = DriverPool(self.browser_profile, size=min(self.pool_size, len(tasks)))
+        workers = [
+            threading.Thread(target=self._worker, args=(worker_id, pending, results), daemon=True)
+            for worker_id in range(min(self.pool_size, len(tasks)))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if self.driver_pool is not None:
+            self.driver_pool.close()
+            self.driver_pool = None
+
+        passed = sum(1 for result in results if result.success)
+        print(f"ParallelTaskRunner.run -> {passed}/{len(results)} passed with {len(workers)} sessions "
+              f"in {time.perf_counter() - started_at:.1f}s")
+        startups = [result.startup_ms for result in results if result.startup_ms]
+        page_loads = [result.page_load_ms for result in results if result.page_load_ms]
+        if startups:
+            print(f"ParallelTaskRunner.run -> browser startup avg {sum(startups) / len(startups):.0f} ms over {len(startups)} drivers")
+        if page_loads:
+            print(f"ParallelTaskRunner.run -> page load avg {sum(page_loads) / len(page_loads):.0f} ms over {len(page_loads)} tasks")
+        return results
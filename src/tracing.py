@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+from pydantic import BaseModel
+
+
+class Span(BaseModel):
+    task_id: str
+    phase: str # "snapshot", "delta", "convert_to_md", "llm", "action", "task"
+    step: Optional[int] = None
+    start_time: float # epoch seconds
+    duration_ms: float = 0.0
+    outcome: str = "ok" # "ok", "error" hoặc giá trị do phase tự đặt (vd: "rejected", "failed")
+    error: Optional[str] = None
+    attributes: dict = {}
+
+
+class Tracer:
+    '''
+    Ghi span cho từng phase của từng step trong execute_task.
+    - trace_path: file JSONL (1 span / dòng), mặc định lấy từ env TRACE_PATH, None = không ghi file
+    - hooks: các hàm hook(span) được gọi khi mỗi span kết thúc, dùng để đẩy sang metrics backend riêng
+    - print_summary: in bảng tổng hợp theo phase khi task kết thúc
+
+        tracer = Tracer("traces/run.jsonl", hooks=[lambda span: statsd.timing(span.phase, span.duration_ms)])
+        processor = AgentProcessor(url, tracer=tracer)
+    '''
+
+    def __init__(self, trace_path=None, hooks: List[Callable[[Span], None]] = None, print_summary=True):
+        self.trace_path = trace_path if trace_path is not None else os.getenv("TRACE_PATH")
+        self.hooks = list(hooks or [])
+        self.print_summary = print_summary
+        self._local = threading.local() # Task đang chạy của từng thread (1 tracer có thể dùng chung cho nhiều worker)
+        self._write_lock = threading.Lock()
+
+    def add_hook(self, hook: Callable[[Span], None]):
+        self.hooks.append(hook)
+
+    def start_task(self, task: str) -> str:
+        self._local.task_id = str(uuid.uuid4())
+        self._local.task = task
+        self._local.started_at = time.time()
+        self._local.spans = []
+        return self._local.task_id
+
+    @contextmanager
+    def span(self, phase, step=None, **attributes):
+        span = Span(task_id=getattr(self._local, "task_id", ""), phase=phase, step=step, start_time=time.time(), attributes=attributes)
+        started_at = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.outcome = "error"
+            span.error = str(e)
+            raise
+        finally:
+            span.duration_ms = (time.perf_counter() - started_at) * 1000
+            self._record(span)
+
+    def end_task(self, outcome="ok", **attributes) -> List[Span]:
+        task_span = Span(
+            task_id=self._local.task_id,
+            phase="task",
+            start_time=self._local.started_at,
+            duration_ms=(time.time() - self._local.started_at) * 1000,
+            outcome=outcome,
+            attributes={"task": self._local.task, **attributes}
+        )
+        self._record(task_span)
+        spans = self._local.spans
+        self._local.spans = []
+
+        if self.trace_path:
+            self._export(spans)
+        if self.print_summary:
+            print(self.format_summary(spans))
+        return spans
+
+    def _record(self, span: Span):
+        spans = getattr(self._local, "spans", None)
+        if spans is not None:
+            spans.append(span)
+        for hook in self.hooks:
+            try:
+                hook(span)
+            except Exception as e:
+                print(f"Tracer._record -> Hook {hook} failed: {e}")
+
+    def _export(self, spans: List[Span]):
+        directory = os.path.dirname(self.trace_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lines = "".join(span.model_dump_json() + "\n" for span in spans)
+        with self._write_lock:
+            with open(self.trace_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+    @staticmethod
+    def summarize(spans: List[Span]) -> dict:
+        # {phase: {"count", "total_ms", "avg_ms", "max_ms", "not_ok"}}, không tính span "task"
+        summary = {}
+        for span in spans:
+            if span.phase == "task":
+                continue
+            row = summary.setdefault(span.phase, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "not_ok": 0})
+            row["count"] += 1
+            row["total_ms"] += span.duration_ms
+            row["max_ms"] = max(row["max_ms"], span.duration_ms)
+            row["not_ok"] += span.outcome != "ok"
+        for row in summary.values():
+            row["avg_ms"] = row["total_ms"] / row["count"]
+        return summary
+
+    @classmethod
+    def format_summary(cls, spans: List[Span]) -> str:
+        task_span = next((span for span in spans if span.phase == "task"), None)
+        lines = []
+        if task_span is not None:
+            lines.append(f"Task {task_span.task_id} ({task_span.outcome}) in {task_span.duration_ms:.0f} ms: {task_span.attributes.get('task', '')}")
+        lines.append(f"{'phase':<16}{'count':>7}{'total ms':>12}{'avg ms':>10}{'max ms':>10}{'not ok':>8}")
+        for phase, row in sorted(cls.summarize(spans).items(), key=lambda item: -item[1]["total_ms"]):
+            lines.append(f"{phase:<16}{row['count']:>7}{row['total_ms']:>12.0f}{row['avg_ms']:>10.0f}{row['max_ms']:>10.0f}{row['not_ok']:>8}")
+        return "\n".join(lines)
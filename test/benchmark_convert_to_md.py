@@ -0,0 +1,51 @@
+import time
+from pathlib import Path
+from src.dom_analyzer import DomAnalyzer
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures' / 'pages'
+
+
+def load_pages(scale=50):
+    # Mỗi fixture được nhân lên `scale` lần để giả lập các màn hình admin lớn
+    pages = {}
+    for path in sorted(FIXTURES_DIR.glob('*.html')):
+        html_doc = path.read_text(encoding='utf-8')
+        pages[path.name] = html_doc
+        pages[f'{path.name} x{scale}'] = '\n'.join([html_doc] * scale)
+    return pages
+
+
+def measure(convert, html_doc, min_seconds=1.0):
+    iterations = 0
+    started_at = time.perf_counter()
+    while True:
+        convert(html_doc)
+        iterations += 1
+        elapsed = time.perf_counter() - started_at
+        if elapsed >= min_seconds:
+            return iterations / elapsed
+
+
+def main():
+    parsers = ['html.parser']
+    try:
+        import lxml  # noqa: F401
+        parsers.append('lxml')
+    except ImportError:
+        pass
+
+    legacy = DomAnalyzer(parser='html.parser')
+    print(f"{'page':<20} {'implementation':<20} {'pages/sec':>10} {'MB/sec':>8} {'speedup':>8}")
+    for name, html_doc in load_pages().items():
+        size_mb = len(html_doc.encode('utf-8')) / (1024 * 1024)
+        baseline = measure(legacy.convert_to_md_legacy, html_doc)
+        print(f"{name:<20} {'legacy':<20} {baseline:>10.1f} {baseline * size_mb:>8.2f} {1:>8.2f}")
+
+        for parser in parsers:
+            pages_per_sec = measure(DomAnalyzer(parser=parser).convert_to_md, html_doc)
+            print(f"{name:<20} {'fast/' + parser:<20} {pages_per_sec:>10.1f} "
+                  f"{pages_per_sec * size_mb:>8.2f} {pages_per_sec / baseline:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
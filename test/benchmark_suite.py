@@ -0,0 +1,216 @@
+'''
+Benchmark end-to-end chạy offline: corpus HTML (test/fixtures/pages, nhân lên nhiều kích thước) được phục vụ bởi
+PageServer local, model được thay bằng ScriptedModel nên không gọi OpenAI. Kết quả được nối vào file JSONL (mặc định
+.cache/benchmark_results.jsonl) kèm commit hiện tại và so sánh với lần chạy trước để phát hiện regression.
+
+    python -m test.benchmark_suite --iterations 20
+'''
+import argparse
+import json
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from src.agent import AgentProcessor
+from src.browser_profile import BrowserProfile
+from src.dom_analyzer import DomAnalyzer
+from src.selenium_utils import SeleniumUtils
+from src.tracing import Tracer
+from test.benchmark_convert_to_md import load_pages
+from test.page_server import PageServer
+from test.stub_model import ScriptedModel
+
+
+RESULTS_PATH = Path(__file__).parent.parent / '.cache' / 'benchmark_results.jsonl'
+REGRESSION_THRESHOLD = 0.2 # Chậm hơn 20% so với lần chạy trước thì báo regression
+
+TASKS = {
+    "login": {
+        "page": "login.html",
+        "task": "login with username 'ttc-thao' and password '123'",
+        "script": [
+            {"action": "enter_text", "target": 'name="username"', "text": "ttc-thao"},
+            {"action": "enter_text", "target": 'name="password"', "text": "123"},
+            {"action": "click", "target": 'type="submit"'},
+        ],
+    },
+    "form": {
+        "page": "form.html",
+        "task": "create an ASN for supplier Acme with note 'urgent delivery'",
+        "script": [
+            {"action": "enter_text", "target": 'name="supplier"', "text": "Acme"},
+            {"action": "click", "target": 'data-value="acme"'},
+            {"action": "enter_text", "target": 'name="notes"', "text": "urgent delivery"},
+            {"action": "click", "target": 'type="submit"'},
+        ],
+    },
+}
+
+
+def get_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_corpus(directory, scale):
+    # Tên file không chứa khoảng trắng để dùng được làm URL
+    names = []
+    for name, html_doc in load_pages(scale).items():
+        file_name = name.replace(' ', '_')
+        Path(directory, file_name).write_text(f"<html><body>{html_doc}</body></html>", encoding='utf-8')
+        names.append(file_name)
+    return names
+
+
+def latency_stats(samples_ms):
+    samples_ms = sorted(samples_ms)
+    return {
+        "p50_ms": statistics.median(samples_ms),
+        "p95_ms": samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.95))],
+        "mean_ms": statistics.fmean(samples_ms),
+    }
+
+
+def measure(function, iterations):
+    # Trả về (kết quả lần cuối, latency stats, peak bytes do Python cấp phát)
+    samples_ms = []
+    tracemalloc.start()
+    try:
+        for _ in range(iterations):
+            started_at = time.perf_counter()
+            result = function()
+            samples_ms.append((time.perf_counter() - started_at) * 1000)
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, latency_stats(samples_ms), peak_bytes
+
+
+def bench_get_visible_dom(selenium_utils, server, pages, iterations):
+    results = {}
+    for page in pages:
+        selenium_utils.go_to_url(server.url_for(page))
+        for mode in SeleniumUtils.SNAPSHOT_MODES:
+            snapshot, stats, peak_bytes = measure(lambda: selenium_utils.take_snapshot(mode), iterations)
+            js_heap_bytes = selenium_utils.driver.execute_script("return performance.memory ? performance.memory.usedJSHeapSize : null;")
+            results[f"get_visible_dom/{mode}/{page}"] = {
+                **stats,
+                "pages_per_sec": 1000 / stats["mean_ms"],
+                "payload_bytes": snapshot.payload_bytes,
+                "peak_python_bytes": peak_bytes,
+                "js_heap_bytes": js_heap_bytes,
+            }
+    return results
+
+
+def bench_convert_to_md(selenium_utils, server, pages, iterations):
+    # Dùng đúng HTML mà get_visible_dom trả về để đo convert_to_md trên input thực tế
+    results = {}
+    dom_analyzer = DomAnalyzer()
+    for page in pages:
+        selenium_utils.go_to_url(server.url_for(page))
+        html_doc = selenium_utils.get_visible_dom()
+        size_mb = len(html_doc.encode('utf-8')) / (1024 * 1024)
+        markdown, stats, peak_bytes = measure(lambda: dom_analyzer.convert_to_md(html_doc), iterations)
+        results[f"convert_to_md/{dom_analyzer.parser}/{page}"] = {
+            **stats,
+            "pages_per_sec": 1000 / stats["mean_ms"],
+            "mb_per_sec": size_mb * 1000 / stats["mean_ms"],
+            "markdown_chars": len(markdown),
+            "peak_python_bytes": peak_bytes,
+        }
+    return results
+
+
+def bench_execute_task(server, profile, iterations):
+    results = {}
+    for name, spec in TASKS.items():
+        model = ScriptedModel(spec["script"])
+        tracer = Tracer(print_summary=False)
+        spans = []
+        tracer.add_hook(spans.append)
+        url = server.url_for(spec["page"])
+        processor = AgentProcessor(url, browser_profile=profile, tracer=tracer, model=model)
+        try:
+            def run():
+                model.reset()
+                processor.selenium_utils.go_to_url(url)
+                processor.execute_task(spec["task"])
+
+            _, stats, peak_bytes = measure(run, iterations)
+        finally:
+            processor.close()
+
+        phases = {phase: {"avg_ms": row["avg_ms"], "count_per_task": row["count"] / iterations}
+                  for phase, row in Tracer.summarize(spans).items()}
+        results[f"execute_task/{name}"] = {
+            **stats,
+            "tasks_per_min": 60000 / stats["mean_ms"],
+            "peak_python_bytes": peak_bytes,
+            "phases": phases,
+        }
+    return results
+
+
+def load_previous(results_path):
+    if not results_path.exists():
+        return None
+    lines = results_path.read_text(encoding='utf-8').splitlines()
+    return json.loads(lines[-1]) if lines else None
+
+
+def report(results, previous):
+    previous_results = (previous or {}).get("results", {})
+    regressions = []
+    print(f"{'benchmark':<45} {'p50 ms':>9} {'p95 ms':>9} {'peak KB':>9} {'vs prev':>8}")
+    for name, row in results.items():
+        change = ""
+        before = previous_results.get(name)
+        if before:
+            ratio = row["p50_ms"] / before["p50_ms"] - 1
+            change = f"{ratio:+.0%}"
+            if ratio > REGRESSION_THRESHOLD:
+                regressions.append(name)
+        print(f"{name:<45} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['peak_python_bytes'] / 1024:>9.0f} {change:>8}")
+    if regressions:
+        print(f"Regressions (> {REGRESSION_THRESHOLD:.0%} slower than {previous.get('commit')}): {', '.join(regressions)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for get_visible_dom, convert_to_md and execute_task")
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--scale', type=int, default=50, help="Số lần nhân mỗi fixture để tạo trang lớn")
+    parser.add_argument('--output', type=Path, default=RESULTS_PATH)
+    parser.add_argument('--headed', action='store_true', help="Chạy Chrome có giao diện thay vì headless")
+    args = parser.parse_args()
+
+    profile = BrowserProfile() if args.headed else BrowserProfile.fast()
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        pages = write_corpus(corpus_dir, args.scale)
+
+        with PageServer(corpus_dir) as server:
+            selenium_utils = SeleniumUtils(profile=profile)
+            try:
+                results = bench_get_visible_dom(selenium_utils, server, pages, args.iterations)
+                results.update(bench_convert_to_md(selenium_utils, server, pages, args.iterations))
+            finally:
+                selenium_utils.close_local_driver()
+            results.update(bench_execute_task(server, profile, args.iterations))
+
+    previous = load_previous(args.output)
+    regressions = report(results, previous)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({"commit": get_commit(), "timestamp": time.time(), "iterations": args.iterations,
+                            "scale": args.scale, "results": results}) + "\n")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
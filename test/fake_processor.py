@@ -0,0 +1,55 @@
+class FakeSeleniumUtils:
+    # Trạng thái browser = task cuối cùng đã chạy thành công
+    def __init__(self):
+        self.state = None
+
+    def reset_session(self, url):
+        self.state = None
+
+    def is_driver_alive(self):
+        return True
+
+    def capture_session_state(self):
+        return {"url": "https://example.test/dashboard", "cookies": [], "local_storage": {}, "session_storage": {}}
+
+
+class FakeProcessor:
+    '''
+    AgentProcessor giả cho các test worker (JobService, SuiteScheduler), không mở browser:
+    - task 'fail' báo lỗi, task 'stop' dừng mà không finish, các task khác trả về "finished" sau 2 step
+    - `release`: threading.Event mỗi task chờ trước khi chạy (để test hàng đợi)
+    - `executed`: list ghi lại các task đã chạy, dùng chung giữa các processor
+    - checkpoint chỉ khôi phục được nếu `checkpoints_valid`
+    '''
+
+    def __init__(self, release=None, executed=None, checkpoints_valid=True, checkpoint_error=None):
+        self.selenium_utils = FakeSeleniumUtils()
+        self.release = release
+        self.executed = executed if executed is not None else []
+        self.checkpoints_valid = checkpoints_valid
+        self.checkpoint_error = checkpoint_error
+        self.last_task_stats = {}
+
+    def execute_task(self, task):
+        if self.release is not None:
+            self.release.wait(5)
+        self.executed.append(task)
+        self.last_task_stats = {"steps": 2}
+        if task == 'fail':
+            raise Exception('task failed')
+        if task == 'stop':
+            return 'stopped'
+        self.selenium_utils.state = task
+        return 'finished'
+
+    def capture_checkpoint(self):
+        if self.checkpoint_error is not None:
+            raise Exception(self.checkpoint_error)
+        return {"state": self.selenium_utils.state, "fingerprint": self.selenium_utils.state}
+
+    def restore_checkpoint(self, checkpoint, base_url):
+        self.selenium_utils.state = checkpoint["state"]
+        return self.checkpoints_valid
+
+    def close(self, refill=True):
+        pass
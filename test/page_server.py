@@ -0,0 +1,48 @@
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+class PageServer:
+    '''
+    Server HTTP local phục vụ corpus HTML đã lưu (thư mục `root`) cho benchmark/test end-to-end.
+    POST (vd: submit form) được redirect về GET cùng path để form trong corpus không làm hỏng luồng task.
+
+        with PageServer(corpus_dir) as server:
+            processor = AgentProcessor(server.url_for('login.html'))
+    '''
+
+    def __init__(self, root):
+        self.root = str(root)
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), partial(self._make_handler(), directory=self.root))
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def url_for(self, name):
+        return f"{self.base_url}/{name}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        class Handler(SimpleHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self.send_response(303)
+                self.send_header('Location', self.path)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        return Handler
@@ -0,0 +1,53 @@
+from typing import List, Optional
+from src.dom_analyzer import INTERACTIVE_MD_PATTERN, ATTRIBUTE_PATTERN
+from src.model import TestStep
+
+
+class ScriptedModel:
+    '''
+    Model giả lập có cùng interface với Model.get_action/get_actions, trả về các step theo kịch bản cố định.
+    Mỗi phần tử của `script` là 1 dict {"action", "target", "text", "description"}: `target` là chuỗi con cần có trong
+    thẻ mở của phần tử interactive trong prompt (vd: 'name="username"'), id của phần tử đó được dùng làm css_selector.
+    Nhờ vậy kịch bản không phụ thuộc vào id tự sinh của từng lần chạy. Hết kịch bản thì trả về finish.
+    '''
+
+    def __init__(self, script, model_name="o4-mini"):
+        self.script = list(script)
+        self.model_name = model_name
+        self.system_prompt = ""
+        self.last_call_stats = {}
+        self.prompts = []
+        self._position = 0
+
+    def reset(self):
+        self._position = 0
+        self.prompts = []
+
+    def _resolve(self, entry, user_prompt) -> TestStep:
+        css_selector = ""
+        target = entry.get("target")
+        if target:
+            for _, attributes in INTERACTIVE_MD_PATTERN.findall(user_prompt):
+                if target in attributes:
+                    css_selector = "#" + dict(ATTRIBUTE_PATTERN.findall(attributes)).get("id", "")
+                    break
+            else:
+                raise ValueError(f"ScriptedModel: no element matching {target!r} in the prompt")
+        return TestStep(
+            action=entry["action"],
+            css_selector=css_selector,
+            text=entry.get("text", ""),
+            description=entry.get("description", entry["action"])
+        )
+
+    def get_action(self, user_prompt: str, message_history: Optional[list] = None) -> TestStep:
+        self.prompts.append(user_prompt)
+        self.last_call_stats = {"attempts": 1, "retries": 0, "last_error_class": None}
+        if self._position >= len(self.script):
+            return TestStep(action="finish", css_selector="", text="", description="Task finished")
+        entry = self.script[self._position]
+        self._position += 1
+        return self._resolve(entry, user_prompt)
+
+    def get_actions(self, user_prompt: str, message_history: Optional[list] = None) -> List[TestStep]:
+        return [self.get_action(user_prompt, message_history)]
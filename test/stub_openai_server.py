@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubOpenAIServer:
+    '''
+    Server OpenAI-compatible (chỉ /v1/chat/completions) chạy local để test/benchmark không cần gọi OpenAI thật.
+    Mỗi request trả về 1 tool call `final_result` với arguments lấy lần lượt từ `responses` (lặp lại phần tử cuối).
+    prefix_cache = True: giả lập prompt caching của provider, phần đầu messages trùng với 1 request trước được tính là
+    cached_tokens (~4 ký tự / token) và chỉ phần chưa cache mới chịu `latency_per_uncached_token`.
+    '''
+
+    def __init__(self, responses, latency_seconds=0.0, prefix_cache=False, latency_per_uncached_token=0.0):
+        self.responses = list(responses)
+        self.latency_seconds = latency_seconds
+        self.prefix_cache = prefix_cache
+        self.latency_per_uncached_token = latency_per_uncached_token
+        self.usages = []
+        self._prompts = []
+        self.requests = []
+        self.connections = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _next_response(self, body):
+        with self._lock:
+            self.requests.append(body)
+            index = min(len(self.requests), len(self.responses)) - 1
+            return self.responses[index]
+
+    def _usage(self, body):
+        prompt = json.dumps(body.get("messages", []))
+        with self._lock:
+            cached_chars = 0
+            if self.prefix_cache:
+                for previous in self._prompts:
+                    length = 0
+                    for left, right in zip(previous, prompt):
+                        if left != right:
+                            break
+                        length += 1
+                    cached_chars = max(cached_chars, length)
+            self._prompts.append(prompt)
+            usage = {"prompt_tokens": len(prompt) // 4, "cached_tokens": cached_chars // 4}
+            self.usages.append(usage)
+        return usage
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections.add(self.client_address)
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                response = stub._next_response(body)
+                usage = stub._usage(body)
+                latency = stub.latency_seconds + (usage["prompt_tokens"] - usage["cached_tokens"]) * stub.latency_per_uncached_token
+                if latency:
+                    time.sleep(latency)
+
+                payload = json.dumps({
+                    "id": f"chatcmpl-{len(stub.requests)}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "tool_calls",
+                        "message": {
+                            "role": "assistant",
+                            "content": None,
+                            "tool_calls": [{
+                                "id": f"call_{len(stub.requests)}",
+                                "type": "function",
+                                "function": {"name": "final_result", "arguments": json.dumps(response)}
+                            }]
+                        }
+                    }],
+                    "usage": {
+                        "prompt_tokens": usage["prompt_tokens"],
+                        "completion_tokens": 20,
+                        "total_tokens": usage["prompt_tokens"] + 20,
+                        "prompt_tokens_details": {"cached_tokens": usage["cached_tokens"]}
+                    }
+                }).encode('utf-8')
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
@@ -0,0 +1,76 @@
+import pytest
+from pydantic_ai.messages import ModelRequest, ModelResponse, SystemPromptPart, ToolCallPart, UserPromptPart
+from src.agent import AgentProcessor
+from src.model import TestStep
+from src.prompt_builder import PromptBuilder
+from src.session_store import SessionStore
+from test.fake_processor import FakeSeleniumUtils
+
+REPLAYED = TestStep(action='enter_text', css_selector='#username', text='ttc-thao', description='Enter username')
+
+
+def make_processor(**attributes):
+    # Không mở browser: chỉ cần các thuộc tính generate_prompt dùng tới
+    processor = AgentProcessor.__new__(AgentProcessor)
+    processor.prompt_builder = PromptBuilder(None, 'stub-model')
+    processor.system_prompt_tokens = 0
+    processor.full_page = False
+    processor.multi_turn = True
+    processor.verbose = False
+    processor.__dict__.update(attributes)
+    return processor
+
+
+def test_multi_turn_first_prompt_reports_steps_executed_without_model():
+    processor = make_processor()
+
+    prompt = processor.generate_prompt('login', '<input id="password">', True, first_turn=True, unreported_steps=[REPLAYED])
+    assert '"""login"""' in prompt and 'ttc-thao' in prompt
+
+    prompt = processor.generate_prompt('login', '<input id="password">', False, last_step=REPLAYED, invalid_reason='not found',
+                                       first_turn=True, unreported_steps=[])
+    assert '"""login"""' in prompt and 'not found' in prompt
+
+
+def test_ensure_setup_only_stores_sessions_of_finished_setup_tasks(tmp_path):
+    outcomes = ['stopped', 'finished']
+    processor = make_processor(selenium_utils=FakeSeleniumUtils(), session_store=SessionStore(tmp_path / 'sessions.json'),
+                               _get_current_fingerprint=lambda: 'login-page', execute_task=lambda task: outcomes.pop(0))
+
+    with pytest.raises(Exception):
+        processor.ensure_setup('login as admin', 'https://example.test/login')
+    assert processor.session_store.get('https://example.test/login', 'login as admin') is None
+
+    assert processor.ensure_setup('login as admin', 'https://example.test/login') == 'executed'
+    assert processor.session_store.get('https://example.test/login', 'login as admin') is not None
+
+
+def test_generate_prompt_prints_the_prompt_report_only_when_verbose(capsys):
+    processor = make_processor(multi_turn=False)
+    capsys.readouterr()
+    processor.generate_prompt('login', '<input id="password">', True)
+    assert capsys.readouterr().out == ''
+
+    processor.verbose = True
+    processor.generate_prompt('login', '<input id="password">', True)
+    assert 'AgentProcessor.generate_prompt -> ' in capsys.readouterr().out
+
+
+def test_prompt_budget_reserves_tokens_for_message_history():
+    markdown = ' '.join(f'<a id="l{index}">Report {index}</a>' for index in range(20)) + ' <button id="b1">Login</button>'
+    history = [
+        ModelRequest(parts=[SystemPromptPart('system ' * 100), UserPromptPart('earlier page ' * 100)]),
+        ModelResponse(parts=[ToolCallPart('final_result', {'action': 'click', 'css_selector': '#b0'})])
+    ]
+    processor = make_processor()
+    history_tokens = processor.prompt_builder.count_history_tokens(history)
+    processor.generate_prompt('click login', markdown, True, first_turn=False)
+    budget = processor.last_prompt_report["total_tokens"] + history_tokens - 40 # trang đầy đủ + lịch sử vượt budget
+
+    processor.prompt_builder.token_budget = budget
+    prompt = processor.generate_prompt('click login', markdown, True, first_turn=False, message_history=history)
+    report = processor.last_prompt_report
+    assert 'id="b1"' in prompt
+    assert report["history_tokens"] == history_tokens
+    assert report["elements_dropped"] > 0
+    assert report["total_tokens"] <= budget
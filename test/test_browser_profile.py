@@ -0,0 +1,90 @@
+import time
+import pytest
+from src.browser_profile import BrowserProfile
+from src.driver_pool import DriverPool
+
+
+def test_default_profile_keeps_plain_chrome_options():
+    profile = BrowserProfile()
+
+    assert profile.build_options().arguments == []
+    assert profile.get_blocked_url_patterns() == []
+
+
+def test_fast_profile_is_headless_and_blocks_heavy_resources():
+    profile = BrowserProfile.fast(blocked_urls=["*google-analytics.com*"])
+    arguments = profile.build_options().arguments
+
+    assert "--headless=new" in arguments
+    assert "--disable-extensions" in arguments
+    assert "--disable-background-timer-throttling" in arguments
+    patterns = profile.get_blocked_url_patterns()
+    assert "*.png" in patterns and "*.woff2" in patterns and "*.mp4" in patterns
+    assert patterns[-1] == "*google-analytics.com*"
+
+
+def test_unknown_resource_type_is_rejected():
+    with pytest.raises(ValueError):
+        BrowserProfile(blocked_resource_types=["stylesheet"]).get_blocked_url_patterns()
+
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_count = 0
+
+    def quit(self):
+        self.quit_count += 1
+
+
+class FakeProfile(BrowserProfile):
+    launch_seconds: float = 0.0
+    drivers: list = []
+
+    def create_driver(self):
+        time.sleep(self.launch_seconds)
+        driver = FakeDriver()
+        self.drivers.append(driver)
+        return driver
+
+
+def wait_for_idle_drivers(pool, count):
+    deadline = time.time() + 5
+    while pool._drivers.qsize() < count and time.time() < deadline:
+        time.sleep(0.01)
+    return pool._drivers.qsize()
+
+
+def test_driver_pool_refills_only_when_drivers_are_released():
+    pool = DriverPool(FakeProfile(), size=2)
+    assert wait_for_idle_drivers(pool, 2) == 2
+
+    first, warm = pool.acquire()
+    second, _ = pool.acquire()
+    time.sleep(0.1)
+    assert warm and pool._drivers.qsize() == 0 # không khởi động thêm browser khi worker giữ driver
+
+    pool.release(first)
+    assert wait_for_idle_drivers(pool, 1) == 1
+    pool.close()
+
+
+def test_driver_pool_does_not_refill_for_retired_workers():
+    profile = FakeProfile()
+    pool = DriverPool(profile, size=2)
+    assert wait_for_idle_drivers(pool, 2) == 2
+
+    drivers = [pool.acquire()[0] for _ in range(2)]
+    for driver in drivers:
+        pool.release(driver, refill=False)
+    time.sleep(0.1)
+    pool.close()
+
+    assert len(profile.drivers) == 2
+
+
+def test_driver_pool_close_waits_for_launching_drivers():
+    profile = FakeProfile(launch_seconds=0.2)
+    pool = DriverPool(profile, size=1)
+    pool.close()
+
+    assert len(profile.drivers) == 1 and profile.drivers[0].quit_count == 1
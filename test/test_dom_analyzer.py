@@ -0,0 +1,107 @@
+import random
+from pathlib import Path
+import pytest
+from src.dom_analyzer import DomAnalyzer
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures' / 'pages'
+FIXTURES = sorted(FIXTURES_DIR.glob('*.html'))
+
+WORDS = ['Login', 'user_name', 'a*b', 'Tom &amp; Jerry', '5 &lt; 6', 'Total: 10', '#tag', '[link]', 'café', 'x.postfix', '  ', '\n']
+ATTRIBUTES = ['type="submit"', 'value="a &amp; b"', 'name="user"', 'placeholder="Email"', 'role="button"', 'title="T"',
+              'data-viewport="below"', 'class="btn"', 'style="color: red"', 'hidden="true"', 'aria-label="Close"',
+              'href="data:image/png;base64,AAAA"']
+CONTAINER_TAGS = ['div', 'p', 'form', 'ul', 'h1', 'h2', 'h3', 'table', 'label', 'span', 'b', 'li']
+INTERACTIVE_TAGS = ['a', 'button', 'textarea', 'li']
+# Mảnh HTML lỗi/đặc biệt: end tag thừa, tag không đóng, doctype giữa body, CDATA...
+MALFORMED = ['<li>', '</div>', '<p>', '<br>', '<!DOCTYPE html>', '<![CDATA[a_b]]>', '&nbsp;', '<pre> a\n b </pre>',
+             '<style>x</style>', '<!-- x -->', '<script>x()</script>', '<noscript>x</noscript>', '<iframe>x</iframe>',
+             '<img src="data:image/png;base64,AAAA" alt="pic">']
+
+
+def random_text(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(0, 3)))
+
+
+def random_attributes(rng, ids):
+    attributes = rng.sample(ATTRIBUTES, rng.randint(0, 3))
+    if ids is not None and rng.random() < 0.8:
+        ids.append(len(ids))
+        attributes.insert(0, f'id="ai-{len(ids)}"')
+    return ''.join(' ' + attribute for attribute in attributes)
+
+
+def random_node(rng, depth, ids):
+    roll = rng.random()
+    if depth > 4 or roll < 0.3:
+        return random_text(rng)
+    if roll < 0.45:
+        return rng.choice(MALFORMED)
+    if roll < 0.5:
+        return f'<input{random_attributes(rng, ids)}>'
+    tag = rng.choice(INTERACTIVE_TAGS) if roll < 0.7 else rng.choice(CONTAINER_TAGS)
+    children = ''.join(random_node(rng, depth + 1, ids) for _ in range(rng.randint(0, 4)))
+    return f'<{tag}{random_attributes(rng, ids if roll < 0.7 else None)}>{children}</{tag}>'
+
+
+def random_page(seed):
+    rng = random.Random(seed)
+    separator = rng.choice(['', ' ', '\n'])
+    return '<html><body>' + separator.join(random_node(rng, 0, []) for _ in range(rng.randint(1, 6))) + '</body></html>'
+
+
+@pytest.mark.parametrize('fixture', FIXTURES, ids=lambda path: path.name)
+def test_convert_to_md_matches_legacy(fixture):
+    html_doc = fixture.read_text(encoding='utf-8')
+    dom_analyzer = DomAnalyzer()
+
+    assert dom_analyzer.convert_to_md(html_doc) == dom_analyzer.convert_to_md_legacy(html_doc)
+
+
+def test_convert_to_md_matches_legacy_on_random_pages():
+    dom_analyzer = DomAnalyzer()
+    mismatches = [seed for seed in range(2000)
+                  if dom_analyzer.convert_to_md(random_page(seed)) != dom_analyzer.convert_to_md_legacy(random_page(seed))]
+
+    assert mismatches == []
+
+
+def test_convert_to_md_keeps_heading_underline_length_of_legacy():
+    html_doc = '<h2>Account <a id="ai-1" href="/me">Profile</a></h2>'
+    dom_analyzer = DomAnalyzer()
+
+    assert dom_analyzer.convert_to_md(html_doc) == dom_analyzer.convert_to_md_legacy(html_doc)
+
+
+def test_convert_to_md_keeps_only_whitelisted_attributes():
+    html_doc = '<div><button id="b1" class="btn" style="color: red" type="submit">Login<script>x()</script></button></div>'
+    markdown = DomAnalyzer(parser='html.parser').convert_to_md(html_doc)
+
+    assert markdown.strip() == '<button id="b1" type="submit">Login</button>'
+
+
+def test_build_element_index_maps_ids_to_tag_and_attributes():
+    html_doc = '<form><input id="u1" type="text" name="user"><input id="s1" type="submit"><textarea id="t1"></textarea></form>'
+    dom_analyzer = DomAnalyzer(parser='html.parser')
+    element_index = dom_analyzer.build_element_index(dom_analyzer.convert_to_md(html_doc))
+
+    assert set(element_index) == {'u1', 's1', 't1'}
+    assert element_index['u1'] == {'tag': 'input', 'attributes': {'id': 'u1', 'type': 'text', 'name': 'user'}}
+    assert element_index['t1']['tag'] == 'textarea'
+
+
+def test_page_fingerprint_ignores_viewport_position():
+    dom_analyzer = DomAnalyzer(parser='html.parser')
+    above = dom_analyzer.convert_to_md('<button id="b1" type="submit" data-viewport="above">Save</button>')
+    below = dom_analyzer.convert_to_md('<button id="b1" type="submit" data-viewport="below">Save</button>')
+
+    assert 'data-viewport="above"' in above
+    assert dom_analyzer.get_page_fingerprint(above) == dom_analyzer.get_page_fingerprint(below)
+
+
+def test_index_fingerprint_of_merged_deltas_matches_full_snapshot():
+    dom_analyzer = DomAnalyzer(parser='html.parser')
+    full = dom_analyzer.convert_to_md('<input id="u1" name="user"><button id="b1" type="submit">Login</button>')
+    element_index = dom_analyzer.build_element_index(dom_analyzer.convert_to_md('<button id="b1" type="submit">Login</button>'))
+    element_index.update(dom_analyzer.build_element_index(dom_analyzer.convert_to_md('<input id="u1" name="user" data-viewport="below">')))
+
+    assert dom_analyzer.get_index_fingerprint(element_index) == dom_analyzer.get_page_fingerprint(full)
@@ -0,0 +1,44 @@
+import os
+from src.history_store import HistoryStore
+
+
+def page(i):
+    # DOM khác nhau, khó nén để dễ vượt budget
+    return ''.join(f'<div id="ai-{i}-{j}">{os.urandom(16).hex()}</div>' for j in range(50))
+
+
+def test_steps_are_deduplicated_and_looked_up_by_task_and_step():
+    store = HistoryStore()
+    store.start_task('t1', 'login')
+    store.record_step('t1', 1, dom='<html>same</html>', markdown='# same', prompt='prompt 1')
+    store.record_step('t1', 2, dom='<html>same</html>', markdown='# same', prompt='prompt 2', outcome='ok')
+
+    assert store.get_step('t1', 2)['dom'] == '<html>same</html>'
+    assert store.get_step('t1', 2)['outcome'] == 'ok'
+    assert [step['prompt'] for step in store.get_task('t1', include_content=True)['steps']] == ['prompt 1', 'prompt 2']
+    assert store.find_tasks('login') == ['t1']
+    assert store.get_stats()['deduplicated'] == 2
+
+
+def test_memory_stays_within_budget_and_evicted_blobs_spill_to_disk(tmp_path):
+    store = HistoryStore(max_bytes=8 * 1024, spill_dir=tmp_path)
+    store.start_task('t1', 'long task')
+    for i in range(50):
+        store.record_step('t1', i, dom=page(i))
+
+    stats = store.get_stats()
+    assert stats['memory_bytes'] <= 8 * 1024
+    assert stats['blobs_spilled'] > 0
+    assert store.get_step('t1', 0)['dom'].startswith('<div id="ai-0-0">')
+
+
+def test_evicted_blobs_are_dropped_without_spill_dir_and_memo_falls_back():
+    store = HistoryStore(max_bytes=8 * 1024)
+    store.memo_put('dom-hash', '# markdown')
+    store.start_task('t1', 'long task')
+    for i in range(50):
+        store.record_step('t1', i, dom=page(i))
+
+    assert store.get_stats()['memory_bytes'] <= 8 * 1024
+    assert store.get_step('t1', 0)['dom'] is None
+    assert store.memo_get('dom-hash') is None
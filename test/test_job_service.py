@@ -0,0 +1,78 @@
+import threading
+import time
+import pytest
+from src.job_service import JobService, QueueFullError, SUCCEEDED, FAILED
+from src.server import create_app
+from test.fake_processor import FakeProcessor
+
+
+class FakeJobService(JobService):
+    # Không mở browser: mỗi worker dùng processor giả, task chờ `release` để test được hàng đợi
+    def __init__(self, **kwargs):
+        super().__init__('http://localhost/', prewarm=False, **kwargs)
+        self.release = threading.Event()
+
+    def _create_processor(self, job_ref):
+        return FakeProcessor(release=self.release)
+
+
+def test_full_queue_rejects_jobs_with_retry_after():
+    service = FakeJobService(workers=1, queue_size=1)
+    service.submit(['task 1'])
+
+    with pytest.raises(QueueFullError) as error:
+        service.submit(['task 2'])
+    assert error.value.retry_after_seconds >= 1
+    assert service.get_metrics()['rejected'] == 1
+
+
+def test_jobs_run_and_publish_events():
+    service = FakeJobService(workers=2, queue_size=4)
+    service.start()
+    try:
+        ok = service.submit(['open inbound', 'create asn'])
+        failed = service.submit(['fail'])
+        service.release.set()
+
+        deadline = time.time() + 5
+        while not (ok.done and failed.done) and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        service.stop(timeout_seconds=5)
+
+    assert ok.status == SUCCEEDED
+    assert [event['type'] for event in ok.events] == ['queued', 'running', 'task_started', 'task_started', 'succeeded']
+    assert failed.status == FAILED and failed.error == 'task failed'
+    metrics = service.get_metrics()
+    assert metrics['succeeded'] == 1 and metrics['failed'] == 1 and metrics['queued'] == 0
+
+
+def test_jobs_fail_when_a_task_stops_without_finish():
+    service = FakeJobService(workers=1)
+    service.start()
+    try:
+        job = service.submit(['open inbound', 'stop'])
+        service.release.set()
+        deadline = time.time() + 5
+        while not job.done and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        service.stop(timeout_seconds=5)
+
+    assert job.status == FAILED and 'stop' in job.error
+
+
+def test_submit_validates_tasks():
+    with pytest.raises(ValueError):
+        FakeJobService().submit([])
+    with pytest.raises(ValueError):
+        FakeJobService().submit('login')
+
+
+def test_server_rejects_invalid_tasks_and_last_event_id():
+    service = FakeJobService()
+    client = create_app(service).test_client()
+
+    assert client.post('/jobs', json={"tasks": "login"}).status_code == 400
+    job_id = client.post('/jobs', json={"tasks": ["login"]}).get_json()["id"]
+    assert client.get(f'/jobs/{job_id}/events', headers={"Last-Event-ID": "abc"}).status_code == 400
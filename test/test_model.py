@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import time
+import warnings
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.models.openai import OpenAIModel
+from pydantic_ai.providers.openai import OpenAIProvider
+from src.config import DEFAUL_SYSTEM_PROMPT, BATCH_SYSTEM_PROMPT
+from src.model import Model, TestStep
+from src.retry_policy import RateLimiter
+from test.stub_openai_server import StubOpenAIServer
+
+STEP = {"action": "click", "css_selector": "#login", "text": "", "description": "Click the login button"}
+CALLS = 20
+
+
+def build_agent_per_call(base_url):
+    # Cách cũ: tạo OpenAIModel/OpenAIProvider/Agent mới cho mỗi lần gọi
+    return Agent(
+        OpenAIModel(model_name='o4-mini', provider=OpenAIProvider(base_url=base_url, api_key='test')),
+        output_type=TestStep,
+        system_prompt='system'
+    )
+
+
+def test_cached_agent_removes_per_call_construction_overhead():
+    # Đo đúng phần việc Model bỏ được: dựng OpenAIModel/OpenAIProvider/Agent ở mỗi lần gọi.
+    # (Không so số connection: OpenAIProvider không truyền http_client cũng đã dùng chung cached_async_http_client)
+    model = Model(model_name='stub-model', base_url='http://127.0.0.1:9/v1', api_key='test')
+
+    async def measure():
+        started_at = time.perf_counter()
+        for _ in range(CALLS):
+            build_agent_per_call(model.base_url)
+        per_call_construction = (time.perf_counter() - started_at) / CALLS
+
+        agent = model._get_agent()
+        started_at = time.perf_counter()
+        for _ in range(CALLS):
+            assert model._get_agent() is agent
+        per_call_lookup = (time.perf_counter() - started_at) / CALLS
+        await Model.close_shared_clients()
+        return per_call_construction, per_call_lookup
+
+    per_call_construction, per_call_lookup = asyncio.run(measure())
+
+    assert per_call_lookup * 10 < per_call_construction, \
+        f"construction {per_call_construction * 1000:.3f} ms vs cached lookup {per_call_lookup * 1000:.3f} ms"
+
+
+def test_get_action_uses_configured_model_name():
+    with StubOpenAIServer([STEP]) as server:
+        model = Model(model_name='stub-model', base_url=server.base_url, api_key='test')
+        for _ in range(3):
+            assert model.get_action('click login') == TestStep(**STEP)
+
+    assert [request["model"] for request in server.requests] == ['stub-model'] * 3
+
+
+def test_get_action_async_shares_one_event_loop():
+    async def run_sessions(base_url):
+        models = [Model(base_url=base_url, api_key='test') for _ in range(5)]
+        try:
+            return await asyncio.gather(*[model.get_action_async(f'session {index}') for index, model in enumerate(models)])
+        finally:
+            await Model.close_shared_clients()
+
+    with StubOpenAIServer([STEP]) as server:
+        steps = asyncio.run(run_sessions(server.base_url))
+
+    assert steps == [TestStep(**STEP)] * 5
+    assert len(server.requests) == 5
+
+
+def test_multi_turn_history_reports_cached_prompt_tokens():
+    page = '<button id="ai-login">Login</button> ' * 200
+    with StubOpenAIServer([STEP], prefix_cache=True, latency_per_uncached_token=0.0005) as server:
+        model = Model(model_name='stub-model', base_url=server.base_url, api_key='test')
+        history = []
+        model.get_action('login\n' + page, history)
+        first_call = dict(model.last_call_stats)
+
+        started_at = time.perf_counter()
+        model.get_action('The last action succeeded.\n' + page, history)
+        second_call = dict(model.last_call_stats)
+        second_latency = time.perf_counter() - started_at
+
+    assert first_call['cached_tokens'] == 0
+    assert second_call['cached_tokens'] >= first_call['request_tokens'] * 0.9
+    assert second_latency < second_call['request_tokens'] * 0.0005
+
+
+class RecordingRateLimiter(RateLimiter):
+    def __init__(self):
+        super().__init__()
+        self.reserved_tokens = []
+
+    def reserve(self, tokens=0):
+        self.reserved_tokens.append(tokens)
+        return super().reserve(tokens)
+
+
+def test_batch_calls_reserve_tokens_for_the_batch_system_prompt():
+    with StubOpenAIServer([{"steps": [STEP]}]) as server:
+        model = Model(model_name='stub-model', base_url=server.base_url, api_key='test')
+        model.rate_limiter = RecordingRateLimiter()
+        assert model.get_actions('fill the form') == [TestStep(**STEP)]
+
+    assert model.rate_limiter.reserved_tokens == [(len(DEFAUL_SYSTEM_PROMPT + BATCH_SYSTEM_PROMPT) + len('fill the form')) // 4]
+
+
+def test_get_action_keeps_one_event_loop_per_thread():
+    with StubOpenAIServer([STEP]) as server:
+        model = Model(model_name='stub-model', base_url=server.base_url, api_key='test')
+        loops = {}
+
+        def run(name):
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', DeprecationWarning)
+                for _ in range(2):
+                    model.get_action(f'click login from {name}')
+                    loops.setdefault(name, set()).add(Model._get_event_loop())
+
+        threads = [threading.Thread(target=run, args=(f'thread {index}',)) for index in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        async def call_inside_running_loop():
+            with pytest.raises(RuntimeError):
+                model.get_action('click login')
+
+        asyncio.run(call_inside_running_loop())
+
+    assert len(server.requests) == 4
+    assert all(len(thread_loops) == 1 for thread_loops in loops.values())
+    assert len(set.union(*loops.values())) == 2
@@ -0,0 +1,38 @@
+from src.model import TestStep
+from src.plan_cache import PlanCache
+
+STEPS = [
+    {"step": TestStep(action='enter_text', css_selector='#username', text='ttc-thao', description='Enter username'), "fingerprint": 'login-page'},
+    {"step": TestStep(action='click', css_selector='#login', text='', description='Click login'), "fingerprint": 'login-page'},
+]
+
+
+def test_plans_are_keyed_by_task_and_start_fingerprint_and_persisted(tmp_path):
+    cache = PlanCache(tmp_path / 'plan_cache.json')
+    cache.put('login', 'login-page', STEPS)
+
+    plan = PlanCache(tmp_path / 'plan_cache.json').get('login', 'login-page')
+    assert [entry["step"] for entry in plan] == [entry["step"] for entry in STEPS]
+    assert plan[0]["step"].css_selector == '#username' and plan[0]["fingerprint"] == 'login-page'
+    assert cache.get('login', 'dashboard') is None
+    assert cache.get('logout', 'login-page') is None
+
+
+def test_expired_and_invalidated_plans_are_dropped(tmp_path):
+    cache = PlanCache(tmp_path / 'plan_cache.json', ttl_seconds=-1)
+    cache.put('login', 'login-page', STEPS)
+    assert cache.get('login', 'login-page') is None
+
+    cache.ttl_seconds = 60
+    cache.put('login', 'login-page', STEPS)
+    cache.invalidate('login', 'login-page')
+    assert PlanCache(tmp_path / 'plan_cache.json').get('login', 'login-page') is None
+
+
+def test_unreadable_cache_file_is_ignored(tmp_path):
+    (tmp_path / 'plan_cache.json').write_text('{not json', encoding='utf-8')
+    cache = PlanCache(tmp_path / 'plan_cache.json')
+
+    assert cache.get('login', 'login-page') is None
+    cache.put('login', 'login-page', STEPS)
+    assert len(PlanCache(tmp_path / 'plan_cache.json').get('login', 'login-page')) == 2
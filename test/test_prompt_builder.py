@@ -0,0 +1,59 @@
+import pytest
+import tiktoken
+from pydantic_ai.messages import ModelRequest, ModelResponse, SystemPromptPart, ToolCallPart, UserPromptPart
+from src.prompt_builder import PromptBuilder
+
+
+@pytest.fixture
+def offline_tiktoken(monkeypatch):
+    # Model không có trong tiktoken và không tải được file BPE
+    def unknown_model(model_name):
+        raise KeyError(model_name)
+
+    def download_failed(encoding_name):
+        raise OSError("network is unreachable")
+
+    monkeypatch.setattr(tiktoken, 'encoding_for_model', unknown_model)
+    monkeypatch.setattr(tiktoken, 'get_encoding', download_failed)
+
+
+def test_unknown_model_offline_falls_back_to_approximate_counts(offline_tiktoken):
+    prompt_builder = PromptBuilder(model_name='stub-model')
+
+    assert prompt_builder.encoding is None
+    assert prompt_builder.count_tokens('abcdefgh') == 2
+    assert prompt_builder.count_tokens('abcdefghi') == 3
+
+
+def test_fit_markdown_keeps_markdown_within_budget(offline_tiktoken):
+    markdown = 'Username <input id="u1" name="username"></input>'
+    markdown_tokens = PromptBuilder(model_name='stub-model').count_tokens(markdown)
+
+    fitted, report = PromptBuilder(model_name='stub-model').fit_markdown('login', markdown)
+    assert fitted == markdown and report["elements_dropped"] == 0
+    fitted, report = PromptBuilder(markdown_tokens + 10, 'stub-model').fit_markdown('login', markdown, reserved_tokens=10)
+    assert fitted == markdown and report["markdown_tokens"] == markdown_tokens
+
+
+def test_fit_markdown_drops_least_relevant_elements_in_page_order(offline_tiktoken):
+    filler = ' '.join(f'<a id="l{index}">Report {index}</a>' for index in range(20))
+    markdown = (f'Username <input id="u1" name="username"></input> {filler} '
+                f'Password <input id="p1" name="password"></input> <button id="b1">Login</button>')
+    prompt_builder = PromptBuilder(70, 'stub-model')
+
+    fitted, report = prompt_builder.fit_markdown("login with username 'a' and password 'b'", markdown)
+    assert prompt_builder.count_tokens(fitted) <= 70
+    assert fitted.index('id="u1"') < fitted.index('id="p1"') < fitted.index('id="b1"')
+    assert report["elements_dropped"] > 0 and f'{report["elements_dropped"]} less relevant elements were omitted' in fitted
+    assert report["elements_kept"] + report["elements_dropped"] == 23
+
+
+def test_count_history_tokens_skips_the_system_prompt(offline_tiktoken):
+    prompt_builder = PromptBuilder(model_name='stub-model')
+    history = [
+        ModelRequest(parts=[SystemPromptPart('system ' * 100), UserPromptPart('abcdefgh')]),
+        ModelResponse(parts=[ToolCallPart('final_result', {'action': 'click'})])
+    ]
+
+    assert prompt_builder.count_history_tokens(None) == 0
+    assert prompt_builder.count_history_tokens(history) == 2 + prompt_builder.count_tokens('final_result{"action":"click"}')
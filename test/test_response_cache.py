@@ -0,0 +1,47 @@
+from src.response_cache import ResponseCache
+
+
+def test_replay_mode_returns_stored_response_and_counts_hits(tmp_path):
+    cache = ResponseCache(tmp_path / 'responses.sqlite3', mode='replay')
+    key = cache.make_key('o4-mini', 'system', 'TestStep', '', 'click login')
+
+    assert cache.get(key) is None
+    cache.put(key, 'o4-mini', '{"action": "click"}', b'[]')
+
+    assert cache.get(key) == ('{"action": "click"}', b'[]')
+    assert cache.get_stats()['hits'] == 1
+    assert cache.get_stats()['hit_rate'] == 0.5
+
+
+def test_record_mode_writes_without_reading_and_bypass_does_neither(tmp_path):
+    path = tmp_path / 'responses.sqlite3'
+    recorder = ResponseCache(path, mode='record')
+    recorder.put('key', 'o4-mini', '{}', b'[]')
+    assert recorder.get('key') is None
+
+    bypass = ResponseCache(path, mode='bypass')
+    bypass.put('other', 'o4-mini', '{}', b'[]')
+    assert ResponseCache(path, mode='replay').get('other') is None
+    assert ResponseCache(path, mode='replay').get('key') == ('{}', b'[]')
+
+
+def test_expired_and_oversized_entries_are_dropped(tmp_path):
+    cache = ResponseCache(tmp_path / 'responses.sqlite3', mode='replay', ttl_seconds=60, max_bytes=30)
+    cache.put('old', 'm', 'x' * 10, b'')
+    cache.put('new', 'm', 'y' * 10, b'')
+    cache.put('newest', 'm', 'z' * 15, b'')
+    assert cache.get('old') is None
+    assert cache.get('newest') is not None
+    assert cache.get_stats()['evictions'] == 1
+
+    cache.ttl_seconds = -1
+    assert cache.get('newest') is None
+    assert cache.get_stats()['expired'] == 1
+
+
+def test_key_depends_on_every_part():
+    key = ResponseCache.make_key('o4-mini', 'system', '<button id="ai-1x2y3z">Login</button>')
+
+    assert key == ResponseCache.make_key('o4-mini', 'system', '<button id="ai-1x2y3z">Login</button>')
+    assert key != ResponseCache.make_key('o4-mini', 'system', '<button id="ai-1x2y3z-2">Login</button>')
+    assert key != ResponseCache.make_key('o4-mini', 'other system', '<button id="ai-1x2y3z">Login</button>')
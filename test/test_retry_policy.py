@@ -0,0 +1,68 @@
+import httpx
+import openai
+import pytest
+from pydantic_ai.exceptions import ModelHTTPError, UnexpectedModelBehavior
+from src.retry_policy import RetryPolicy, TokenBucket, CircuitBreaker, CircuitOpenError, classify_error, get_retry_after, \
+    INVALID_OUTPUT, RATE_LIMITED, TRANSIENT, FATAL
+
+REQUEST = httpx.Request('POST', 'http://localhost/v1/chat/completions')
+
+
+def status_error(status_code, headers=None):
+    response = httpx.Response(status_code, request=REQUEST, headers=headers)
+    return openai.APIStatusError(f'status {status_code}', response=response, body=None)
+
+
+@pytest.mark.parametrize('error, expected', [
+    (UnexpectedModelBehavior('bad output'), INVALID_OUTPUT),
+    (openai.RateLimitError('slow down', response=httpx.Response(429, request=REQUEST), body=None), RATE_LIMITED),
+    (ModelHTTPError(429, 'o4-mini'), RATE_LIMITED),
+    (openai.APITimeoutError(REQUEST), TRANSIENT),
+    (httpx.ConnectError('refused'), TRANSIENT),
+    (status_error(503), TRANSIENT),
+    (ModelHTTPError(502, 'o4-mini'), TRANSIENT),
+    (status_error(401), FATAL),
+    (TypeError('unexpected keyword argument'), FATAL),
+    (AttributeError('NoneType has no attribute'), FATAL),
+], ids=lambda value: type(value).__name__ if isinstance(value, Exception) else value)
+def test_classify_error(error, expected):
+    assert classify_error(error) == expected
+
+
+def test_retry_policy_stops_on_fatal_and_after_max_attempts():
+    policy = RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=4.0)
+
+    assert policy.should_retry(TRANSIENT, 2) and not policy.should_retry(TRANSIENT, 3)
+    assert not policy.should_retry(FATAL, 1)
+    assert policy.get_delay(INVALID_OUTPUT, 1) == 0.0
+    assert policy.get_delay(RATE_LIMITED, 1, retry_after=10) == 4.0
+    assert all(0 <= policy.get_delay(TRANSIENT, 5) <= 4.0 for _ in range(20))
+    assert get_retry_after(status_error(429, {'retry-after-ms': '1500'})) == 1.5
+
+
+def test_token_bucket_reports_wait_once_capacity_is_used():
+    bucket = TokenBucket(rate_per_minute=60, capacity=2)
+
+    assert bucket.reserve(1, now=bucket.updated_at) == 0.0
+    assert bucket.reserve(1, now=bucket.updated_at) == 0.0
+    assert bucket.reserve(1, now=bucket.updated_at) == pytest.approx(1.0)
+    assert bucket.reserve(1, now=bucket.updated_at + 3) == 0.0
+
+
+def test_circuit_breaker_opens_after_consecutive_failures_and_half_opens(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('src.retry_policy.time.monotonic', lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30.0)
+
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    now[0] += 31
+    breaker.before_call() # lời gọi thử (half-open)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    breaker.before_call()
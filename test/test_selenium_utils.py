@@ -0,0 +1,75 @@
+import pytest
+from selenium.common.exceptions import WebDriverException
+from src.browser_profile import BrowserProfile
+from src.driver_pool import DriverPool
+from src.selenium_utils import SeleniumUtils
+
+
+class RecordingDriver:
+    # Driver giả: ghi lại các url được mở và các lệnh xoá trạng thái
+    page_source = "<html><head></head><body><button>Login</button></body></html>"
+
+    def __init__(self, reachable=True):
+        self.reachable = reachable
+        self.loaded_urls = []
+        self.cookie_resets = 0
+        self.quit_count = 0
+
+    def implicitly_wait(self, seconds):
+        pass
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def get(self, url):
+        self.loaded_urls.append(url)
+        if not self.reachable:
+            raise WebDriverException("net::ERR_CONNECTION_REFUSED")
+
+    def execute_async_script(self, script, *args):
+        return {"settled": True, "pending_requests": 0}
+
+    def execute_script(self, script, *args):
+        return None
+
+    def delete_all_cookies(self):
+        self.cookie_resets += 1
+
+    def quit(self):
+        self.quit_count += 1
+
+
+class RecordingProfile(BrowserProfile):
+    reachable: bool = True
+
+    def create_driver(self):
+        return RecordingDriver(self.reachable)
+
+
+def test_reset_session_skips_second_load_on_freshly_connected_driver():
+    selenium_utils = SeleniumUtils(profile=RecordingProfile())
+    selenium_utils.connect_driver('https://example.test/login')
+
+    selenium_utils.reset_session('https://example.test/login')
+    assert selenium_utils.driver.loaded_urls == ['https://example.test/login']
+
+    selenium_utils.reset_session('https://example.test/login')
+    assert selenium_utils.driver.loaded_urls == ['https://example.test/login'] * 2
+    assert selenium_utils.driver.cookie_resets == 1
+
+
+def test_connect_driver_failure_returns_the_driver_to_the_pool():
+    pool = DriverPool(RecordingProfile(reachable=False), size=1)
+    selenium_utils = SeleniumUtils(driver_pool=pool)
+    driver = selenium_utils.driver
+
+    with pytest.raises(Exception):
+        selenium_utils.connect_driver('https://example.test/login')
+
+    assert selenium_utils.driver is None
+    assert driver.quit_count == 1
+    pool.close()
+    assert pool.stats["launch_ms_total"] > 0 and pool._launching == 0
@@ -0,0 +1,26 @@
+import os
+from src.session_store import SessionStore
+
+STATE = {"url": "https://example.test/dashboard", "cookies": [{"name": "sid", "value": "abc"}], "local_storage": {}, "session_storage": {}}
+
+
+def test_sessions_are_keyed_by_base_url_and_setup_task(tmp_path):
+    store = SessionStore(tmp_path / 'sessions.json')
+    store.put('https://example.test/login', 'login as admin', STATE, 'login-page')
+
+    reloaded = SessionStore(tmp_path / 'sessions.json')
+    assert reloaded.get('https://example.test/login', 'login as admin')['state'] == STATE
+    assert reloaded.get('https://example.test/login', 'login as viewer') is None
+    assert reloaded.get('https://other.test/login', 'login as admin') is None
+    assert oct(os.stat(tmp_path / 'sessions.json').st_mode & 0o777) == '0o600'
+
+
+def test_expired_and_invalidated_sessions_are_dropped(tmp_path):
+    store = SessionStore(tmp_path / 'sessions.json', ttl_seconds=-1)
+    store.put('https://example.test/login', 'login as admin', STATE, 'login-page')
+    assert store.get('https://example.test/login', 'login as admin') is None
+
+    store.ttl_seconds = 60
+    store.put('https://example.test/login', 'login as admin', STATE, 'login-page')
+    store.invalidate('https://example.test/login', 'login as admin')
+    assert SessionStore(tmp_path / 'sessions.json').get('https://example.test/login', 'login as admin') is None
@@ -0,0 +1,65 @@
+import pytest
+from src.suite_scheduler import Suite, SuiteScheduler, build_task_tree
+from test.fake_processor import FakeProcessor
+
+
+class FakeSuiteScheduler(SuiteScheduler):
+    def __init__(self, suite, checkpoints_valid=True, checkpoint_error=None, **kwargs):
+        super().__init__(suite, prewarm=False, **kwargs)
+        self.executed = []
+        self.checkpoints_valid = checkpoints_valid
+        self.checkpoint_error = checkpoint_error
+
+    def _create_processor(self):
+        return FakeProcessor(executed=self.executed, checkpoints_valid=self.checkpoints_valid, checkpoint_error=self.checkpoint_error)
+
+
+def make_suite(*tasks):
+    return Suite(url='http://localhost/', tasks=[{"id": task_id, "task": task_id, "depends_on": depends_on} for task_id, depends_on in tasks])
+
+
+SUITE = make_suite(('login', None), ('inbound', 'login'), ('view_asn', 'inbound'), ('create_asn', 'inbound'),
+                   ('outbound', ['login']), ('other', None))
+
+
+def test_shared_prefixes_run_once_and_branches_start_from_checkpoints():
+    scheduler = FakeSuiteScheduler(SUITE, pool_size=3)
+    results = {result.id: result for result in scheduler.run()}
+
+    assert all(result.success for result in results.values())
+    assert sorted(scheduler.executed) == sorted(['login', 'inbound', 'view_asn', 'create_asn', 'outbound', 'other'])
+    assert results['login'].start == 'fresh'
+    assert {results['inbound'].start, results['outbound'].start} == {'continued', 'checkpoint'}
+    assert {results['view_asn'].start, results['create_asn'].start} == {'continued', 'checkpoint'}
+
+
+def test_unusable_checkpoint_replays_prefix_and_failures_skip_dependents():
+    suite = make_suite(('login', None), ('a', 'login'), ('b', 'login'), ('fail', None), ('after_fail', 'fail'))
+    scheduler = FakeSuiteScheduler(suite, checkpoints_valid=False, pool_size=2)
+    results = {result.id: result for result in scheduler.run()}
+
+    assert scheduler.executed.count('login') == 2
+    assert sorted(result.start for result in (results['a'], results['b'])) == ['continued', 'replayed']
+    assert not results['fail'].success and not results['fail'].skipped
+    assert results['after_fail'].skipped and 'after_fail' not in scheduler.executed
+
+
+def test_stopped_tasks_and_failed_checkpoints_skip_dependents():
+    suite = make_suite(('stop', None), ('after_stop', 'stop'), ('login', None), ('a', 'login'), ('b', 'login'))
+    scheduler = FakeSuiteScheduler(suite, checkpoint_error='storage is not readable', pool_size=2)
+    results = {result.id: result for result in scheduler.run()}
+
+    assert not results['stop'].success and results['after_stop'].skipped
+    assert not results['login'].success and 'storage is not readable' in results['login'].error
+    assert results['a'].skipped and results['b'].skipped
+    assert 'after_stop' not in scheduler.executed and 'a' not in scheduler.executed
+
+
+def test_invalid_dependencies_are_rejected():
+    with pytest.raises(ValueError):
+        build_task_tree(make_suite(('a', 'b'), ('b', 'a')))
+    with pytest.raises(ValueError):
+        build_task_tree(make_suite(('a', 'missing')))
+    with pytest.raises(ValueError):
+        build_task_tree(make_suite(('a', None), ('b', None), ('c', ['a', 'b'])))
+    assert build_task_tree(make_suite(('a', None), ('b', 'a'), ('c', ['a', 'b'])))['c'] == ['a', 'b']
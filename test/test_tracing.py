@@ -0,0 +1,38 @@
+import json
+import pytest
+from src.tracing import Tracer
+
+
+def test_spans_are_exported_as_jsonl_and_sent_to_hooks(tmp_path):
+    trace_path = tmp_path / 'traces' / 'run.jsonl'
+    received = []
+    tracer = Tracer(str(trace_path), hooks=[received.append], print_summary=False)
+
+    tracer.start_task('login')
+    with tracer.span('snapshot', 0, dom_bytes=1024):
+        pass
+    with pytest.raises(ValueError):
+        with tracer.span('llm', 0):
+            raise ValueError('boom')
+    spans = tracer.end_task('stopped', steps=0)
+
+    assert [span.phase for span in received] == ['snapshot', 'llm', 'task']
+    assert spans == received
+    lines = [json.loads(line) for line in trace_path.read_text(encoding='utf-8').splitlines()]
+    assert [line['phase'] for line in lines] == ['snapshot', 'llm', 'task']
+    assert lines[0]['attributes'] == {'dom_bytes': 1024}
+    assert lines[1]['outcome'] == 'error' and lines[1]['error'] == 'boom'
+    assert lines[2]['attributes'] == {'task': 'login', 'steps': 0}
+
+
+def test_summary_groups_spans_by_phase():
+    tracer = Tracer(print_summary=False)
+    tracer.start_task('login')
+    for step in range(3):
+        with tracer.span('action', step) as span:
+            span.outcome = 'rejected' if step == 0 else 'ok'
+    summary = Tracer.summarize(tracer.end_task())
+
+    assert list(summary) == ['action']
+    assert summary['action']['count'] == 3
+    assert summary['action']['not_ok'] == 1